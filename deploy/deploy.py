@@ -4,29 +4,27 @@ import numpy as np
 import logging
 import sys
 import json
+import argparse
 import time
 import random
+from functools import partial
 from multiprocessing import Queue, Process
 
-from rllib import rllib_predict_action, SatccAction, load_algo
+from rllib import rllib_predict_action, SatccAction, load_model
+from gym_rlcc.protocol import StateDecoder, MSG_STATE, observation
+from routing import balance, CONTROL_CHANNEL, ADD_WORKER, EVICT
 
 # logging.basicConfig(level=logging.DEBUG)
 logging.basicConfig(level=logging.INFO)
 
 REDIS_HOST = '10.124.0.1'
 REDIS_PORT = 6379
-STATE_SCALE = np.array([1, 1, 512, 512, 512, 16384, 1, 1, 1, 1024, 1024, 1], dtype=np.float32) # 缩放状态
-STATE_SLICE_FROM = 0  # 状态切片
-STATE_SLICE_TO = 9
 
 
-def random_load_balance_process_handler(in_queue: Queue, out_queue_list: list):
-    logging.info("start random_load_balance process")
-    while True:
-        msg = in_queue.get(True)
-        random_id = random.randint(0, len(out_queue_list)-1)
-        logging.debug(f"load_blance_process: send msg {msg} to worker {random_id}")
-        out_queue_list[random_id].put(msg) # 随机分配消息
+def hash_load_balance_process_handler(in_queue: Queue, out_queue_list: list, start_worker=None):
+    logging.info("start hash_load_balance process")
+    # 一致性哈希, 按 cid 分配消息; 收到 add_worker 时用 start_worker 增加 worker, 只迁移约 1/N 的流
+    balance(in_queue, out_queue_list, start_worker)
 
 
 def main_process_handler(in_queue: Queue):
@@ -35,12 +33,16 @@ def main_process_handler(in_queue: Queue):
     r = Redis(host=REDIS_HOST, port=REDIS_PORT)
     pub = r.pubsub()
     pub.psubscribe("rlccstate_*")  # 匹配订阅所有state_通道
+    pub.subscribe(CONTROL_CHANNEL)  # redis-cli publish rlccdeploy add_worker
     # pub.psubscribe()
     msg_stream = pub.listen()
     for msg in msg_stream:
         if msg["type"] == "pmessage":
             logging.debug(f"main_process: get msg {msg}")
             in_queue.put(msg)  # 所有信息交给负载去处理
+        elif msg["type"] == "message" and msg["data"] == ADD_WORKER.encode():
+            logging.info("main_process: add worker")
+            in_queue.put({"type": ADD_WORKER})
 
 
 def test_predict_action(state):
@@ -52,20 +54,21 @@ def worker_process_handler(worker_queue: Queue, worker_id: int, algo):
     r = Redis(host=REDIS_HOST, port=REDIS_PORT)
     r2 = Redis(host=REDIS_HOST, port=REDIS_PORT)
     logging.info(f"start worker {worker_id} process")
+    decoder = StateDecoder(parse_dtype=np.float64)  # 状态缩放与切片见 gym_rlcc/protocol.py
     while True:
         msg = worker_queue.get(True)
+        if msg["type"] == EVICT:   # 没有流状态, 不需要清除
+            continue
         channel = str(msg["channel"], encoding="utf-8")
         logging.debug(f"worker process {worker_id}: get data from {channel}")
         if channel.startswith("rlccstate_"):
             # print(channel)
             cid = channel.replace("rlccstate_", "", 1) # 删除前缀，获取cid
-            state_str = msg["data"].decode("utf-8").split(';')
-            if len(state_str) < 7:
-                logging.debug(f"worker {worker_id}, scid {cid} : {state_str}")
-                continue # 小于7的是其他消息，不是状态信息
-            data_64 = np.array(state_str, dtype=np.float64)
-            data =np.divide(data_64, STATE_SCALE, dtype=np.float32)
-            input_state = data[STATE_SLICE_FROM:STATE_SLICE_TO] # 传回的状态中，有些状态不用于训练，用于计算奖励，切除多余状态
+            kind, data = decoder.decode(msg["data"])
+            if kind != MSG_STATE:
+                logging.debug(f"worker {worker_id}, scid {cid} : {decoder.fields}")
+                continue # 不是状态信息
+            input_state = observation(data) # 传回的状态中，有些状态不用于训练，用于计算奖励，切除多余状态
             
             logging.debug(f"worker {worker_id} : go state {input_state}")
             
@@ -84,12 +87,26 @@ def worker_process_handler(worker_queue: Queue, worker_id: int, algo):
             logging.debug(f"worker {worker_id} action_{cid} : predict action {action}")
     
 
+def start_worker(worker_id: int, algo):
+    # 负载进程在运行时增加 worker, 负载进程退出时结束它, 见 routing.balance
+    worker_queue = Queue()
+    worker_process = Process(target=worker_process_handler, args=(worker_queue, worker_id, algo))
+    worker_process.start()
+    return worker_queue, worker_process
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', dest='directory',
+                        help='Path to the output directory.')
+    parser.add_argument('-p', dest='policy',
+                        help='policy exported by export_policy.py, run it with numpy instead of ray')
+    args = parser.parse_args()
     workers_num = 3
     
     process_list = []
     
-    algo = load_algo()
+    algo = load_model(args.directory, args.policy)
     
     in_flag_queue = Queue()
     
@@ -104,7 +121,8 @@ if __name__ == "__main__":
         workers_queue_list.append(worker_queue)
         process_list.append(worker_process)
 
-    load_balance_prcess = Process(target=random_load_balance_process_handler, args=(in_flag_queue, workers_queue_list))
+    load_balance_prcess = Process(target=hash_load_balance_process_handler,
+                                  args=(in_flag_queue, workers_queue_list, partial(start_worker, algo=algo)))
     process_list.append(load_balance_prcess)
     
     try:
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# 批量推理部署 : 一个进程订阅所有 rlccstate_* 通道,
+# 在一个小窗口内(--window 毫秒 或 --batch 个状态)收集所有流的状态,
+# 策略模型一次前向得到所有动作, 再用一个 redis pipeline 全部发布.
+# 替代 deploy.py 中 主进程 -> 随机负载 -> worker 两次 Queue 转发 + 每条消息一次 compute_single_action.
+#
+from redis.client import Redis
+import numpy as np
+import logging
+import argparse
+import random
+import time
+
+from gym_rlcc.protocol import StateDecoder, MSG_STATE, observation
+
+# logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=logging.INFO)
+
+REDIS_HOST = '10.124.0.1'  # 与 deploy.py 相同, -r / --redis-port 修改
+REDIS_PORT = 6379
+LATENCY_SAMPLES = 100000    # 统计延迟用的最近样本数
+
+
+def test_predict_actions(states):
+    return [random.choice([-1, 0, 1]) for _ in range(len(states))]
+
+
+class LatencyStats:
+    """
+    state-to-action latency of the last LATENCY_SAMPLES actions, and actions/sec
+
+    latency : from the moment the state is read from redis to the moment its action is published
+    """
+
+    def __init__(self, size: int = LATENCY_SAMPLES):
+        self.latency = np.zeros(size, dtype=np.float64)
+        self.count = 0          # 总动作数
+        self.batches = 0
+        self.last_count = 0
+        self.last_time = time.perf_counter()
+
+    def add(self, received: np.ndarray, published: float):
+        n = len(received)
+        index = np.arange(self.count, self.count + n) % len(self.latency)
+        self.latency[index] = published - received
+        self.count += n
+        self.batches += 1
+
+    def report(self) -> str:
+        now = time.perf_counter()
+        rate = (self.count - self.last_count) / (now - self.last_time)
+        self.last_count, self.last_time = self.count, now
+        samples = self.latency[:min(self.count, len(self.latency))]
+        if len(samples) == 0:
+            return "no action yet"
+        p50, p99 = np.percentile(samples, [50, 99]) * 1000
+        return (f"actions/sec {rate:.0f}, latency p50 {p50:.3f} ms p99 {p99:.3f} ms, "
+                f"avg batch {self.count / self.batches:.1f}")
+
+
+def collect_batch(pub, decoder: StateDecoder, window: float, max_batch: int):
+    """
+    block for the first state, then collect states until window seconds are passed or max_batch states
+    return cids, states, receive times, one row per state : a flow with several states in the window
+    gets one action for each of them, in order, as with deploy.py
+    """
+    cids, states, received = [], [], []
+    deadline = None
+    while len(states) < max_batch:
+        if deadline is None:
+            timeout = None
+        else:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+        msg = pub.get_message(timeout=timeout)
+        if msg is None or msg["type"] != "pmessage":
+            continue
+        kind, data = decoder.decode(msg["data"])
+        if kind != MSG_STATE:
+            logging.debug(f"scid {msg['channel']} : {decoder.fields}")
+            continue # 不是状态信息
+        now = time.perf_counter()
+        cids.append(msg["channel"][len(b"rlccstate_"):].decode("utf-8")) # 删除前缀，获取cid
+        states.append(observation(data).copy())   # decoder 复用输出缓冲
+        received.append(now)
+        if deadline is None:
+            deadline = now + window
+    return cids, states, received
+
+
+def batch_predict_handler(predict, window: float, max_batch: int, report_interval: float,
+                          redis_host: str = REDIS_HOST, redis_port: int = REDIS_PORT):
+    r = Redis(host=redis_host, port=redis_port)
+    decoder = StateDecoder(parse_dtype=np.float64)  # 状态缩放与切片见 gym_rlcc/protocol.py
+    pub = r.pubsub()
+    pub.psubscribe("rlccstate_*")  # 匹配订阅所有state_通道
+    stats = LatencyStats()
+    next_report = time.perf_counter() + report_interval
+
+    while True:
+        cids, states, received = collect_batch(pub, decoder, window, max_batch)
+        if not states:
+            continue
+        actions = predict(np.stack(states))  # 一次前向
+
+        pipe = r.pipeline(transaction=False)
+        for cid, action in zip(cids, actions):
+            pipe.publish(f"rlccaction_{cid}", f"{action}") # cwnd
+        pipe.execute()
+        stats.add(np.array(received), time.perf_counter())
+        logging.debug(f"batch {len(cids)} : {list(zip(cids, actions))}")
+
+        if time.perf_counter() >= next_report:
+            logging.info(stats.report())
+            next_report = time.perf_counter() + report_interval
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', dest='directory',
+                        help='Path to the output directory.')
+    parser.add_argument('-p', dest='policy',
+                        help='policy exported by export_policy.py, run it with numpy instead of ray')
+    parser.add_argument('-w', dest='window', type=float, default=1.0,
+                        help='batch window in ms, counted from the first state of a batch')
+    parser.add_argument('-b', dest='batch', type=int, default=64,
+                        help='max states per batch')
+    parser.add_argument('-i', dest='interval', type=float, default=5.0,
+                        help='seconds between latency / throughput reports')
+    parser.add_argument('-r', dest='redis_host', default=REDIS_HOST, help='redis host')
+    parser.add_argument('--redis-port', dest='redis_port', type=int, default=REDIS_PORT, help='redis port')
+    parser.add_argument('--test', action='store_true',
+                        help='random actions, no model, to size the redis path')
+    args = parser.parse_args()
+
+    if args.test:
+        predict = test_predict_actions
+    else:
+        from rllib import rllib_predict_actions, load_model
+        algo = load_model(args.directory, args.policy)
+        predict = lambda states: rllib_predict_actions(states, algo)
+
+    try:
+        batch_predict_handler(predict, args.window / 1000, args.batch, args.interval,
+                              args.redis_host, args.redis_port)
+    except KeyboardInterrupt:
+        pass
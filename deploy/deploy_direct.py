@@ -7,16 +7,14 @@ import time
 import argparse
 import random
 
-from rllib import rllib_predict_action, load_algo
+from rllib import rllib_predict_action, load_model
+from gym_rlcc.protocol import StateDecoder, MSG_STATE, observation
 
 # logging.basicConfig(level=logging.DEBUG)
 logging.basicConfig(level=logging.INFO)
 
 REDIS_HOST = '0.0.0.0'
 REDIS_PORT = 6379
-STATE_SCALE = np.array([1, 1, 512, 512, 512, 16384, 1, 1, 1, 1024, 1024, 1], dtype=np.float32) # 缩放状态
-STATE_SLICE_FROM = 0  # 状态切片
-STATE_SLICE_TO = 9
 
 
 def test_predict_action(state):
@@ -27,6 +25,7 @@ def test_predict_action(state):
 def rllib_predict_handler(algo):
     r = Redis(host=REDIS_HOST, port=REDIS_PORT)
     r2 = Redis(host=REDIS_HOST, port=REDIS_PORT)
+    decoder = StateDecoder(parse_dtype=np.float64)  # 状态缩放与切片见 gym_rlcc/protocol.py
     pub = r.pubsub()
     pub.psubscribe("rlccstate_*")  # 匹配订阅所有state_通道
     # pub.psubscribe()
@@ -40,14 +39,11 @@ def rllib_predict_handler(algo):
             if channel.startswith("rlccstate_"):
                 # print(channel)
                 cid = channel.replace("rlccstate_", "", 1) # 删除前缀，获取cid
-                state_str = msg["data"].decode("utf-8").split(';')
-                # print(f"----------{state_str}---------------")
-                if len(state_str) < 7:
-                    logging.debug(f"scid {cid} : {state_str}")
-                    continue # 小于7的是其他消息，不是状态信息
-                data_64 = np.array(state_str, dtype=np.float64)
-                data =np.divide(data_64, STATE_SCALE, dtype=np.float32)
-                input_state = data[STATE_SLICE_FROM:STATE_SLICE_TO] # 传回的状态中，有些状态不用于训练，用于计算奖励，切除多余状态
+                kind, data = decoder.decode(msg["data"])
+                if kind != MSG_STATE:
+                    logging.debug(f"scid {cid} : {decoder.fields}")
+                    continue # 不是状态信息
+                input_state = observation(data) # 传回的状态中，有些状态不用于训练，用于计算奖励，切除多余状态
                 
                 logging.debug(f"go state {input_state}")
                 
@@ -70,10 +66,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('-d', dest='directory',
                         help='Path to the output directory.')
+    parser.add_argument('-p', dest='policy',
+                        help='policy exported by export_policy.py, run it with numpy instead of ray')
     args = parser.parse_args()
     
-    if args.directory:
-        algo = load_algo(args.directory)
-    else:
-        algo = load_algo()
+    algo = load_model(args.directory, args.policy)
     rllib_predict_handler(algo)
\ No newline at end of file
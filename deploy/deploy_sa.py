@@ -3,29 +3,28 @@ import numpy as np
 import logging
 import sys
 import json
+import argparse
 import time
 import random
+from functools import partial
 from multiprocessing import Queue, Process
 
-from rllib import rllib_predict_action_sa, SatccAction, load_algo
+from rllib import rllib_predict_action_sa, SatccAction, load_model
+from gym_rlcc.protocol import StateDecoder, MSG_STATE, observation
+from routing import FlowTable, balance, CONTROL_CHANNEL, ADD_WORKER, EVICT
 
 logging.basicConfig(level=logging.DEBUG)
 # logging.basicConfig(level=logging.INFO)
 
 REDIS_HOST = '0.0.0.0'
 REDIS_PORT = 6379
-STATE_SCALE = np.array([1, 1, 512, 512, 512, 16384, 1, 1, 1, 1024, 1024, 1], dtype=np.float32) # 缩放状态
-STATE_SLICE_FROM = 0  # 状态切片
-STATE_SLICE_TO = 9
+FLOW_IDLE_TIMEOUT = 60  # 秒, 超过这个时间没有状态的流, 清除其 SatccAction
 
 
-def random_load_balance_process_handler(in_queue: Queue, out_queue_list: list):
-    logging.info("start random_load_balance process")
-    while True:
-        msg = in_queue.get(True)
-        random_id = random.randint(0, len(out_queue_list)-1)
-        logging.debug(f"load_blance_process: send msg {msg} to worker {random_id}")
-        out_queue_list[random_id].put(msg) # 随机分配消息
+def hash_load_balance_process_handler(in_queue: Queue, out_queue_list: list, start_worker=None):
+    logging.info("start hash_load_balance process")
+    # 一致性哈希, 按 cid 分配消息; 收到 add_worker 时用 start_worker 增加 worker, 只迁移约 1/N 的流
+    balance(in_queue, out_queue_list, start_worker, FLOW_IDLE_TIMEOUT)
 
 
 def main_process_handler(in_queue: Queue):
@@ -34,12 +33,16 @@ def main_process_handler(in_queue: Queue):
     r = Redis(host=REDIS_HOST, port=REDIS_PORT)
     pub = r.pubsub()
     pub.psubscribe("rlccstate_*")  # 匹配订阅所有state_通道
+    pub.subscribe(CONTROL_CHANNEL)  # redis-cli publish rlccdeploy add_worker
     # pub.psubscribe()
     msg_stream = pub.listen()
     for msg in msg_stream:
         if msg["type"] == "pmessage":
             logging.debug(f"main_process: get msg {msg}")
             in_queue.put(msg)  # 所有信息交给负载去处理
+        elif msg["type"] == "message" and msg["data"] == ADD_WORKER.encode():
+            logging.info("main_process: add worker")
+            in_queue.put({"type": ADD_WORKER})
 
 
 def test_predict_action(state):
@@ -50,20 +53,27 @@ def test_predict_action(state):
 def worker_process_handler(worker_queue: Queue, worker_id: int, algo):
     r = Redis(host=REDIS_HOST, port=REDIS_PORT)
     logging.info(f"start worker {worker_id} process")
+    # 按 cid 路由, 流的 SatccAction 只在本 worker 中, 新流自动创建, 空闲流定期清除
+    flows = FlowTable(SatccAction, FLOW_IDLE_TIMEOUT)
+    next_evict = time.monotonic() + FLOW_IDLE_TIMEOUT
+    decoder = StateDecoder(parse_dtype=np.float64)  # 状态缩放与切片见 gym_rlcc/protocol.py
     while True:
         msg = worker_queue.get(True)
+        if msg["type"] == EVICT:   # 流迁移到了新增的 worker
+            evicted = flows.evict(msg["cids"])
+            # SatccAction 不随流迁移, 新 worker 中从头开始
+            logging.info(f"worker {worker_id} : drop moved flows {evicted}, {len(flows)} flows left")
+            continue
         channel = str(msg["channel"], encoding="utf-8")
         logging.debug(f"worker process {worker_id}: get data from {channel}")
         if channel.startswith("rlccstate_"):
             print(channel)
             cid = channel.replace("rlccstate_", "", 1) # 删除前缀，获取cid
-            state_str = msg["data"].decode("utf-8").split(';')
-            if len(state_str) < 7:
-                logging.debug(f"worker {worker_id}, scid {cid} : {state_str}")
-                continue # 小于7的是其他消息，不是状态信息
-            data_64 = np.array(state_str, dtype=np.float64)
-            data =np.divide(data_64, STATE_SCALE, dtype=np.float32)
-            input_state = data[STATE_SLICE_FROM:STATE_SLICE_TO] # 传回的状态中，有些状态不用于训练，用于计算奖励，切除多余状态
+            kind, data = decoder.decode(msg["data"])
+            if kind != MSG_STATE:
+                logging.debug(f"worker {worker_id}, scid {cid} : {decoder.fields}")
+                continue # 不是状态信息
+            input_state = observation(data) # 传回的状态中，有些状态不用于训练，用于计算奖励，切除多余状态
             
             logging.debug(f"worker {worker_id} : go state {input_state}")
             
@@ -72,8 +82,9 @@ def worker_process_handler(worker_queue: Queue, worker_id: int, algo):
             # action =test_predict_action(input_state)
             # action_str = f"{action[0]},{action[1]}"
             
-            print(f"current cid: {cid}, {SAset[cid]}")
-            action = rllib_predict_action_sa(input_state, SAset[cid], algo)  # [pacing]
+            sa = flows.get(cid)
+            logging.debug(f"current cid: {cid}, {sa}")
+            action = rllib_predict_action_sa(input_state, sa, algo)  # [pacing]
             action_str = f"{action[0]}" # cwnd
             # action_str = f"0,{action[0]}" # pacing
             
@@ -81,9 +92,29 @@ def worker_process_handler(worker_queue: Queue, worker_id: int, algo):
             r.publish(f"rlccaction_{cid}", action_str)
             
             logging.debug(f"worker {worker_id} action_{cid} : predict action {action}")
+
+            if time.monotonic() >= next_evict:
+                evicted = flows.evict_idle()
+                if evicted:
+                    logging.info(f"worker {worker_id} : evict idle flows {evicted}, {len(flows)} flows left")
+                next_evict = time.monotonic() + FLOW_IDLE_TIMEOUT
     
 
+def start_worker(worker_id: int, algo):
+    # 负载进程在运行时增加 worker, 负载进程退出时结束它, 见 routing.balance
+    worker_queue = Queue()
+    worker_process = Process(target=worker_process_handler, args=(worker_queue, worker_id, algo))
+    worker_process.start()
+    return worker_queue, worker_process
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', dest='directory',
+                        help='Path to the output directory.')
+    parser.add_argument('-p', dest='policy',
+                        help='policy exported by export_policy.py, run it with numpy instead of ray')
+    args = parser.parse_args()
 
     map_c_2_rlcc_flag = {
         'c1': "1001",
@@ -97,19 +128,13 @@ if __name__ == "__main__":
         # 'c9': "1009",
         # 'c10': "1010",
     }
-    
-    SAset = {
-        "1001" : SatccAction(),
-        "1002" : SatccAction(),
-        "1003" : SatccAction()
-    }
 
     #####
     workers_num = 3
     
     process_list = []
     
-    algo = load_algo()
+    algo = load_model(args.directory, args.policy)
     
     in_flag_queue = Queue()
     
@@ -124,7 +149,8 @@ if __name__ == "__main__":
         workers_queue_list.append(worker_queue)
         process_list.append(worker_process)
 
-    load_balance_prcess = Process(target=random_load_balance_process_handler, args=(in_flag_queue, workers_queue_list))
+    load_balance_prcess = Process(target=hash_load_balance_process_handler,
+                                  args=(in_flag_queue, workers_queue_list, partial(start_worker, algo=algo)))
     process_list.append(load_balance_prcess)
     
     try:
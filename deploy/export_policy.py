@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+#
+# 从训练 checkpoint 中导出策略网络权重, 供 policy_runtime.PolicyRuntime 在部署时用 numpy 推理
+#
+#   RLlib (load_algo 使用的 PPO checkpoint) :
+#       python export_policy.py rllib <checkpoint_dir> -o policy.npz [--check 1000] [--onnx policy.onnx]
+#   Sample Factory (self_enjoy.py 使用的 checkpoint_p0/checkpoint_*.pth) :
+#       python export_policy.py sf <checkpoint.pth> -o policy.npz [--onnx policy.onnx]
+#
+# 导出只需要执行一次, 这里才需要 ray / torch, 部署时不需要
+#
+import argparse
+import json
+import logging
+import os
+import re
+
+import numpy as np
+
+from policy_runtime import PolicyRuntime, save_policy
+
+logging.basicConfig(level=logging.INFO)
+
+# Sample Factory RunningMeanStd 的默认参数 (sample_factory/algo/utils/running_mean_std.py)
+SF_NORM_EPS = 1e-5
+SF_NORM_CLIP = 5.0
+
+
+def _layer_index(key: str) -> list:
+    # "_hidden_layers.10._model.0.weight" -> [10, 0], state_dict 中的层按数字排序
+    return [int(n) for n in re.findall(r"\.(\d+)\.", key)]
+
+
+def _linear(weights: dict, prefix: str):
+    # torch Linear 的 weight 是 (out, in), 前向 x @ W.T, 导出为 (in, out)
+    return np.asarray(weights[f"{prefix}.weight"]).T, np.asarray(weights[f"{prefix}.bias"])
+
+
+def extract_rllib(weights: dict, model_config: dict) -> dict:
+    """
+    weights : policy.get_weights() of a torch FullyConnectedNetwork
+    model_config : policy.config["model"]
+    """
+    if model_config.get("use_lstm") or model_config.get("use_attention"):
+        raise ValueError("only the fcnet model can be exported")
+    hidden = sorted({k[:-len(".weight")] for k in weights
+                     if k.startswith("_hidden_layers.") and k.endswith(".weight")}, key=_layer_index)
+    layers = [_linear(weights, prefix) for prefix in hidden + ["_logits._model.0"]]
+    return dict(weights=[w for w, _ in layers], biases=[b for _, b in layers],
+                activation=model_config.get("fcnet_activation", "tanh"))
+
+
+def load_rllib(path: str):
+    # ray >= 2.1 可以不构建 PPO 直接从 checkpoint 恢复 policy, 否则退回 load_algo
+    try:
+        from ray.rllib.policy.policy import Policy
+        policy = Policy.from_checkpoint(path)
+        if isinstance(policy, dict):
+            policy = policy["default_policy"]
+    except (ImportError, AttributeError, ValueError) as e:
+        logging.info(f"Policy.from_checkpoint unavailable ({e}), restore with load_algo")
+        from rllib import load_algo
+        policy = load_algo(path).get_policy()
+    return policy
+
+
+def extract_sf(state_dict: dict, cfg: dict) -> dict:
+    """
+    state_dict : checkpoint_dict["model"] of a Sample Factory actor critic (use_rnn=False)
+    cfg : config.json of the experiment
+    """
+    if cfg.get("use_rnn"):
+        raise ValueError("only feed-forward policies (use_rnn=False) can be exported")
+    # actor_critic_share_weights=False 时 actor 有自己的 encoder
+    prefix = "actor_encoder." if any(k.startswith("actor_encoder.") for k in state_dict) else "encoder."
+    encoder = sorted({k[:-len(".weight")] for k, v in state_dict.items()
+                      if k.startswith(prefix) and k.endswith(".weight") and v.dim() == 2}, key=_layer_index)
+    if cfg.get("decoder_mlp_layers"):
+        decoder_prefix = "actor_decoder." if prefix == "actor_encoder." else "decoder."
+        encoder += sorted({k[:-len(".weight")] for k, v in state_dict.items()
+                           if k.startswith(decoder_prefix) and k.endswith(".weight") and v.dim() == 2},
+                          key=_layer_index)
+    weights = {k: v.detach().cpu().numpy() for k, v in state_dict.items()}
+    layers = [_linear(weights, p) for p in encoder + ["action_parameterization.distribution_linear"]]
+    policy = dict(weights=[w for w, _ in layers], biases=[b for _, b in layers],
+                  activation=cfg.get("nonlinearity", "tanh"))
+
+    if cfg.get("normalize_input", True):
+        mean = [k for k in weights if k.startswith("obs_normalizer.") and k.endswith("running_mean")]
+        var = [k for k in weights if k.startswith("obs_normalizer.") and k.endswith("running_var")]
+        if len(mean) != 1 or len(var) != 1:
+            raise ValueError(f"cannot find the obs normalizer in {list(weights)}")
+        policy.update(obs_mean=weights[mean[0]], obs_var=weights[var[0]],
+                      obs_eps=SF_NORM_EPS, obs_clip=SF_NORM_CLIP)
+    return policy
+
+
+def load_sf(path: str):
+    import torch
+    checkpoint_dict = torch.load(path, map_location="cpu")
+    # train_dir/<experiment>/checkpoint_p0/checkpoint_*.pth -> train_dir/<experiment>/config.json
+    cfg_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(path))), "config.json")
+    cfg = {}
+    if os.path.exists(cfg_path):
+        with open(cfg_path) as f:
+            cfg = json.load(f)
+    else:
+        logging.warning(f"{cfg_path} not found, assume the rlcc_utils defaults")
+    return checkpoint_dict["model"], cfg
+
+
+def export_onnx(runtime: PolicyRuntime, path: str):
+    # 用 torch 按导出的权重重建 MLP (含输入归一化), 导出给 onnxruntime
+    import torch
+    import torch.nn as nn
+
+    activations = {"tanh": nn.Tanh, "relu": nn.ReLU, "elu": nn.ELU, "linear": nn.Identity}
+
+    class Mlp(nn.Module):
+        def __init__(self):
+            super().__init__()
+            meta = runtime.meta
+            self.normalize = meta["normalize"]
+            if self.normalize:
+                self.register_buffer("mean", torch.from_numpy(runtime.obs_mean))
+                self.register_buffer("inv_std", torch.from_numpy(runtime.obs_inv_std.astype(np.float32)))
+                self.clip = meta["obs_clip"]
+            modules = []
+            for w, b in runtime.layers:
+                linear = nn.Linear(*w.shape)
+                linear.weight.data = torch.from_numpy(w.T.copy())
+                linear.bias.data = torch.from_numpy(b.copy())
+                modules += [linear, activations[meta["activation"]]()]
+            self.mlp = nn.Sequential(*modules[:-1])
+
+        def forward(self, obs):
+            if self.normalize:
+                obs = (obs - self.mean) * self.inv_std
+                if self.clip is not None:
+                    obs = obs.clamp(-self.clip, self.clip)
+            return self.mlp(obs)
+
+    torch.onnx.export(Mlp(), torch.zeros(1, runtime.obs_dim), path,
+                      input_names=["obs"], output_names=["logits"],
+                      dynamic_axes={"obs": {0: "batch"}, "logits": {0: "batch"}})
+
+
+def check_rllib(runtime: PolicyRuntime, policy, samples: int, seed: int = 0) -> bool:
+    """
+    compare the runtime with policy.compute_single_action(explore=False) on random observations
+    """
+    rng = np.random.default_rng(seed)
+    low = np.maximum(policy.observation_space.low, 0)
+    observations = (low + rng.exponential(10.0, (samples, runtime.obs_dim))).astype(np.float32)
+    logits = runtime.logits(observations)
+    mismatch, max_error = 0, 0.0
+    for obs, our_logits in zip(observations, logits):
+        action, _, extra = policy.compute_single_action(obs, explore=False)
+        max_error = max(max_error, float(np.abs(extra["action_dist_inputs"] - our_logits).max()))
+        mismatch += int(action) != int(our_logits.argmax())
+    logging.info(f"parity on {samples} observations : {mismatch} action mismatches, "
+                 f"max logit error {max_error:.2e}")
+    return mismatch == 0 and max_error < 1e-4
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', choices=['rllib', 'sf'], help='checkpoint format')
+    parser.add_argument('checkpoint', help='RLlib checkpoint directory or Sample Factory .pth')
+    parser.add_argument('-o', dest='output', default='policy.npz', help='exported policy')
+    parser.add_argument('--onnx', help='also export an .onnx model for onnxruntime')
+    parser.add_argument('--check', type=int, default=0,
+                        help='observations to compare against compute_single_action (rllib only)')
+    args = parser.parse_args()
+
+    if args.source == 'rllib':
+        policy = load_rllib(args.checkpoint)
+        exported = extract_rllib(policy.get_weights(), policy.config["model"])
+    else:
+        state_dict, cfg = load_sf(args.checkpoint)
+        exported = extract_sf(state_dict, cfg)
+    save_policy(args.output, source=args.source, checkpoint=os.path.abspath(args.checkpoint), **exported)
+    runtime = PolicyRuntime(args.output)
+    logging.info(f"{args.output} : {runtime.meta['layers']} layers, "
+                 f"{runtime.obs_dim} -> {runtime.num_actions}, {runtime.meta['activation']}")
+
+    if args.onnx:
+        export_onnx(runtime, args.onnx)
+        logging.info(f"{args.onnx} written")
+    if args.check:
+        if args.source != 'rllib':
+            parser.error("--check compares against RLlib compute_single_action, use it with rllib")
+        if not check_rllib(runtime, policy, args.check):
+            raise SystemExit("exported policy differs from the checkpoint")
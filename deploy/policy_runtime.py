@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#
+# 不依赖 ray / torch 的策略推理 : 读取 export_policy.py 导出的 .npz, 用 numpy 做 MLP 前向.
+# 部署 worker 只需要 numpy, 秒级以内启动, 内存只有几 MB.
+#
+# PolicyRuntime 提供与 RLlib Algorithm 相同的 compute_single_action, get_policy() 返回与 RLlib Policy
+# 签名相同的 RuntimePolicy, rllib.py 中的 rllib_predict_action(_sa / s) 可以直接传入 PolicyRuntime
+# 代替 load_algo() 的结果.
+#
+import json
+import numpy as np
+
+FORMAT_VERSION = 1
+
+ACTIVATIONS = {
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "elu": lambda x: np.where(x > 0, x, np.expm1(x)),
+    "linear": lambda x: x,
+}
+
+
+def save_policy(path: str, weights: list, biases: list, activation: str,
+                obs_mean=None, obs_var=None, obs_eps=0.0, obs_clip=None, **meta):
+    """
+    path : output .npz
+    weights : (in, out) matrices of every linear layer, the last one gives the action logits
+    biases : (out,) vectors of every linear layer
+    activation : hidden layer nonlinearity, a key of ACTIVATIONS
+    obs_mean, obs_var, obs_eps, obs_clip : input normalizer, obs = clip((obs - mean) / sqrt(var + eps))
+    meta : saved as is, e.g. source checkpoint
+    """
+    if activation not in ACTIVATIONS:
+        raise ValueError(f"unsupported activation {activation}")
+    meta = dict(meta, version=FORMAT_VERSION, layers=len(weights), activation=activation,
+                obs_dim=int(weights[0].shape[0]), num_actions=int(weights[-1].shape[1]),
+                normalize=obs_mean is not None, obs_eps=float(obs_eps), obs_clip=obs_clip)
+    arrays = {"meta": np.array(json.dumps(meta))}
+    for i, (w, b) in enumerate(zip(weights, biases)):
+        arrays[f"w{i}"] = np.asarray(w, dtype=np.float32)
+        arrays[f"b{i}"] = np.asarray(b, dtype=np.float32)
+    if obs_mean is not None:
+        arrays["obs_mean"] = np.asarray(obs_mean, dtype=np.float32)
+        arrays["obs_var"] = np.asarray(obs_var, dtype=np.float32)
+    np.savez(path, **arrays)
+
+
+class PolicyRuntime:
+    """
+    Forward pass of an exported policy with numpy, optionally onnxruntime.
+
+    path : .npz written by export_policy.py
+    onnx : optional .onnx written by export_policy.py --onnx, used when onnxruntime is installed
+    deterministic : argmax of the logits, as compute_single_action(explore=False).
+        Default False : sample the action from the logits, as compute_single_action(observation)
+        which deploy.py used with the RLlib checkpoint
+    seed : seed of the sampling
+    """
+
+    def __init__(self, path: str, onnx: str = None, deterministic: bool = False, seed: int = None):
+        with np.load(path) as data:
+            self.meta = json.loads(str(data["meta"]))
+            if self.meta["version"] != FORMAT_VERSION:
+                raise ValueError(f"{path} : policy format {self.meta['version']}, expect {FORMAT_VERSION}")
+            self.layers = [(data[f"w{i}"], data[f"b{i}"]) for i in range(self.meta["layers"])]
+            if self.meta["normalize"]:
+                self.obs_mean = data["obs_mean"]
+                self.obs_inv_std = 1 / np.sqrt(data["obs_var"] + self.meta["obs_eps"])
+        self.activation = ACTIVATIONS[self.meta["activation"]]
+        self.obs_dim = self.meta["obs_dim"]
+        self.num_actions = self.meta["num_actions"]
+        self.deterministic = deterministic
+        self.rng = np.random.default_rng(seed)
+
+        self.session = None
+        if onnx is not None:
+            try:
+                import onnxruntime
+            except ImportError:
+                onnxruntime = None  # 没有 onnxruntime 时退回 numpy
+            if onnxruntime is not None:
+                self.session = onnxruntime.InferenceSession(onnx, providers=["CPUExecutionProvider"])
+                self.input_name = self.session.get_inputs()[0].name
+
+    def logits(self, observations) -> np.ndarray:
+        """
+        observations : (N, obs_dim)
+        return (N, num_actions) action logits
+        """
+        x = np.asarray(observations, dtype=np.float32).reshape(-1, self.obs_dim)
+        if self.session is not None:
+            return self.session.run(None, {self.input_name: x})[0]
+        if self.meta["normalize"]:
+            x = (x - self.obs_mean) * self.obs_inv_std
+            if self.meta["obs_clip"] is not None:
+                np.clip(x, -self.meta["obs_clip"], self.meta["obs_clip"], out=x)
+        for w, b in self.layers[:-1]:
+            x = self.activation(x @ w + b)
+        w, b = self.layers[-1]
+        return x @ w + b
+
+    def _select(self, logits: np.ndarray, explore: bool = None) -> np.ndarray:
+        # explore : 与 RLlib 相同, None 使用构造时的 deterministic
+        if explore is None:
+            explore = not self.deterministic
+        if not explore:
+            return logits.argmax(axis=-1)
+        p = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        p /= p.sum(axis=-1, keepdims=True)
+        return (p.cumsum(axis=-1) > self.rng.random((len(p), 1))).argmax(axis=-1)
+
+    def compute_actions(self, observations, explore: bool = None):
+        # 与 RLlib Policy.compute_actions 相同的返回值 : actions, rnn states, extra fetches
+        logits = self.logits(observations)
+        return self._select(logits, explore), [], {"action_dist_inputs": logits}
+
+    def compute_single_action(self, observation, explore: bool = None) -> int:
+        # 与 RLlib Algorithm.compute_single_action 相同, 只返回动作
+        return int(self._select(self.logits(observation), explore)[0])
+
+    def get_policy(self) -> "RuntimePolicy":
+        return RuntimePolicy(self)
+
+
+class RuntimePolicy:
+    """
+    PolicyRuntime with the signatures of RLlib Policy, returned by PolicyRuntime.get_policy()
+
+    compute_single_action returns (action, rnn states, extra fetches) as Policy.compute_single_action,
+    where Algorithm.compute_single_action (and PolicyRuntime) return the action only.
+    """
+
+    def __init__(self, runtime: PolicyRuntime):
+        self.runtime = runtime
+
+    def compute_actions(self, observations, explore: bool = None):
+        return self.runtime.compute_actions(observations, explore)
+
+    def compute_single_action(self, observation, explore: bool = None):
+        actions, state_outs, extra = self.runtime.compute_actions(observation, explore)
+        return int(actions[0]), state_outs, {"action_dist_inputs": extra["action_dist_inputs"][0]}
@@ -1,21 +1,10 @@
-import ray
-import torch
-import torch.nn as nn
 import sys
 import gym
 import gym_rlcc
 from gym_rlcc.envs.rlcc_world_rllib import RlccEnvR
-from ray.rllib.algorithms import ppo
-from ray.tune.logger import pretty_print
-from ray.tune.registry import register_env
+from policy_runtime import PolicyRuntime
 
-from ray.rllib.models.torch.recurrent_net import RecurrentNetwork as TorchRNN
-from ray.rllib.examples.models.rnn_model import TorchRNNModel
-from ray.rllib.models import ModelCatalog
-
-ray.shutdown()
-# ray.init(ignore_reinit_error=True, _temp_dir="/media/seclee/18928D55928D37F0/raysesson")
-ray.init(ignore_reinit_error=True)
+# ray / torch 只在 load_algo 中导入 : 用 policy_runtime.PolicyRuntime 部署时不需要启动 ray
 
 class MultiEnv(gym.Env):
     def __init__(self, env_config):
@@ -33,11 +22,18 @@ class MultiEnv(gym.Env):
     def step(self, action):
         return self.env.step(action)
 
-register_env("multienv", lambda config: MultiEnv(config))
-
 def load_algo(path:str = "/home/ubuntu/xquic_mininet/rllib/single/qifashi/checkpoint_000087"):
     # https://zhuanlan.zhihu.com/p/363045859
     # https://zhuanlan.zhihu.com/p/80169381
+    import ray
+    from ray.rllib.algorithms import ppo
+    from ray.tune.registry import register_env
+
+    ray.shutdown()
+    # ray.init(ignore_reinit_error=True, _temp_dir="/media/seclee/18928D55928D37F0/raysesson")
+    ray.init(ignore_reinit_error=True)
+    register_env("multienv", lambda config: MultiEnv(config))
+
     algo = ppo.PPO(env="multienv", config={
         "simple_optimizer":True,  # bug 
         "framework":"torch",
@@ -64,6 +60,13 @@ def load_algo(path:str = "/home/ubuntu/xquic_mininet/rllib/single/qifashi/checkp
     algo.restore(path)
     return algo
 
+def load_model(directory: str = None, policy: str = None):
+    # policy : export_policy.py 导出的 .npz, numpy 推理, 不启动 ray
+    # directory : RLlib checkpoint, 用 load_algo 恢复完整的 PPO
+    if policy:
+        return PolicyRuntime(policy)
+    return load_algo(directory) if directory else load_algo()
+
 class SatccAction():
     def __init__(self) -> None:
         self.up_change_EMA = 0.1
@@ -76,7 +79,7 @@ class SatccAction():
                 2: 1,
             }
         
-    def EMA(new, old, rate): # rate 4, 8
+    def EMA(self, new, old, rate): # rate 4, 8
         return (1/rate)*new + ((rate-1)/rate)*old
 
     def step(self, action):
@@ -119,4 +122,10 @@ def rllib_predict_action_sa(observation, sa: SatccAction, algo):
 def rllib_predict_action(observation, algo):
     action = algo.compute_single_action(observation)
     action = action_to_direction[action]
-    return action
\ No newline at end of file
+    return action
+
+def rllib_predict_actions(observations, algo):
+    # 批量推理 : observations (N, obs_dim), 策略模型一次前向得到 N 个动作
+    # Box 状态空间没有 preprocessor / filter, 与 compute_single_action 结果一致
+    actions, _, _ = algo.get_policy().compute_actions(observations)
+    return [action_to_direction[a] for a in actions.tolist()]
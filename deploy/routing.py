@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# 按流(cid)亲和的消息路由 : 同一个流的状态总是交给同一个 worker,
+# 流相关的控制器状态(SatccAction 的 EMA 等)只存在于这个 worker 中.
+#
+# 运行时增加 worker : redis-cli publish rlccdeploy add_worker
+# 负载进程启动新 worker 并加入哈希环, 迁移到新 worker 的流在原 worker 中被清除, 在新 worker 中重新创建
+# (控制器状态不随流迁移, SatccAction 的 EMA 从头开始). 新 worker 是负载进程的子进程, 负载进程退出时结束它们.
+#
+import bisect
+import hashlib
+import logging
+import time
+
+CONTROL_CHANNEL = "rlccdeploy"  # 部署控制通道
+ADD_WORKER = "add_worker"       # 控制消息 : 增加一个 worker
+EVICT = "evict"                 # 发给 worker : 清除迁移走的流, {"type": EVICT, "cids": [...]}
+
+
+def stable_hash(key: str) -> int:
+    # python 的 hash() 每个进程随机, 路由要求所有进程结果一致
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring from cid to worker.
+
+    nodes : initial workers, e.g. worker ids
+    replicas : virtual nodes per worker, more replicas spread flows more evenly
+
+    Adding or removing a worker only moves the flows of the ring segments it takes over or
+    gives back (about 1/N of them), the other flows keep their worker and their state.
+    """
+
+    def __init__(self, nodes=(), replicas: int = 64):
+        self.replicas = replicas
+        self._keys = []     # sorted virtual node hashes
+        self._nodes = {}    # virtual node hash -> node
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node):
+        for i in range(self.replicas):
+            h = stable_hash(f"{node}#{i}")
+            if h in self._nodes:
+                continue
+            bisect.insort(self._keys, h)
+            self._nodes[h] = node
+
+    def remove_node(self, node):
+        for i in range(self.replicas):
+            h = stable_hash(f"{node}#{i}")
+            if self._nodes.get(h) == node:
+                del self._nodes[h]
+                self._keys.pop(bisect.bisect_left(self._keys, h))
+
+    @property
+    def nodes(self) -> set:
+        return set(self._nodes.values())
+
+    def get(self, key: str):
+        """
+        key : cid
+        return the worker owning the flow
+        """
+        if not self._keys:
+            raise LookupError("hash ring has no worker")
+        i = bisect.bisect(self._keys, stable_hash(key)) % len(self._keys)
+        return self._nodes[self._keys[i]]
+
+
+class Router:
+    """
+    HashRing routing that remembers the worker of every recent flow.
+
+    nodes, replicas : see HashRing
+    idle_timeout : seconds without a message before a flow is forgotten
+
+    add_node() returns the known flows that moved to the new worker, by the worker that
+    owned them, so their old worker can drop their state.
+    """
+
+    def __init__(self, nodes=(), replicas: int = 64, idle_timeout: float = 60.0):
+        self.ring = HashRing(nodes, replicas)
+        self.idle_timeout = idle_timeout
+        self.routes = {}    # cid -> [worker, time.monotonic() of the last message]
+        self.next_forget = time.monotonic() + idle_timeout
+
+    def route(self, cid: str, now: float = None):
+        """
+        return the worker of the flow
+        """
+        now = time.monotonic() if now is None else now
+        if now >= self.next_forget:
+            self.forget_idle(now)
+        node = self.ring.get(cid)
+        self.routes[cid] = [node, now]
+        return node
+
+    def add_node(self, node, now: float = None) -> dict:
+        """
+        return {old worker : [cids now routed to node]}
+        """
+        self.forget_idle(now)
+        self.ring.add_node(node)
+        moved = {}
+        for cid, route in self.routes.items():
+            new = self.ring.get(cid)
+            if new != route[0]:
+                moved.setdefault(route[0], []).append(cid)
+                route[0] = new
+        return moved
+
+    def forget_idle(self, now: float = None) -> list:
+        now = time.monotonic() if now is None else now
+        idle = [cid for cid, (_, seen) in self.routes.items() if now - seen > self.idle_timeout]
+        for cid in idle:
+            del self.routes[cid]
+        self.next_forget = now + self.idle_timeout
+        return idle
+
+
+def balance(in_queue, out_queues: list, start_worker=None, idle_timeout: float = 60.0):
+    """
+    Load balancer loop of the deploy scripts.
+
+    in_queue : redis pmessages of rlccstate_<cid>, {"type": ADD_WORKER} control messages, None stops the loop
+    out_queues : queue of every worker, the index is the worker id, new workers are appended
+    start_worker : start_worker(worker_id) starts a worker process and returns (queue, process),
+        None if the pool cannot grow
+    idle_timeout : see Router
+
+    The processes started here are children of the balancer, they are terminated and joined
+    when the loop stops (None or an exception).
+    Moved flows are dropped by their old worker (EVICT) and start with a new controller state
+    on the new worker, the old state is not sent along.
+    """
+    router = Router(range(len(out_queues)), idle_timeout=idle_timeout)
+    started = []
+    try:
+        while True:
+            msg = in_queue.get(True)
+            if msg is None:
+                return
+            if msg["type"] == ADD_WORKER:
+                if start_worker is None:
+                    logging.warning("load_blance_process: cannot add worker, no start_worker")
+                    continue
+                worker_id = len(out_queues)
+                worker_queue, process = start_worker(worker_id)
+                out_queues.append(worker_queue)
+                started.append(process)
+                moved = router.add_node(worker_id)
+                for old, cids in moved.items():
+                    # 排在这些流已分配的消息之后, 原 worker 处理完它们再清除
+                    out_queues[old].put({"type": EVICT, "cids": cids})
+                logging.info(f"load_blance_process: add worker {worker_id}, "
+                             f"{sum(len(c) for c in moved.values())} flows moved")
+                continue
+            cid = str(msg["channel"], encoding="utf-8").replace("rlccstate_", "", 1)
+            worker_id = router.route(cid)
+            logging.debug(f"load_blance_process: send msg {msg} to worker {worker_id}")
+            out_queues[worker_id].put(msg)  # 按 cid 分配消息, 同一个流总在同一个 worker
+    finally:
+        # 运行时增加的 worker 不在主进程的 process_list 中, 由负载进程结束
+        for process in started:
+            process.terminate()
+        for process in started:
+            process.join()
+
+
+class FlowTable:
+    """
+    Per-flow controller state owned by one worker.
+
+    factory : builds the state of an unseen cid, e.g. SatccAction
+    idle_timeout : seconds without a state before a flow is evicted
+
+    get() creates the state of a new flow on its first message, evict_idle() drops flows that
+    ended, evict() drops the flows that moved to an added worker.
+    """
+
+    def __init__(self, factory, idle_timeout: float = 60.0):
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.flows = {}     # cid -> state
+        self.last_seen = {}  # cid -> time.monotonic()
+
+    def __len__(self):
+        return len(self.flows)
+
+    def __contains__(self, cid):
+        return cid in self.flows
+
+    def get(self, cid: str, now: float = None):
+        now = time.monotonic() if now is None else now
+        self.last_seen[cid] = now
+        if cid not in self.flows:
+            self.flows[cid] = self.factory()
+        return self.flows[cid]
+
+    def evict(self, cids) -> list:
+        """
+        return the evicted cids that had a state
+        """
+        evicted = [cid for cid in cids if cid in self.flows]
+        for cid in evicted:
+            del self.flows[cid]
+            del self.last_seen[cid]
+        return evicted
+
+    def evict_idle(self, now: float = None) -> list:
+        """
+        return evicted cids
+        """
+        now = time.monotonic() if now is None else now
+        idle = [cid for cid, seen in self.last_seen.items() if now - seen > self.idle_timeout]
+        for cid in idle:
+            del self.flows[cid]
+            del self.last_seen[cid]
+        return idle
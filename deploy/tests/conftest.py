@@ -0,0 +1,10 @@
+import os
+import sys
+
+# policy_runtime.py / export_policy.py 在 deploy 目录下, 与部署脚本相同的导入方式
+DEPLOY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DEPLOY)
+try:
+    import gym_rlcc  # noqa: F401
+except ImportError:     # gym_rlcc 未安装时用源码目录
+    sys.path.insert(0, os.path.join(os.path.dirname(DEPLOY), "rlcc-playground-mininet", "gym-rlcc"))
@@ -0,0 +1,66 @@
+#
+# deploy_batch : one row per state in a batch window, latency of every state
+#
+
+import numpy as np
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from deploy_batch import LatencyStats, collect_batch
+from gym_rlcc.protocol import STATE_SCALE, StateDecoder, observation
+
+FIELDS = [37, 1284, 411701, 393194, 402231, 160240, 0, 12016, 0, 1288342, 1311744, 131174]
+
+
+def state(k):
+    return ';'.join(str(v * k) for v in FIELDS)
+
+
+def obs_of(k):
+    return observation(np.array(FIELDS, dtype=np.float64) * k / STATE_SCALE)
+
+
+@pytest.fixture
+def redis():
+    r = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    pub = r.pubsub()
+    pub.psubscribe("rlccstate_*")
+    pub.get_message(timeout=0.1)    # psubscribe 确认
+    return r, pub
+
+
+def test_every_state_gets_a_row(redis):
+    r, pub = redis
+    r.publish("rlccstate_1001", state(1))
+    r.publish("rlccstate_1001", b"init")     # 不是状态
+    r.publish("rlccstate_1002", state(2))
+    r.publish("rlccstate_1001", state(3))    # 同一流在窗口内的第二个状态
+    cids, states, received = collect_batch(pub, StateDecoder(parse_dtype=np.float64), window=0.05, max_batch=64)
+
+    assert cids == ["1001", "1002", "1001"]
+    np.testing.assert_allclose(states, [obs_of(1), obs_of(2), obs_of(3)], rtol=1e-6)
+    assert len(received) == 3 and received == sorted(received)
+
+
+def test_max_batch(redis):
+    r, pub = redis
+    for k in range(1, 6):
+        r.publish("rlccstate_1001", state(k))
+    decoder = StateDecoder(parse_dtype=np.float64)
+    cids, states, _ = collect_batch(pub, decoder, window=1.0, max_batch=3)
+    assert cids == ["1001"] * 3
+    np.testing.assert_allclose(states[-1], obs_of(3), rtol=1e-6)
+    cids, states, _ = collect_batch(pub, decoder, window=0.05, max_batch=3)
+    np.testing.assert_allclose(states, [obs_of(4), obs_of(5)], rtol=1e-6)
+
+
+def test_latency_stats():
+    stats = LatencyStats(size=4)
+    assert stats.report() == "no action yet"
+    stats.add(np.array([1.0, 1.5, 2.0]), 2.0)
+    stats.add(np.array([2.0, 2.5]), 3.0)
+    assert (stats.count, stats.batches) == (5, 2)
+    # 只保留最近 4 个样本
+    np.testing.assert_allclose(sorted(stats.latency), [0.0, 0.5, 0.5, 1.0])
+    assert "avg batch 2.5" in stats.report()
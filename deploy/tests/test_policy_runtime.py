@@ -0,0 +1,143 @@
+#
+# policy_runtime.PolicyRuntime : numpy forward pass and action selection, and parity with the
+# RLlib checkpoint it is exported from (skipped without ray / torch)
+#
+# cd deploy; python -m pytest tests
+#
+
+import numpy as np
+import pytest
+
+from policy_runtime import PolicyRuntime, save_policy
+
+OBS_DIM = 4
+LOGITS = np.array([0.5, 1.5, -0.5], dtype=np.float32)
+
+
+def softmax(logits):
+    p = np.exp(logits - logits.max())
+    return p / p.sum()
+
+
+@pytest.fixture
+def linear_policy(tmp_path):
+    # 一层 linear : logits = obs @ w + b, obs = 0 时 logits = LOGITS
+    path = str(tmp_path / "policy.npz")
+    rng = np.random.default_rng(0)
+    save_policy(path, [rng.normal(size=(OBS_DIM, len(LOGITS)))], [LOGITS], "linear")
+    return path
+
+
+def frequencies(actions, n):
+    return np.bincount(actions, minlength=n) / len(actions)
+
+
+def test_samples_by_default(linear_policy):
+    runtime = PolicyRuntime(linear_policy, seed=1)
+    obs = np.zeros(OBS_DIM, dtype=np.float32)
+    actions = [runtime.compute_single_action(obs) for _ in range(20000)]
+    np.testing.assert_allclose(frequencies(actions, len(LOGITS)), softmax(LOGITS), atol=0.015)
+
+    batch, _, extra = runtime.compute_actions(np.zeros((20000, OBS_DIM), dtype=np.float32))
+    np.testing.assert_allclose(frequencies(batch, len(LOGITS)), softmax(LOGITS), atol=0.015)
+    np.testing.assert_allclose(extra["action_dist_inputs"][0], LOGITS, rtol=1e-6)
+
+
+def test_deterministic_and_explore(linear_policy):
+    obs = np.zeros(OBS_DIM, dtype=np.float32)
+    deterministic = PolicyRuntime(linear_policy, deterministic=True)
+    assert {deterministic.compute_single_action(obs) for _ in range(100)} == {int(LOGITS.argmax())}
+    # explore 覆盖构造参数, 与 RLlib compute_single_action(explore=...) 相同
+    sampling = PolicyRuntime(linear_policy, seed=1)
+    assert {sampling.compute_single_action(obs, explore=False) for _ in range(100)} == {int(LOGITS.argmax())}
+    assert len({deterministic.compute_single_action(obs, explore=True) for _ in range(100)}) > 1
+
+
+def test_get_policy_has_policy_signatures(linear_policy):
+    # RLlib : Algorithm.compute_single_action 返回动作, Policy.compute_single_action 返回三元组
+    obs = np.zeros(OBS_DIM, dtype=np.float32)
+    runtime = PolicyRuntime(linear_policy, deterministic=True)
+    policy = runtime.get_policy()
+    action, state_outs, extra = policy.compute_single_action(obs)
+    assert action == runtime.compute_single_action(obs) == int(LOGITS.argmax())
+    assert state_outs == []
+    np.testing.assert_allclose(extra["action_dist_inputs"], LOGITS, rtol=1e-6)
+
+    actions, state_outs, extra = policy.compute_actions(np.zeros((3, OBS_DIM), dtype=np.float32))
+    assert actions.tolist() == [int(LOGITS.argmax())] * 3 and state_outs == []
+    assert extra["action_dist_inputs"].shape == (3, len(LOGITS))
+    assert len({policy.compute_single_action(obs, explore=True)[0] for _ in range(100)}) > 1
+
+
+def test_rllib_predict_with_runtime(linear_policy):
+    # rllib.py 的推理函数直接使用 PolicyRuntime, 不需要 ray
+    rllib = pytest.importorskip("rllib")
+    runtime = PolicyRuntime(linear_policy, deterministic=True)
+    direction = rllib.action_to_direction[int(LOGITS.argmax())]
+    assert rllib.rllib_predict_action(np.zeros(OBS_DIM, dtype=np.float32), runtime) == direction
+    assert rllib.rllib_predict_actions(np.zeros((4, OBS_DIM), dtype=np.float32), runtime) == [direction] * 4
+
+
+def test_seed_reproducible(linear_policy):
+    obs = np.zeros((50, OBS_DIM), dtype=np.float32)
+    first, _, _ = PolicyRuntime(linear_policy, seed=3).compute_actions(obs)
+    second, _, _ = PolicyRuntime(linear_policy, seed=3).compute_actions(obs)
+    np.testing.assert_array_equal(first, second)
+
+
+@pytest.fixture(scope="module")
+def rllib_algo():
+    pytest.importorskip("torch")
+    ray = pytest.importorskip("ray")
+    gym = pytest.importorskip("gym")
+    from ray.rllib.algorithms import ppo
+
+    class ParityEnv(gym.Env):
+        def __init__(self, env_config=None):
+            self.observation_space = gym.spaces.Box(0, np.finfo(np.float32).max, (OBS_DIM,), dtype=np.float32)
+            self.action_space = gym.spaces.Discrete(3)
+
+        def reset(self):
+            return np.zeros(OBS_DIM, dtype=np.float32)
+
+        def step(self, action):
+            return np.zeros(OBS_DIM, dtype=np.float32), 0.0, True, {}
+
+    ray.shutdown()
+    ray.init(ignore_reinit_error=True, num_cpus=1)
+    algo = ppo.PPO(env=ParityEnv, config={
+        "framework": "torch",
+        "disable_env_checking": True,
+        "num_workers": 0,
+        "num_gpus": 0,
+        "model": {"fcnet_hiddens": [32, 16]},
+    })
+    yield algo
+    algo.stop()
+    ray.shutdown()
+
+
+@pytest.fixture(scope="module")
+def exported(rllib_algo, tmp_path_factory):
+    from export_policy import extract_rllib
+    policy = rllib_algo.get_policy()
+    path = str(tmp_path_factory.mktemp("export") / "policy.npz")
+    save_policy(path, **extract_rllib(policy.get_weights(), policy.config["model"]))
+    return path
+
+
+def test_rllib_argmax_parity(rllib_algo, exported):
+    from export_policy import check_rllib
+    assert check_rllib(PolicyRuntime(exported, deterministic=True), rllib_algo.get_policy(), 200)
+
+
+def test_rllib_sampling_parity(rllib_algo, exported):
+    # 部署默认 : algo.compute_single_action(observation), explore=True, 从 logits 采样
+    runtime = PolicyRuntime(exported, seed=0)
+    obs = np.random.default_rng(0).exponential(10.0, OBS_DIM).astype(np.float32)
+    draws = 3000
+    rllib_actions = [int(rllib_algo.compute_single_action(obs)) for _ in range(draws)]
+    runtime_actions = [runtime.compute_single_action(obs) for _ in range(draws)]
+    expected = softmax(runtime.logits(obs)[0])
+    np.testing.assert_allclose(frequencies(rllib_actions, 3), expected, atol=0.04)
+    np.testing.assert_allclose(frequencies(runtime_actions, 3), expected, atol=0.04)
@@ -0,0 +1,139 @@
+#
+# routing : consistent hash routing, adding a worker at runtime, moving its flows and stopping it
+#
+
+import multiprocessing
+import queue
+import time
+
+import pytest
+
+from routing import ADD_WORKER, EVICT, FlowTable, HashRing, Router, balance
+
+CIDS = [f"{1000 + i}" for i in range(2000)]
+
+
+def pmessage(cid, data=b"state"):
+    return {"type": "pmessage", "channel": f"rlccstate_{cid}".encode(), "data": data}
+
+
+def test_add_node_moves_flows_to_new_node_only():
+    router = Router(range(3))
+    before = {cid: router.route(cid, now=0.0) for cid in CIDS}
+    moved = router.add_node(3, now=0.0)
+    after = {cid: router.route(cid, now=0.0) for cid in CIDS}
+
+    changed = {cid for cid in CIDS if before[cid] != after[cid]}
+    assert all(after[cid] == 3 for cid in changed)
+    assert {cid for cids in moved.values() for cid in cids} == changed
+    assert all(before[cid] == old for old, cids in moved.items() for cid in cids)
+    assert 0.15 < len(changed) / len(CIDS) < 0.35     # 约 1/4
+
+
+def test_router_matches_ring():
+    router, ring = Router(range(4)), HashRing(range(4))
+    assert all(router.route(cid) == ring.get(cid) for cid in CIDS[:100])
+
+
+def test_idle_flows_are_forgotten():
+    router = Router(range(2), idle_timeout=10.0)
+    router.route("1001", now=0.0)
+    router.route("1002", now=8.0)
+    assert router.forget_idle(now=15.0) == ["1001"]
+    assert list(router.routes) == ["1002"]
+
+
+def test_flow_table_evict():
+    flows = FlowTable(dict)
+    flows.get("1001")
+    flows.get("1002")
+    assert flows.evict(["1001", "1003"]) == ["1001"]
+    assert "1001" not in flows and "1002" in flows
+
+
+def drain(q):
+    items = []
+    while not q.empty():
+        items.append(q.get_nowait())
+    return items
+
+
+class FakeProcess:
+    def __init__(self):
+        self.calls = []
+
+    def terminate(self):
+        self.calls.append("terminate")
+
+    def join(self):
+        self.calls.append("join")
+
+
+def test_balance_adds_worker_and_moves_flows():
+    in_queue = queue.Queue()
+    workers = [queue.Queue(), queue.Queue()]
+    started = []
+    process = FakeProcess()
+
+    def start_worker(worker_id):
+        started.append(worker_id)
+        return queue.Queue(), process
+
+    cids = CIDS[:200]
+    for cid in cids:
+        in_queue.put(pmessage(cid))
+    in_queue.put({"type": ADD_WORKER})
+    for cid in cids:
+        in_queue.put(pmessage(cid))
+    in_queue.put(None)
+    balance(in_queue, workers, start_worker)
+
+    assert started == [2] and len(workers) == 3
+    assert process.calls == ["terminate", "join"]   # 负载进程结束时结束它启动的 worker
+    received = [drain(q) for q in workers]
+    new_cids = {m["channel"].decode()[len("rlccstate_"):] for m in received[2]}
+    assert new_cids and all(m["type"] == "pmessage" for m in received[2])
+    for old in (0, 1):
+        messages = received[old]
+        evict = [i for i, m in enumerate(messages) if m["type"] == EVICT]
+        assert len(evict) == 1
+        # 原 worker 先处理迁移前的消息, 然后清除, 之后不再收到迁移走的流
+        evicted = set(messages[evict[0]]["cids"])
+        assert evicted <= new_cids
+        after = {m["channel"].decode()[len("rlccstate_"):] for m in messages[evict[0] + 1:]}
+        assert not after & new_cids
+    assert new_cids == set(received[0][[m["type"] for m in received[0]].index(EVICT)]["cids"]) | \
+        set(received[1][[m["type"] for m in received[1]].index(EVICT)]["cids"])
+
+
+def test_balance_without_start_worker_keeps_pool():
+    in_queue = queue.Queue()
+    workers = [queue.Queue()]
+    for msg in (pmessage("1001"), {"type": ADD_WORKER}, pmessage("1001"), None):
+        in_queue.put(msg)
+    balance(in_queue, workers)
+    assert len(workers) == 1 and len(drain(workers[0])) == 2
+
+
+class Broken(dict):
+    def __getitem__(self, key):
+        raise RuntimeError("broken message")
+
+
+def test_balance_stops_started_workers():
+    # 真实的子进程 : 负载循环异常退出时也不会留下孤儿进程
+    in_queue = queue.Queue()
+    processes = []
+
+    def start_worker(worker_id):
+        process = multiprocessing.Process(target=time.sleep, args=(60,))
+        process.start()
+        processes.append(process)
+        return queue.Queue(), process
+
+    for msg in ({"type": ADD_WORKER}, {"type": ADD_WORKER}, Broken()):
+        in_queue.put(msg)
+    with pytest.raises(RuntimeError):
+        balance(in_queue, [queue.Queue()], start_worker)
+    assert len(processes) == 2
+    assert all(not p.is_alive() and p.exitcode is not None for p in processes)
@@ -1,17 +1,29 @@
 import argparse
 import dpkt
+import numpy as np
 import socket
 import os
 import sys
 import glob
+import heapq
 import gzip
+import io
+import contextlib
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
 
 from helper.csv_writer import write_to_csv, read_from_csv
-from helper.pcap_data import PcapData, DataInfo
+from helper.npz_data import write_to_npz, read_from_npz
+from helper.analysis_cache import AnalysisCache
+from helper.log_parser import parse_bbr_and_cwnd_values, parse_buffer_backlog
+from helper.pcap_data import PcapData, DataInfo, series
+from helper.tcp_state import UnackedSequences, TimestampEchoes
+from helper.udp_flows import FlowStats, UDP_IDLE_TIMEOUT
 from helper.create_plots import plot_all
-from helper.util import check_directory, print_line, open_compressed_file, colorize, get_ip_from_filename, get_interface_from_filename
+from helper.util import check_directory, print_line, print_error, open_compressed_stream, colorize
 
-from helper import PCAP1, PCAP2, PLOT_PATH, CSV_PATH, PLOT_TYPES
+from helper import PCAP1, PCAP2, PLOT_PATH, CSV_PATH, CACHE_PATH, PLOT_TYPES
 from helper import BUFFER_FILE_EXTENSION, FLOW_FILE_EXTENSION
 from helper import COMPRESSION_METHODS, COMPRESSION_EXTENSIONS
 
@@ -21,10 +33,10 @@ def main():
     parser.add_argument('-d --directory', dest='directory',
                         default='.', help='Path to the working directory (default: .)')
     parser.add_argument('-s', dest='source',
-                        choices=['pcap', 'csv'],
-                        default='pcap', help='Create plots from csv or pcap')
+                        choices=['pcap', 'csv', 'npz'],
+                        default='pcap', help='Create plots from csv, npz or pcap')
     parser.add_argument('-o', dest='output',
-                        choices=['pdf+csv', 'pdf', 'csv'],
+                        choices=['pdf+csv', 'pdf', 'csv', 'pdf+npz', 'npz'],
                         default='pdf+csv', help='Output Format (default: pdf+csv)')
     parser.add_argument('-t', dest='delta_t',
                         default='0.2', help='Interval in seconds for computing average throughput,... '
@@ -44,6 +56,16 @@ def main():
                         help='Compression method of the output files. Default: {}'.format(COMPRESSION_METHODS[1]))
     parser.add_argument('--all-plots', dest='all_plots', action='store_true',
                         help='Additionally store each plot in an individual PDF file.')
+    parser.add_argument('-j --jobs', dest='jobs', type=int, default=1,
+                        help='Number of directories processed in parallel (default: 1). With 1, the captures '
+                             'and the plots of the directory are processed in parallel instead. plot_complete.pdf '
+                             'is one figure rendered by one process, only the --all-plots / --image files are '
+                             'rendered alongside it, so a default run draws its plots sequentially.')
+    parser.add_argument('--image', dest='image_formats', action='append', choices=['png', 'svg'], default=[],
+                        help='Additionally store each plot as an image for a quick look, can be given twice.')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='Parse all inputs again instead of reusing the series cached in {} '
+                             'from previous runs.'.format(CACHE_PATH))
 
     args = parser.parse_args()
 
@@ -69,45 +91,220 @@ def main():
 
     paths = sorted(paths)
 
-    for i, directory in enumerate(paths):
-        print('{}/{} Processing {}'.format(i + 1, len(paths), directory))
-        if args.source == 'pcap':
+    failures = []
+
+    if args.jobs > 1 and len(paths) > 1:
+        # every directory runs in its own process, its output is printed as one block once it is done
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {executor.submit(process_directory_quiet, directory, args, plots): directory
+                       for directory in paths}
+            for i, future in enumerate(as_completed(futures)):
+                directory = futures[future]
+                output, error = future.result()
+                print('{}/{} Processed {}'.format(i + 1, len(paths), directory))
+                print(output, end='')
+                if error is not None:
+                    print_error(error)
+                    failures.append((directory, error))
+    else:
+        for i, directory in enumerate(paths):
+            print('{}/{} Processing {}'.format(i + 1, len(paths), directory))
+            try:
+                process_directory(directory, args, plots)
+            except Exception:
+                error = traceback.format_exc()
+                print_error(error)
+                failures.append((directory, error))
+
+    if len(failures) > 0:
+        print_error('{}/{} directories failed:'.format(len(failures), len(paths)))
+        for directory, error in failures:
+            print_error('  {}: {}'.format(directory, error.strip().splitlines()[-1]))
+        sys.exit(1)
+
+
+def process_directory(directory, args, plots):
+    if args.source == 'pcap':
+
+        # directories already run in parallel with -j, parse their captures sequentially
+        pcap_data = parse_pcap(path=directory, delta_t=float(args.delta_t), parallel=args.jobs <= 1,
+                               use_cache=args.cache)
+
+        if 'csv' in args.output:
+            string = 'Writing to CSV'
+            if args.compression != COMPRESSION_METHODS[0]:
+                string += ' and compressing with {}'.format(args.compression)
+            print(string)
+            write_to_csv(directory, pcap_data, compression=args.compression)
+
+        if 'npz' in args.output:
+            print('Writing to NPZ')
+            write_to_npz(directory, pcap_data)
+    elif args.source == 'npz':
+        pcap_data = read_from_npz(directory)
+    else:
+        pcap_data = read_from_csv(directory)
+        if pcap_data == -1:
+            return
+
+    if 'pdf' in args.output:
+        if args.all_plots or len(args.image_formats) > 0:
+            print('Creating {} plots'.format(len(plots) + 1))
+        else:
+            print('Creating Complete plot')
+        # like the captures, the plots of a directory are only rendered in parallel without -j
+        plot_jobs = (os.cpu_count() or 1) if args.jobs <= 1 else 1
+        plot_all(directory, pcap_data, plot_only=plots, hide_total=args.hide_total, all_plots=args.all_plots,
+                 image_formats=args.image_formats, jobs=plot_jobs)
+
+
+def process_directory_quiet(directory, args, plots):
+    # Runs in a worker process. Returns (output, traceback or None), the output keeps only
+    # what a terminal would show of the progress lines overwritten with '\r'.
+    output = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(output):
+        try:
+            process_directory(directory, args, plots)
+        except Exception:
+            error = traceback.format_exc()
+    lines = [line.rstrip('\r').rsplit('\r', 1)[-1] for line in output.getvalue().split('\n')]
+    return ''.join(line + '\n' for line in lines if line.strip() != ''), error
+
+
+def parse_pcap(path, delta_t, parallel=True, use_cache=True):
+    # Find correct .pcap files
+    pcap1 = glob.glob(os.path.join(path, PCAP1 + '*'))[0]
+    pcap2 = glob.glob(os.path.join(path, PCAP2 + '*'))[0]
 
-            pcap_data = parse_pcap(path=directory, delta_t=float(args.delta_t))
+    # both captures are binned from the first frame of the sender capture
+    start_ts = peek_start_ts(pcap1)
 
-            if 'csv' in args.output:
-                string = 'Writing to CSV'
-                if args.compression != COMPRESSION_METHODS[0]:
-                    string += ' and compressing with {}'.format(args.compression)
-                print(string)
-                write_to_csv(directory, pcap_data, compression=args.compression)
+    captures = {
+        'sender': (parse_sender_capture, pcap1),
+        'bottleneck': (parse_bottleneck_capture, pcap2),
+    }
+    cache = AnalysisCache(path) if use_cache else None
+    keys = {}
+    results = {}
+    for name, (_, capture) in captures.items():
+        if cache is not None:
+            keys[name] = cache.key([capture], delta_t=delta_t, start_ts=start_ts)
+            results[name] = cache.load(cache_entry(name, delta_t), keys[name])
+            if results[name] is not None:
+                print('  Using cached {} capture {}.'.format(name, os.path.basename(capture)))
+    missing = [name for name in captures if results.get(name) is None]
+
+    if len(missing) > 0:
+        paths = [captures[name][1] for name in missing]
+        print('  Found {} MB of captures.'.format(
+            colorize('{:.1f}'.format(CaptureProgress(paths).total / 1e6), 'green')))
+
+        print('Connections:')
+        if parallel and len(missing) > 1:
+            # s1 and s3 are independent, parse them in two processes
+            offsets = multiprocessing.Array('d', len(paths), lock=False)
+            progress = CaptureProgress(paths, offsets=offsets)
+            with ProcessPoolExecutor(max_workers=len(missing), initializer=init_capture_worker,
+                                     initargs=(offsets,)) as executor:
+                futures = {name: executor.submit(parse_capture_in_worker, captures[name][0], captures[name][1],
+                                                 paths, delta_t, start_ts)
+                           for name in missing}
+                progress.wait(list(futures.values()))
+                frames = 0
+                for name, future in futures.items():
+                    results[name], capture_frames = future.result()
+                    frames += capture_frames
         else:
-            pcap_data = read_from_csv(directory)
-            if pcap_data == -1:
-                continue
+            progress = CaptureProgress(paths)
+            for name in missing:
+                parse_function, capture = captures[name]
+                results[name] = parse_function(capture, delta_t, start_ts, progress)
+            frames = progress.frames
 
-        if 'pdf' in args.output:
-            if args.all_plots:
-                print('Creating {} plots'.format(len(plots) + 1))
-            else:
-                print('Creating Complete plot')
-            plot_all(directory, pcap_data, plot_only=plots, hide_total=args.hide_total, all_plots=args.all_plots)
+        print_line('  100.00%', new_line=True)
+        print('  Processed {} frames.'.format(colorize(frames, 'green')))
 
+        if cache is not None:
+            for name in missing:
+                cache.store(cache_entry(name, delta_t), keys[name], results[name])
 
-def parse_pcap(path, delta_t):
-    # Find correct .pcap files
-    pcap1 = glob.glob(os.path.join(path, PCAP1 + '*'))[0]
-    pcap2 = glob.glob(os.path.join(path, PCAP2 + '*'))[0]
+    sender = results['sender']
+    bottleneck = results['bottleneck']
 
-    total_packets = len(list(dpkt.pcap.Reader(open_compressed_file(pcap1)))) + \
-                    len(list(dpkt.pcap.Reader(open_compressed_file(pcap1))))
-    print('  Found {} frames.'.format(colorize(total_packets, 'green')))
-    processed_packets = 0
+    throughput = bottleneck['throughput']
+    sending_rate = sender['sending_rate']
 
-    f = open_compressed_file(pcap1)
+    fairness_troughput = compute_fairness({c: v for c, v in throughput.items() if c != 'total'}, delta_t)
+    fairness_sending_rate = compute_fairness({c: v for c, v in sending_rate.items() if c != 'total'}, delta_t)
+    fairness = {
+        'Throughput': fairness_troughput,
+        'Sending Rate': fairness_sending_rate
+    }
+
+    logs = parse_logs(path, cache)
+    bbr_values, cwnd_values, ss_values = logs['bbr_values'], logs['cwnd_values'], logs['ss_values']
+    bbr_total_values, sync_phases, sync_duration = compute_total_values(bbr_values)
+    buffer_backlog = logs['buffer_backlog']
+
+    flow_stats = {}
+    if len(sender['udp_sent']) > 0:
+        flow_stats = {
+            'Sent (s1)': sender['udp_sent'],
+            'Acks (s1)': sender['udp_acks'],
+            'Received (s3)': bottleneck['udp_received'],
+        }
+
+    data_info = DataInfo(sync_duration=sync_duration,
+                         sync_phases=sync_phases,
+                         flow_stats=flow_stats)
+
+    return PcapData(rtt=sender['rtt'],
+                    inflight=sender['inflight'],
+                    throughput=throughput,
+                    fairness=fairness,
+                    avg_rtt=sender['avg_rtt'],
+                    sending_rate=sending_rate,
+                    bbr_values=bbr_values,
+                    bbr_total_values=bbr_total_values,
+                    cwnd_values=cwnd_values,
+                    retransmissions=sender['retransmissions'],
+                    retransmissions_interval=sender['retransmissions_interval'],
+                    buffer_backlog=buffer_backlog,
+                    ss_values=ss_values,
+                    data_info=data_info).finalize()
+
+
+def cache_entry(capture, delta_t):
+    # one entry per interval, switching -t back and forth reuses both
+    return '{}-{}'.format(capture, delta_t)
+
+
+def parse_logs(path, cache=None):
+    # ss (bbr, cwnd, ss -tin) and tc (buffer backlog) logs, they do not depend on delta_t
+    inputs = glob.glob(os.path.join(path, '*.{}*'.format(FLOW_FILE_EXTENSION))) + \
+        glob.glob(os.path.join(path, '*.{}*'.format(BUFFER_FILE_EXTENSION)))
+    if cache is not None:
+        key = cache.key(inputs)
+        logs = cache.load('logs', key)
+        if logs is not None:
+            print('  Using cached logs.')
+            return logs
+
+    bbr_values, cwnd_values, ss_values = parse_bbr_and_cwnd_values(path)
+    logs = {
+        'bbr_values': bbr_values,
+        'cwnd_values': cwnd_values,
+        'ss_values': ss_values,
+        'buffer_backlog': parse_buffer_backlog(path),
+    }
+    if cache is not None:
+        cache.store('logs', key, logs)
+    return logs
 
-    pcap = dpkt.pcap.Reader(f)
 
+def parse_sender_capture(pcap1, delta_t, start_ts, progress):
+    # sending rate, RTT, inflight and retransmissions of every connection, before the bottleneck
     connections = []
     active_connections = []
 
@@ -125,36 +322,30 @@ def parse_pcap(path, delta_t):
 
     avg_rtt_samples = {}
 
-    total_throughput = ([], [])
-    total_sending_rate = ([], [])
+    total_sending_rate = series(2)
 
     retransmissions = {}
     retransmission_counter = {}
     packet_counter = {}
     retransmissions_interval = {}
-    total_retransmisions = ([], [], [])
+    total_retransmisions = series(3)
 
     start_seq = {}
 
-    t = 0
-
     ts_vals = {}
     seqs = {}
 
-    start_ts = -1
-
-    print('Connections:')
-    for ts, buf in pcap:
-        if start_ts < 0:
-            start_ts = ts
-            t = start_ts + delta_t
+    # UDP (xquic) flows, client -> server and server -> client datagrams
+    udp_sent = {}
+    udp_acks = {}
 
-        processed_packets += 1
-        if processed_packets % 500 == 0:
-            print_progress(processed_packets, total_packets)
+    t = start_ts + delta_t
 
+    for ts, buf in progress.packets(pcap1):
         eth = dpkt.ethernet.Ethernet(buf)
         ip = eth.data
+        if not is_transport_packet(ip):
+            continue
         tcp = ip.data
 
         src_ip = socket.inet_ntoa(ip.src)
@@ -197,6 +388,13 @@ def parse_pcap(path, delta_t):
                 retransmission_counter[key] = 0
                 packet_counter[key] = 0
 
+                if key in udp_sent:
+                    # QUIC headers are encrypted, no inflight / RTT samples for UDP flows
+                    if t - udp_sent[key].last_ts > UDP_IDLE_TIMEOUT:
+                        active_connections.remove(key)
+                        print('  [IDLE] {}:{} -> {}:{}'.format(*key))
+                    continue
+
                 inflight[key][0].append(t)
                 if len(inflight_avg[key]) > 0:
                     inflight[key][1].append(sum(inflight_avg[key]) / len(inflight_avg[key]))
@@ -212,6 +410,33 @@ def parse_pcap(path, delta_t):
 
             t += delta_t
 
+        if ip.p == dpkt.ip.IP_PROTO_UDP:
+            udp_tuple = tcp_tuple
+            if src_port > dst_port:
+                # client -> server
+                if udp_tuple not in udp_sent:
+                    # no handshake visible : a flow starts with its first datagram
+                    connections.append(udp_tuple)
+                    sending_rate[udp_tuple] = series(2)
+                    sending_rate_data_size[udp_tuple] = 0
+                    retransmissions[udp_tuple] = series(1)
+                    retransmission_counter[udp_tuple] = 0
+                    packet_counter[udp_tuple] = 0
+                    retransmissions_interval[udp_tuple] = series(3)
+                    udp_sent[udp_tuple] = FlowStats()
+                if udp_tuple not in active_connections:
+                    active_connections.append(udp_tuple)
+                    print('  [UDP] {}:{} -> {}:{}'.format(*udp_tuple))
+                packet_counter[udp_tuple] += 1
+                sending_rate_data_size[udp_tuple] += ip.len * 8
+                udp_sent[udp_tuple].add(ts, ip.len)
+            else:
+                # server -> client
+                if udp_tuple not in udp_acks:
+                    udp_acks[udp_tuple] = FlowStats()
+                udp_acks[udp_tuple].add(ts, ip.len)
+            continue
+
         if tcp.flags & 0x02 and tcp_tuple not in connections:
             connections.append(tcp_tuple)
             active_connections.append(tcp_tuple)
@@ -219,13 +444,13 @@ def parse_pcap(path, delta_t):
 
             start_seq[connection_index] = tcp.seq
 
-            round_trips[connection_index] = ([], [])
-            inflight[connection_index] = ([], [])
-            avg_rtt[connection_index] = ([], [])
-            sending_rate[connection_index] = ([], [])
+            round_trips[connection_index] = series(2)
+            inflight[connection_index] = series(2)
+            avg_rtt[connection_index] = series(2)
+            sending_rate[connection_index] = series(2)
 
-            ts_vals[connection_index] = ([], [])
-            seqs[connection_index] = []
+            ts_vals[connection_index] = TimestampEchoes()
+            seqs[connection_index] = UnackedSequences()
 
             inflight_seq[connection_index] = 0
             inflight_ack[connection_index] = 0
@@ -236,10 +461,10 @@ def parse_pcap(path, delta_t):
 
             avg_rtt_samples[connection_index] = []
 
-            retransmissions[connection_index] = ([],)
+            retransmissions[connection_index] = series(1)
             retransmission_counter[connection_index] = 0
             packet_counter[connection_index] = 0
-            retransmissions_interval[connection_index] = ([], [], [])
+            retransmissions_interval[connection_index] = series(3)
 
             print('  [SYN] {}:{} -> {}:{}'.format(tcp_tuple[0], tcp_tuple[1],
                                                   tcp_tuple[2], tcp_tuple[3]))
@@ -278,10 +503,9 @@ def parse_pcap(path, delta_t):
                 retransmission_counter[connection_index] += 1
 
             else:
-                seqs[connection_index].append(tcp_seq)
+                seqs[connection_index].add(tcp_seq)
                 if ts_val is not None:
-                    ts_vals[connection_index][0].append(ts)
-                    ts_vals[connection_index][1].append(ts_val)
+                    ts_vals[connection_index].add(ts_val, ts)
 
         else:
             # server -> client
@@ -291,14 +515,11 @@ def parse_pcap(path, delta_t):
 
             inflight_ack[connection_index] = max(tcp_ack, inflight_ack[connection_index])
 
-            seqs[connection_index] = [x for x in seqs[connection_index] if x >= tcp_ack]
+            seqs[connection_index].ack(tcp_ack)
 
-            if ts_ecr in ts_vals[connection_index][1]:
-                index = ts_vals[connection_index][1].index(ts_ecr)
-                rtt = (ts - ts_vals[connection_index][0][index]) * 1000
-
-                ts_vals[connection_index][0].pop(index)
-                ts_vals[connection_index][1].pop(index)
+            sent_ts = ts_vals[connection_index].match(ts_ecr)
+            if sent_ts is not None:
+                rtt = (ts - sent_ts) * 1000
 
                 avg_rtt_samples[connection_index].append(rtt)
 
@@ -308,29 +529,40 @@ def parse_pcap(path, delta_t):
         inflight_data = max(0, inflight_seq[connection_index] - inflight_ack[connection_index])
         inflight_avg[connection_index].append(inflight_data * 8)
 
-    f.close()
+    sending_rate['total'] = total_sending_rate
+    retransmissions_interval['total'] = total_retransmisions
 
-    # Compute throughput after the bottleneck
-    f = open_compressed_file(pcap2)
+    return {
+        'rtt': round_trips,
+        'inflight': inflight,
+        'avg_rtt': avg_rtt,
+        'sending_rate': sending_rate,
+        'retransmissions': retransmissions,
+        'retransmissions_interval': retransmissions_interval,
+        'udp_sent': udp_sent,
+        'udp_acks': udp_acks,
+    }
 
-    pcap = dpkt.pcap.Reader(f)
 
+def parse_bottleneck_capture(pcap2, delta_t, start_ts, progress):
+    # throughput of every connection after the bottleneck
     connections = []
     active_connections = []
     throughput = {}
+    total_throughput = series(2)
 
     throughput_data_size = {}
 
-    t = start_ts + delta_t
+    udp_received = {}
 
-    for ts, buf in pcap:
+    t = start_ts + delta_t
 
-        processed_packets += 1
-        if processed_packets % 500 == 0:
-            print_progress(processed_packets, total_packets)
+    for ts, buf in progress.packets(pcap2):
 
         eth = dpkt.ethernet.Ethernet(buf)
         ip = eth.data
+        if not is_transport_packet(ip):
+            continue
         tcp = ip.data
 
         src_ip = socket.inet_ntoa(ip.src)
@@ -356,14 +588,32 @@ def parse_pcap(path, delta_t):
                 throughput[key][1].append(tp)
                 total_throughput[1][-1] += tp
                 throughput_data_size[key] = 0
+
+                if key in udp_received and t - udp_received[key].last_ts > UDP_IDLE_TIMEOUT:
+                    active_connections.remove(key)
             t += delta_t
 
+        if ip.p == dpkt.ip.IP_PROTO_UDP:
+            udp_tuple = tcp_tuple
+            if src_port > dst_port:
+                # client -> server
+                if udp_tuple not in udp_received:
+                    connections.append(udp_tuple)
+                    throughput[udp_tuple] = series(2)
+                    throughput_data_size[udp_tuple] = 0
+                    udp_received[udp_tuple] = FlowStats()
+                if udp_tuple not in active_connections:
+                    active_connections.append(udp_tuple)
+                throughput_data_size[udp_tuple] += ip.len * 8
+                udp_received[udp_tuple].add(ts, ip.len)
+            continue
+
         if tcp.flags & 0x02 and tcp_tuple not in connections:
             connections.append(tcp_tuple)
             active_connections.append(tcp_tuple)
             connection_index = tcp_tuple
 
-            throughput[connection_index] = ([], [])
+            throughput[connection_index] = series(2)
             throughput_data_size[connection_index] = 0
 
         if tcp.flags & 0x01:
@@ -377,249 +627,224 @@ def parse_pcap(path, delta_t):
             # client -> server
             throughput_data_size[connection_index] += ip.len * 8
 
-    print('  100.00%')
-
-    fairness_troughput = compute_fairness(throughput, delta_t)
-    fairness_sending_rate = compute_fairness(sending_rate, delta_t)
-    fairness = {
-        'Throughput': fairness_troughput,
-        'Sending Rate': fairness_sending_rate
-    }
-
-    bbr_values, cwnd_values = parse_bbr_and_cwnd_values(path)
-    bbr_total_values, sync_phases, sync_duration = compute_total_values(bbr_values)
-    buffer_backlog = parse_buffer_backlog(path)
-
-    data_info = DataInfo(sync_duration=sync_duration,
-                         sync_phases=sync_phases)
-
     throughput['total'] = total_throughput
-    sending_rate['total'] = total_sending_rate
-    retransmissions_interval['total'] = total_retransmisions
-
-    return PcapData(rtt=round_trips,
-                    inflight=inflight,
-                    throughput=throughput,
-                    fairness=fairness,
-                    avg_rtt=avg_rtt,
-                    sending_rate=sending_rate,
-                    bbr_values=bbr_values,
-                    bbr_total_values=bbr_total_values,
-                    cwnd_values=cwnd_values,
-                    retransmissions=retransmissions,
-                    retransmissions_interval=retransmissions_interval,
-                    buffer_backlog=buffer_backlog,
-                    data_info=data_info)
-
-
-def print_progress(current, total):
-    print_line('  {:7.3}%          '.format(100 * current / float(total)))
-
-
-def parse_buffer_backlog(path):
-    output = {}
-    paths = glob.glob(os.path.join(path, '*.{}*'.format(BUFFER_FILE_EXTENSION)))
-
-    for file_path in paths:
-        intf = get_interface_from_filename(file_path)
-        output[intf] = ([], [])
-        f = open_compressed_file(file_path)
-        for line in f:
-            if type(line) == bytes:
-                line = line.decode('utf8').replace('\n', '')
-            split = line.split(';')
-            timestamp = parse_timestamp(split[0])
-            size = split[1].replace('b', '')
-            if 'K' in size:
-                size = float(size.replace('K', '')) * 1000
-            elif 'M' in size:
-                size = float(size.replace('M', '')) * 1000000
-            elif 'G' in size:
-                size = float(size.replace('G', '')) * 1000000000
-            output[intf][0].append(timestamp)
-            output[intf][1].append(float(size) * 8)
-        f.close()
-    return output
-
-
-def parse_bbr_and_cwnd_values(path):
-    bbr_values = {}
-    cwnd_values = {}
-
-    paths = glob.glob(os.path.join(path, '*.{}*'.format(FLOW_FILE_EXTENSION)))
-
-    all_files = sorted(paths)
-
-    for file_path in all_files:
 
-        ip = get_ip_from_filename(file_path)
-
-        bbr_values[ip] = ([], [], [], [], [], [])
-        cwnd_values[ip] = ([], [], [])
+    return {
+        'throughput': throughput,
+        'udp_received': udp_received,
+    }
 
-        f = open_compressed_file(file_path)
 
-        for line in f:
-            if type(line) == bytes:
-                line = line.decode('utf8').replace('\n', '')
-            split = line.split(';')
+# offsets shared with the parent, set in the parser processes of parse_pcap(parallel=True)
+_capture_offsets = None
 
-            timestamp = parse_timestamp(split[0])
-            cwnd, ssthresh = 0, 0
 
-            if split[1] != '':
-                cwnd = int(split[1])
-            if split[2] != '':
-                ssthresh = int(split[2])
+def init_capture_worker(offsets):
+    global _capture_offsets
+    _capture_offsets = offsets
 
-            cwnd_values[ip][0].append(timestamp)
-            cwnd_values[ip][1].append(cwnd)
-            cwnd_values[ip][2].append(ssthresh)
 
-            if split[3] != '':
-                bbr = split[3].replace('bw:', '')\
-                    .replace('mrtt:','')\
-                    .replace('pacing_gain:', '')\
-                    .replace('cwnd_gain:', '')
-                bbr = bbr.split(',')
+def parse_capture_in_worker(parse, path, paths, delta_t, start_ts):
+    progress = CaptureProgress(paths, offsets=_capture_offsets)
+    return parse(path, delta_t, start_ts, progress), progress.frames
 
-                if len(bbr) < 4:
-                    pacing_gain = 0
-                    cwnd_gain = 0
-                else:
-                    pacing_gain = float(bbr[2])
-                    cwnd_gain = float(bbr[3])
-
-                if 'Mbps' in bbr[0]:
-                    bw = float(bbr[0].replace('Mbps', '')) * 1000000
-                elif 'Kbps' in bbr[0]:
-                    bw = float(bbr[0].replace('Kbps', '')) * 1000
-                elif 'bps' in bbr[0]:
-                    bw = float(bbr[0].replace('bps', ''))
-                else:
-                    bw = 0
 
-                rtt = float(bbr[1])
+def peek_start_ts(path):
+    # timestamp of the first frame, only the header and the first record are read
+    f, raw = open_compressed_stream(path)
+    try:
+        for ts, _ in dpkt.pcap.Reader(f):
+            return ts
+        return -1
+    finally:
+        f.close()
+        raw.close()
 
-                bbr_values[ip][0].append(timestamp)
-                bbr_values[ip][1].append(bw)
-                bbr_values[ip][2].append(rtt)
-                bbr_values[ip][3].append(pacing_gain)
-                bbr_values[ip][4].append(cwnd_gain)
-                bbr_values[ip][5].append(bw * rtt / 1000)
 
-        f.close()
-    return bbr_values, cwnd_values
+def is_transport_packet(ip):
+    # the captures are not filtered : skip ARP, IPv6, ICMP, ...
+    return isinstance(ip, dpkt.ip.IP) and isinstance(ip.data, (dpkt.tcp.TCP, dpkt.udp.UDP))
 
 
-def parse_timestamp(string):
-    return float(string)
+def print_progress(current, total):
+    print_line('  {:7.1f}%          '.format(100 * current / float(total)))
+
+
+class CaptureProgress:
+    """
+    Streams the frames of the captures of one experiment and prints the progress.
+
+    The progress is the offset in the (compressed) files on disk, so the captures are read
+    exactly once and no frame is kept after it has been handled.
+    When the captures are parsed in several processes, each of them writes its offset into
+    the shared offsets array and the parent prints the progress in wait().
+    """
+
+    def __init__(self, paths, offsets=None):
+        self.paths = list(paths)
+        self.sizes = {path: os.path.getsize(path) for path in paths}
+        self.total = max(sum(self.sizes.values()), 1)
+        self.done = 0
+        self.frames = 0
+        self.offsets = offsets
+
+    def packets(self, path):
+        index = self.paths.index(path)
+        f, raw = open_compressed_stream(path)
+        try:
+            for ts, buf in dpkt.pcap.Reader(f):
+                self.frames += 1
+                if self.frames % 500 == 0:
+                    if self.offsets is not None:
+                        self.offsets[index] = raw.tell()
+                    else:
+                        print_progress(self.done + raw.tell(), self.total)
+                yield ts, buf
+        finally:
+            f.close()
+            raw.close()
+            self.done += self.sizes[path]
+            if self.offsets is not None:
+                self.offsets[index] = self.sizes[path]
+
+    def wait(self, futures):
+        while True:
+            _, pending = wait(futures, timeout=0.5)
+            print_progress(sum(self.offsets), self.total)
+            if len(pending) == 0:
+                return
 
 
 def compute_total_values(bbr):
-    connection_first_index = {f: 0 for f in bbr}
-    current_bw = {f: 0 for f in bbr}
-    current_window = {f: 0 for f in bbr}
-    current_gain = {f: 0 for f in bbr}
-
-    total_bw = ([], [])
-    total_window = ([], [])
-    total_gain = ([], [])
+    """
+    Sum of BtlBw, window gain and pacing gain over all connections at every BBR sample.
+
+    The samples of all connections are merged by timestamp with a heap (ties in connection
+    order), the totals are updated by the change of the one connection that moved.
+    A connection counts with its last sample until its series ends, then with 0.
+    A synchronization phase is a period during which the total window gain equals the
+    number of connections that have started, i.e. all of them are at a window gain of 1.
+    """
+    connections = list(bbr)
+    current_bw = [0.0] * len(connections)
+    current_window = [0.0] * len(connections)
+    current_gain = [0.0] * len(connections)
+    sum_bw, sum_window, sum_gain = 0.0, 0.0, 0.0
+    started = 0
+
+    total_bw = series(2)
+    total_window = series(2)
+    total_gain = series(2)
 
     sync_window_start = -1
     sync_window_phases = []
     sync_window_durations = []
 
-    while True:
-        active_connections = 0
-        current_timestamps = {}
-
-        for c in bbr:
-            if connection_first_index[c] < len(bbr[c][0]):
-                current_timestamps[c] = bbr[c][0][connection_first_index[c]]
-                active_connections += 1
-            else:
-                current_window[c] = 0
-                current_bw[c] = 0
-                current_gain[c] = 0
+    heap = [(bbr[c][0][0], i, 0) for i, c in enumerate(connections) if len(bbr[c][0]) > 0]
+    heapq.heapify(heap)
 
-        if active_connections < 1:
-            break
+    while len(heap) > 0:
+        ts, i, index = heapq.heappop(heap)
+        values = bbr[connections[i]]
+        if index == 0:
+            started += 1
 
-        c, ts = min(current_timestamps.items(), key=lambda x: x[1])
-        current_bw[c] = bbr[c][1][connection_first_index[c]]
-        current_window[c] = float(bbr[c][4][connection_first_index[c]])
-        current_gain[c] = float(bbr[c][3][connection_first_index[c]])
-        connection_first_index[c] += 1
+        bw, window, gain = values[1][index], float(values[4][index]), float(values[3][index])
+        sum_bw += bw - current_bw[i]
+        sum_window += window - current_window[i]
+        sum_gain += gain - current_gain[i]
+        current_bw[i], current_window[i], current_gain[i] = bw, window, gain
 
         total_bw[0].append(ts)
-        total_bw[1].append(sum(current_bw.values()))
+        total_bw[1].append(sum_bw)
 
         total_window[0].append(ts)
-        total_window[1].append(sum(current_window.values()))
+        total_window[1].append(sum_window)
 
         total_gain[0].append(ts)
-        total_gain[1].append(sum(current_gain.values()))
-
-        min_window = 0
-        for i in connection_first_index.values():
-            if i > 0:
-                min_window += 1
+        total_gain[1].append(sum_gain)
 
-        if sum(current_window.values()) == min_window:
+        if abs(sum_window - started) < 1e-9:
             if sync_window_start < 0:
                 sync_window_start = ts
-                sync_window_phases.append(sync_window_start)
+                # python floats : the info file prints these lists
+                sync_window_phases.append(float(sync_window_start))
         elif sync_window_start > 0:
             duration = (ts - sync_window_start) * 1000
             sync_window_start = -1
-            sync_window_durations.append(duration)
+            sync_window_durations.append(float(duration))
+
+        if index + 1 < len(values[0]):
+            heapq.heappush(heap, (values[0][index + 1], i, index + 1))
+        else:
+            # the series ended, the connection counts with 0 from the next sample on
+            sum_bw -= current_bw[i]
+            sum_window -= current_window[i]
+            sum_gain -= current_gain[i]
+            current_bw[i], current_window[i], current_gain[i] = 0.0, 0.0, 0.0
 
     return {0: total_bw, 1: total_window, 2: total_gain}, sync_window_phases, sync_window_durations
 
 
-def compute_fairness(data, interval):
-    output = ([], [])
-    connections = {k: 0 for k in data.keys()}
+def compute_fairness(data, interval, window=1):
+    """
+    Jain's index of the connections in data per interval.
 
-    max_ts = 0
-    min_ts = float('inf')
-    for c in data:
-        max_ts = max(max_ts, max(data[c][0]))
-        min_ts = min(min_ts, min(data[c][0]))
+    Every sample is placed on a shared grid of interval-long bins starting at the first
+    sample, so connections are matched by bin instead of by exact float timestamps.
+    A connection takes part in a bin only if it has a sample in it.
 
-    ts = min_ts
-    while True:
-        if ts > max_ts:
-            break
+    window: number of bins averaged per connection (moving average) before the index is computed
+    """
+    connections = [c for c in data if len(data[c][0]) > 0]
+    if len(connections) == 0:
+        return series(2)
 
-        shares = []
-        for i in data.keys():
-            if len(data[i][0]) <= connections[i]:
-                continue
-            if data[i][0][connections[i]] == ts:
-                shares.append(data[i][1][connections[i]])
-                connections[i] += 1
+    t_min = min(data[c][0][0] for c in connections)
+    t_max = max(data[c][0][-1] for c in connections)
+    bins = int(round((t_max - t_min) / interval)) + 1
 
-        output[0].append(ts)
-        output[1].append(compute_jain_index(*shares))
-        ts += interval
-    return output
+    values = np.zeros((len(connections), bins))
+    counts = np.zeros((len(connections), bins))
+    for i, c in enumerate(connections):
+        ts = np.asarray(data[c][0], dtype=np.float64)
+        index = np.clip(np.rint((ts - t_min) / interval).astype(np.int64), 0, bins - 1)
+        values[i] = np.bincount(index, weights=np.asarray(data[c][1], dtype=np.float64), minlength=bins)
+        counts[i] = np.bincount(index, minlength=bins)
 
+    if window > 1:
+        # moving sums over the last window bins
+        values = moving_sum(values, window)
+        counts = moving_sum(counts, window)
 
-def compute_jain_index(*args):
+    present = counts > 0
+    shares = np.divide(values, counts, out=np.zeros_like(values), where=present)
+
+    return np.arange(bins) * interval + t_min, jain_index(shares, present)
 
-    sum_normal = 0
-    sum_square = 0
 
-    for arg in args:
-        sum_normal += arg
-        sum_square += arg**2
+def moving_sum(matrix, window):
+    cumulative = np.cumsum(matrix, axis=1)
+    cumulative[:, window:] = cumulative[:, window:] - cumulative[:, :-window]
+    return cumulative
 
-    if len(args) == 0 or sum_square == 0:
-        return 1
 
-    return sum_normal ** 2 / (len(args) * sum_square)
+def jain_index(shares, present):
+    """
+    Jain's index of every column of shares over the rows where present is True,
+    1 for columns without any share
+    """
+    n = present.sum(axis=0)
+    shares = np.where(present, shares, 0)
+    sum_normal = shares.sum(axis=0)
+    sum_square = (shares ** 2).sum(axis=0)
+    valid = (n > 0) & (sum_square > 0)
+    return np.divide(sum_normal ** 2, n * sum_square, out=np.ones(shares.shape[1]), where=valid)
+
+
+def compute_jain_index(*args):
+    shares = np.asarray(args, dtype=np.float64).reshape(-1, 1)
+    return float(jain_index(shares, np.ones_like(shares, dtype=bool))[0])
 
 
 if __name__ == "__main__":
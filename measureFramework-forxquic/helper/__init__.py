@@ -25,6 +25,8 @@ PLOT_TYPES = [
     'rt_prop',
     'window_gain',
     'pacing_gain',
+    'delivery_rate',
+    'pacing_rate',
 ]
 
 
@@ -49,8 +51,17 @@ CSV_FILE_NAMES = {
     'cwnd_values': 'cwnd_values.csv',
     'retransmissions': 'retransmissions.csv',
     'retransmissions_interval': 'retransmissions_interval.csv',
-    'buffer_backlog': 'buffer_backlog.csv'
+    'buffer_backlog': 'buffer_backlog.csv',
+    'ss_values': 'ss_values.csv'
 }
 
 INFORMATION_FILE = 'values.info'
 
+# columnar output (-o npz), one file holding every metric and the DataInfo
+NPZ_FILE = 'pcap_data.npz'
+
+
+# parsed series reused across runs (analyze.py --no-cache to disable), see helper/analysis_cache.py
+CACHE_PATH = '.analysis_cache'
+# part of every cache key, increase it whenever a change alters the parsed series
+ANALYZER_VERSION = 1
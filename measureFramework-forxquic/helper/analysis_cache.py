@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import zipfile
+import numpy as np
+
+from helper import CACHE_PATH, ANALYZER_VERSION
+from helper.npz_data import pack_metrics, unpack_metrics, encode_flows, decode_flows
+from helper.udp_flows import FlowStats
+from helper.util import print_warning
+
+# only the beginning of an input is hashed, size and mtime cover changes further in
+HASH_PREFIX_BYTES = 1 << 20
+
+
+def fingerprint(path):
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        prefix_hash = hashlib.sha1(f.read(HASH_PREFIX_BYTES)).hexdigest()
+    return {
+        'file': os.path.basename(path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'hash': prefix_hash,
+    }
+
+
+class AnalysisCache:
+    """
+    Parsed series of one experiment directory, stored in directory/CACHE_PATH.
+
+    Every entry (the sender capture, the bottleneck capture, the logs) is one .npz holding
+    the series and the key they were parsed with: fingerprints of the input files, parameters
+    like delta_t and ANALYZER_VERSION. An entry is only used if its key equals the current
+    key, so only changed inputs are parsed again.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, CACHE_PATH)
+
+    @staticmethod
+    def key(inputs, **params):
+        key = dict(params, version=ANALYZER_VERSION, inputs=[fingerprint(p) for p in sorted(inputs)])
+        return json.loads(json.dumps(key))  # as compared with the stored key
+
+    def entry_path(self, name):
+        return os.path.join(self.path, '{}.npz'.format(name))
+
+    def load(self, name, key):
+        """
+        Returns the values stored as name ({field: {connection: columns or FlowStats}}),
+        None if there is no entry with this key
+        """
+        file_path = self.entry_path(name)
+        if not os.path.isfile(file_path):
+            return None
+        try:
+            with np.load(file_path) as f:
+                meta = json.loads(str(f['meta']))
+                if meta['key'] != key:
+                    return None
+                values = unpack_metrics(f, meta['index'])
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None  # unreadable entries are parsed again and overwritten
+        for field, flows in meta['flows'].items():
+            values[field] = decode_flows(flows)
+        return values
+
+    def store(self, name, key, values):
+        metrics = {}
+        flows = {}
+        for field, connections in values.items():
+            if any(isinstance(v, FlowStats) for v in connections.values()):
+                flows[field] = encode_flows(connections)
+            else:
+                metrics[field] = connections
+
+        arrays = {}
+        index = pack_metrics(metrics, arrays)
+        arrays['meta'] = np.array(json.dumps({'key': key, 'index': index, 'flows': flows}))
+
+        file_path = self.entry_path(name)
+        # written next to the entry and renamed, an interrupted run leaves no partial entry
+        tmp_path = '{}.{}.tmp'.format(file_path, os.getpid())
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, file_path)
+        except OSError as e:
+            print_warning('  Could not write the analysis cache: {}'.format(e))
@@ -2,6 +2,7 @@ import numpy as np
 import os
 import errno
 import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import matplotlib
 matplotlib.use('Agg')
@@ -25,10 +26,14 @@ class Plot:
         self.number = number
 
 
-def plot_all(path, pcap_data, plot_only, hide_total=False, all_plots=False):
-
-    global PLOT_TOTAL
-    PLOT_TOTAL = not hide_total
+def plot_all(path, pcap_data, plot_only, hide_total=False, all_plots=False, image_formats=(), jobs=1):
+    """
+    Writes plot_complete.pdf with all plots of plot_only and, with all_plots, every plot as an
+    individual PDF. image_formats (png, svg) additionally stores every plot as an image.
+    With jobs > 1 the figures are rendered in parallel, each in its own process. The complete plot
+    is one figure and one task, its subplots are drawn one after the other, so without all_plots
+    or image_formats there is nothing to run in parallel.
+    """
 
     path = os.path.join(path, PLOT_PATH)
 
@@ -39,7 +44,7 @@ def plot_all(path, pcap_data, plot_only, hide_total=False, all_plots=False):
             if exc.errno != errno.EEXIST:
                 raise
 
-    pcap_data = shift_timestamps(pcap_data)
+    pcap_data = shift_timestamps(pcap_data.finalize())
 
     throughput = pcap_data.throughput
     fairness = pcap_data.fairness
@@ -53,6 +58,7 @@ def plot_all(path, pcap_data, plot_only, hide_total=False, all_plots=False):
     retransmissions = pcap_data.retransmissions
     retransmissions_interval = pcap_data.retransmissions_interval
     buffer_backlog = pcap_data.buffer_backlog
+    ss_values = pcap_data.ss_values
 
     t_max = pcap_data.get_max_ts()
     t_min = pcap_data.get_min_ts()
@@ -136,25 +142,72 @@ def plot_all(path, pcap_data, plot_only, hide_total=False, all_plots=False):
             Plot((bbr_values, bbr_total_values), plot_bbr_pacing, 'plot_bbr_pacing.pdf', 'Pacing Gain', '', len(bbr_values))
         ]
 
-    if all_plots:
-        for plot in plots:
-            print_line('  *  {} ...'.format(plot.plot_name), new_line=False)
-            f, ax = plt.subplots(1)
-            f.set_size_inches(20, 10)
+    has_ss = False
+    for i in ss_values:
+        if len(ss_values[i][0]) > 0:
+            has_ss = True
+            break
+
+    if 'delivery_rate' in plot_only and has_ss:
+        plots += [
+            Plot(ss_values, plot_ss_delivery_rate, 'plot_ss_delivery_rate.pdf', 'Delivery Rate', 'bit/s', len(ss_values))
+        ]
+
+    if 'pacing_rate' in plot_only and has_ss:
+        plots += [
+            Plot(ss_values, plot_ss_pacing_rate, 'plot_ss_pacing_rate.pdf', 'Pacing Rate', 'bit/s', len(ss_values))
+        ]
+
+    formats = ['pdf'] if all_plots else []
+    formats += [f for f in image_formats if f not in formats]
+
+    # the complete plot takes longest, it is started first
+    tasks = [(render_complete, (path, plots, t_min, t_max, hide_total))]
+    if len(formats) > 0:
+        tasks += [(render_plot, (path, plot, formats, t_min, t_max, hide_total)) for plot in plots]
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+            futures = [executor.submit(function, *args, verbose=False) for function, args in tasks]
+            for future in as_completed(futures):
+                print('  *  {} created'.format(future.result()).ljust(TEXT_WIDTH))
+    else:
+        for function, args in tasks:
+            function(*args)
+
 
-            label = plot.plot_name
-            if plot.unit != '':
-                label += ' in {}'.format(plot.unit)
+def render_plot(path, plot, formats, t_min, t_max, hide_total, verbose=True):
+    global PLOT_TOTAL
+    PLOT_TOTAL = not hide_total
+
+    if verbose:
+        print_line('  *  {} ...'.format(plot.plot_name), new_line=False)
+    f, ax = plt.subplots(1)
+    f.set_size_inches(20, 10)
+
+    label = plot.plot_name
+    if plot.unit != '':
+        label += ' in {}'.format(plot.unit)
 
-            setup_ax(ax=ax, title=plot.plot_name, label=label, xmin=t_min, xmax=t_max)
-            plot.plot_function(plot.data, ax)
+    setup_ax(ax=ax, title=plot.plot_name, label=label, xmin=t_min, xmax=t_max)
+    plot.plot_function(plot.data, ax)
 
-            legend = ax.legend(loc='upper left', bbox_to_anchor=(0, -0.04, 1, 0), mode='expand', borderaxespad=0.1, ncol=20,
-                               shadow=True, fancybox=True)
+    legend = ax.legend(loc='upper left', bbox_to_anchor=(0, -0.04, 1, 0), mode='expand', borderaxespad=0.1, ncol=20,
+                       shadow=True, fancybox=True)
 
-            f.savefig(os.path.join(path, plot.file_name), bbox_extra_artists=(legend, ), bbox_inches='tight')
-            plt.close()
-            print('  *  {} created'.format(plot.plot_name))
+    file_name = os.path.splitext(plot.file_name)[0]
+    for file_format in formats:
+        f.savefig(os.path.join(path, '{}.{}'.format(file_name, file_format)), bbox_extra_artists=(legend, ),
+                  bbox_inches='tight')
+    plt.close(f)
+    if verbose:
+        print('  *  {} created'.format(plot.plot_name))
+    return plot.plot_name
+
+
+def render_complete(path, plots, t_min, t_max, hide_total, verbose=True):
+    global PLOT_TOTAL
+    PLOT_TOTAL = not hide_total
 
     f, axarr = plt.subplots(len(plots), sharex=True)
 
@@ -166,7 +219,8 @@ def plot_all(path, pcap_data, plot_only, hide_total=False, all_plots=False):
     max_legend_rows = 1
 
     for i, plot in enumerate(plots):
-        print_line('     -  Complete plot: {} ...'.format(plot.plot_name).ljust(TEXT_WIDTH))
+        if verbose:
+            print_line('     -  Complete plot: {} ...'.format(plot.plot_name).ljust(TEXT_WIDTH))
         label = plot.plot_name
         if plot.unit != '':
             label += ' in {}'.format(plot.unit)
@@ -183,12 +237,43 @@ def plot_all(path, pcap_data, plot_only, hide_total=False, all_plots=False):
 
         max_legend_rows = max(max_legend_rows, math.ceil(plot.number / 20.0))
 
-    print_line('  *  Complete plot ...'.ljust(TEXT_WIDTH))
-    plt.tight_layout(h_pad=1 + 1.5 * max_legend_rows)
-    plt.savefig(os.path.join(path, 'plot_complete.pdf'), bbox_extra_artists=(legend, ), bbox_inches='tight')
+    if verbose:
+        print_line('  *  Complete plot ...'.ljust(TEXT_WIDTH))
+    f.tight_layout(h_pad=1 + 1.5 * max_legend_rows)
+    f.savefig(os.path.join(path, 'plot_complete.pdf'), bbox_extra_artists=(legend, ), bbox_inches='tight')
+
+    plt.close(f)
+    if verbose:
+        print('  *  Complete plot created'.ljust(TEXT_WIDTH))
+    return 'Complete plot'
+
+
+def plot_line(p_plt, x, y, *args, **kwargs):
+    # lines are decimated to the width of the axes, a pixel column can show at most its
+    # first, last, minimum and maximum value
+    x, y = decimate(x, y, int(p_plt.get_window_extent().width))
+    return p_plt.plot(x, y, *args, **kwargs)
+
+
+def decimate(x, y, bins):
+    """
+    x : sorted sample positions
+    bins : number of equal intervals of x, e.g. the width in pixels
+    Returns the first, last, minimum and maximum sample of every interval, lines with no
+    more than 4 samples per interval are returned as they are
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if bins < 1 or len(x) <= 4 * bins or not x[-1] > x[0] or np.any(x[1:] < x[:-1]):
+        return x, y
 
-    plt.close()
-    print('  *  Complete plot created'.ljust(TEXT_WIDTH))
+    index = np.minimum(((x - x[0]) * (bins / (x[-1] - x[0]))).astype(np.int64), bins - 1)
+    first = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    last = np.r_[first[1:], len(x)] - 1
+    # sorted by interval and value, the first and last sample of an interval are its min and max
+    order = np.lexsort((y, index))
+    keep = np.unique(np.concatenate((first, last, order[first], order[last])))
+    return x[keep], y[keep]
 
 
 def setup_ax(ax, title , label, xmin, xmax):
@@ -212,18 +297,18 @@ def plot_throughput(data, p_plt):
     if total > 1 and PLOT_TOTAL:
         data = throughput['total']
         data = filter_smooth(data, 5, 2)
-        p_plt.plot(data[0], data[1], label='Total', color='#444444')
+        plot_line(p_plt, data[0], data[1], label='Total', color='#444444')
 
     for c in throughput:
         data = throughput[c]
         data = filter_smooth(data, 5, 2)
 
         if c != 'total':
-            p_plt.plot(data[0], data[1], label='{}'.format(c))
+            plot_line(p_plt, data[0], data[1], label='{}'.format(c))
 
     for c in retransmissions:
         data = retransmissions[c]
-        p_plt.plot(data, np.zeros_like(data), '.', color='red')
+        plot_line(p_plt, data, np.zeros_like(data), '.', color='red')
 
 
 def plot_sending_rate(data, p_plt):
@@ -234,24 +319,24 @@ def plot_sending_rate(data, p_plt):
     if total > 1 and PLOT_TOTAL:
         data = sending_rate['total']
         data = filter_smooth(data, 5, 2)
-        p_plt.plot(data[0], data[1], label='Total', color='#444444')
+        plot_line(p_plt, data[0], data[1], label='Total', color='#444444')
 
     for c in sending_rate:
         data = sending_rate[c]
         data = filter_smooth(data, 5, 2)
 
         if c != 'total':
-            p_plt.plot(data[0], data[1], label='{}'.format(c))
+            plot_line(p_plt, data[0], data[1], label='{}'.format(c))
 
     for c in retransmissions:
         data = retransmissions[c]
-        p_plt.plot(data, np.zeros_like(data), '.', color='red')
+        plot_line(p_plt, data, np.zeros_like(data), '.', color='red')
 
 
 def plot_fairness(fairness, p_plt):
     for c in fairness:
         data = filter_smooth((fairness[c][0], fairness[c][1]), 10, 2)
-        p_plt.plot(data[0], data[1], label=c)
+        plot_line(p_plt, data[0], data[1], label=c)
 
     p_plt.set_ylim(bottom=0, top=1.1)
 
@@ -259,7 +344,7 @@ def plot_fairness(fairness, p_plt):
 def plot_rtt(rtt, p_plt):
     for c in rtt:
         data = rtt[c]
-        p_plt.plot(data[0], data[1], label='{}'.format(c))
+        plot_line(p_plt, data[0], data[1], label='{}'.format(c))
     p_plt.set_ylim(bottom=0)
 
 
@@ -267,7 +352,7 @@ def plot_avg_rtt(avg_rtt, p_plt):
     for c in avg_rtt:
         data = avg_rtt[c]
         data = filter_smooth(data, 3, 2)
-        p_plt.plot(data[0], data[1], label='{}'.format(c))
+        plot_line(p_plt, data[0], data[1], label='{}'.format(c))
     p_plt.set_ylim(bottom=0)
 
 
@@ -275,7 +360,7 @@ def plot_inflight(inflight, p_plt):
     for c in inflight:
         data = inflight[c]
         data = filter_smooth(data, 5, 1)
-        p_plt.plot(data[0], data[1], label='{}'.format(c))
+        plot_line(p_plt, data[0], data[1], label='{}'.format(c))
 
 
 def plot_buffer_backlog(data, p_plt):
@@ -287,11 +372,11 @@ def plot_buffer_backlog(data, p_plt):
         if len(data[0]) < 1:
             continue
         data = filter_smooth(data, 5, 2)
-        p_plt.plot(data[0], data[1], label='Buffer Backlog {}'.format(c))
+        plot_line(p_plt, data[0], data[1], label='Buffer Backlog {}'.format(c))
 
     for c in retransmissions:
         data = retransmissions[c]
-        p_plt.plot(data, np.zeros_like(data), '.', color='red')
+        plot_line(p_plt, data, np.zeros_like(data), '.', color='red')
 
 
 def plot_bbr_bw(data, p_plt):
@@ -301,25 +386,25 @@ def plot_bbr_bw(data, p_plt):
     num_flows = 0
     for c in bbr:
         data = bbr[c]
-        p_plt.plot(data[0], data[1], label='{}'.format(c))
+        plot_line(p_plt, data[0], data[1], label='{}'.format(c))
         if len(data[0]) > 0:
             num_flows += 1
 
     if len(bbr) > 2 and num_flows > 1 and PLOT_TOTAL:
-        p_plt.plot(bbr_bw_total[0][0], bbr_bw_total[0][1], label='Total', color='#444444')
+        plot_line(p_plt, bbr_bw_total[0][0], bbr_bw_total[0][1], label='Total', color='#444444')
 
 
 def plot_bbr_rtt(bbr, p_plt):
     for c in bbr:
         data = bbr[c]
-        p_plt.plot(data[0], data[2], label='{}'.format(c))
+        plot_line(p_plt, data[0], data[2], label='{}'.format(c))
 
 
 def plot_bbr_pacing(data, p_plt):
     bbr, total = data
     for c in bbr:
         data = bbr[c]
-        p_plt.plot(data[0], data[3], label='{}'.format(c))
+        plot_line(p_plt, data[0], data[3], label='{}'.format(c))
     #if len(bbr) > 1:
     #    p_plt.plot(total[2][0], total[2][1], label='Total', color='#444444')
 
@@ -329,17 +414,29 @@ def plot_bbr_window(data, p_plt):
     num_flows = 0
     for c in bbr:
         data = bbr[c]
-        p_plt.plot(data[0], data[4], label='{}'.format(c))
+        plot_line(p_plt, data[0], data[4], label='{}'.format(c))
         if len(data[0]) > 0:
             num_flows += 1
     if len(bbr) > 2 and num_flows > 1 and PLOT_TOTAL:
-        p_plt.plot(total[1][0], total[1][1], label='Total', color='#444444')
+        plot_line(p_plt, total[1][0], total[1][1], label='Total', color='#444444')
 
 
 def plot_bbr_bdp(bbr, p_plt):
     for c in bbr:
         data = bbr[c]
-        p_plt.plot(data[0], data[5], label='{}'.format(c))
+        plot_line(p_plt, data[0], data[5], label='{}'.format(c))
+
+
+def plot_ss_delivery_rate(ss, p_plt):
+    for c in ss:
+        data = ss[c]
+        plot_line(p_plt, data[0], data[2], label='{}'.format(c))
+
+
+def plot_ss_pacing_rate(ss, p_plt):
+    for c in ss:
+        data = ss[c]
+        plot_line(p_plt, data[0], data[3], label='{}'.format(c))
 
 
 def plot_cwnd(cwnd, p_plt):
@@ -351,13 +448,13 @@ def plot_cwnd(cwnd, p_plt):
 
     for i, c in enumerate(cwnd):
         data = cwnd[c]
-        p_plt.plot(data[0], data[1], color=colors[i % len(colors)])
-        p_plt.plot(data[0], data[2], ':', color=colors[i % len(colors)])
+        plot_line(p_plt, data[0], data[1], color=colors[i % len(colors)])
+        plot_line(p_plt, data[0], data[2], ':', color=colors[i % len(colors)])
 
 
 def plot_retransmissions(ret_interval, p_plt):
-    plot_sum = (ret_interval['total'][0][:],
-                ret_interval['total'][1][:])
+    plot_sum = (ret_interval['total'][0],
+                ret_interval['total'][1].copy())
     total_sum = 0
     for c in ret_interval:
 
@@ -365,12 +462,14 @@ def plot_retransmissions(ret_interval, p_plt):
             continue
 
         data = ret_interval[c]
-        total_loss = int(sum(data[1]))
+        total_loss = int(data[1].sum())
         total_sum += total_loss
         p_plt.bar(plot_sum[0], plot_sum[1], plot_sum[0][1], label=total_loss)
-        for i, value in enumerate(data[0]):
-            if value in plot_sum[0]:
-                plot_sum[1][plot_sum[0].index(value)] -= data[1][i]
+
+        # the intervals of a connection are a subset of the total ones
+        index = np.minimum(np.searchsorted(plot_sum[0], data[0]), len(plot_sum[0]) - 1)
+        found = plot_sum[0][index] == data[0]
+        np.subtract.at(plot_sum[1], index[found], data[1][found])
 
     p_plt.bar(plot_sum[0], plot_sum[1], plot_sum[0][1], label='Total {}'.format(total_sum), color='black')
 
@@ -381,19 +480,15 @@ def plot_retransmission_rate(ret_interval, p_plt):
 
         data = ret_interval[c]
 
-        rate = []
         ts = data[0]
-
-        for i,_ in enumerate(data[1]):
-            if data[2][i] == 0:
-                rate.append(0)
-            else:
-                rate.append(float(data[1][i]) / float(data[2][i]) * 100)
+        rate = np.zeros_like(data[1])
+        sent = data[2] != 0
+        rate[sent] = data[1][sent] / data[2][sent] * 100
 
         if c == 'total':
-            p_plt.plot(ts, rate, label='Total Retransmission Rate', color='black')
+            plot_line(p_plt, ts, rate, label='Total Retransmission Rate', color='black')
         else:
-            p_plt.plot(ts, rate, label='{}'.format(c), alpha=0.3)
+            plot_line(p_plt, ts, rate, label='{}'.format(c), alpha=0.3)
 
     p_plt.set_ylim(bottom=0)
 
@@ -425,7 +520,7 @@ def plot_diff_inflight_bdp(data, p_plt):
                     bdp = bdp[j:]
                     break
         ts, diff = filter_smooth((ts, diff), 10, 5)
-        p_plt.plot(ts, diff, label='{}'.format(c))
+        plot_line(p_plt, ts, diff, label='{}'.format(c))
 
 
 def filter_smooth(data, size, repeat=1):
@@ -436,19 +531,14 @@ def filter_smooth(data, size, repeat=1):
         return x, y
 
     size = int(math.ceil(size / 2.0))
+    # mean of y[max(0, i - size):min(i + size, len(y) - 1)] for every i, 0 for empty windows
+    i = np.arange(len(y))
+    low = np.maximum(i - size, 0)
+    high = np.minimum(i + size, len(y) - 1)
+    count = high - low
     for _ in range(1, repeat):
-        y_smooth = []
-        for i in range(0, len(y)):
-            avg = 0
-            avg_counter = 0
-            for j in range(max(0, i - size), min(i + size, len(y) - 1)):
-                avg += y[j]
-                avg_counter += 1
-            if avg_counter > 0:
-                y_smooth.append(avg / avg_counter)
-            else:
-                y_smooth.append(0)
-        y = y_smooth
+        cumsum = np.concatenate(([0.0], np.cumsum(y, dtype=np.float64)))
+        y = np.where(count > 0, (cumsum[high] - cumsum[low]) / np.maximum(count, 1), 0.0)
     return x, y
 
 
@@ -475,6 +565,6 @@ def shift_timestamps(data):
 
     for v in data:
         for c in data[v]:
-            data[v][c][0][:] = [x - t_min for x in data[v][c][0]]
+            data[v][c][0][:] -= t_min
 
     return PcapData.from_dict(data)
\ No newline at end of file
@@ -3,7 +3,7 @@ import errno
 import numpy as np
 
 
-from helper.pcap_data import PcapData
+from helper.pcap_data import PcapData, series
 
 from helper import CSV_PATH, CSV_FILE_NAMES, INFORMATION_FILE
 from helper import COMPRESSION_EXTENSIONS
@@ -69,7 +69,8 @@ def read_from_csv(path):
         'cwnd_values_file': os.path.join(path, CSV_FILE_NAMES['cwnd_values']),
         'retransmissions_file': os.path.join(path, CSV_FILE_NAMES['retransmissions']),
         'retransmissions_interval_file': os.path.join(path, CSV_FILE_NAMES['retransmissions_interval']),
-        'buffer_backlog_file': os.path.join(path, CSV_FILE_NAMES['buffer_backlog'])
+        'buffer_backlog_file': os.path.join(path, CSV_FILE_NAMES['buffer_backlog']),
+        'ss_values_file': os.path.join(path, CSV_FILE_NAMES['ss_values'])
     }
 
     throughput = read_csv(data_files['throughput_file'], 2)
@@ -84,6 +85,9 @@ def read_from_csv(path):
     retransmissions = read_csv(data_files['retransmissions_file'], 1)
     retransmissions_interval = read_csv(data_files['retransmissions_interval_file'], 3)
     buffer_backlog = read_csv(data_files['buffer_backlog_file'])
+    ss_values = {}
+    if find_file(data_files['ss_values_file']) is not None:  # not written by older versions
+        ss_values = read_csv(data_files['ss_values_file'], 5)
 
     return PcapData(throughput=throughput,
                     rtt=rtt,
@@ -96,7 +100,8 @@ def read_from_csv(path):
                     cwnd_values=cwnd_values,
                     retransmissions=retransmissions,
                     retransmissions_interval=retransmissions_interval,
-                    buffer_backlog=buffer_backlog)
+                    buffer_backlog=buffer_backlog,
+                    ss_values=ss_values).finalize()
 
 
 def read_csv(path, columns_per_connection=2):
@@ -121,7 +126,7 @@ def read_csv(path, columns_per_connection=2):
                 index = first_line[i]
 
             if index not in output:
-                output[index] = tuple([[] for _ in range(0, columns_per_connection)])
+                output[index] = series(columns_per_connection)
             for column in range(0, columns_per_connection):
                 output[index][column].append(float(split[i + column]))
     f.close()
@@ -175,4 +180,20 @@ def write_info_file(path, pcap_data):
                 f.write('{:13}  {:>13.3f}  {:>13.3f}  {:>13.3f} {:>13.3f} {:>13.3f}\n'.format(
                     str(c), median, mean, std, min_value, max_value))
 
+    write_flow_stats(f, pcap_data.data_info.flow_stats)
+
     f.close()
+
+
+def write_flow_stats(f, flow_stats):
+    for capture, flows in flow_stats.items():
+        f.write('\n{:-<58}\n\nUDP flows, {}:\n'.format('', capture))
+        f.write('{:40}  {:>10}  {:>13}  {:>13}  {:>13}  {:>13}  {:>13}\n'.format(
+            'Connection', 'Packets', 'Rate', 'Gap Mean ms', 'Gap Std ms', 'Gap Min ms', 'Gap Max ms'))
+        for c, stats in flows.items():
+            if stats.packets < 1:
+                continue
+            f.write('{:40}  {:>10}  {:>13.3f}  {:>13.3f}  {:>13.3f}  {:>13.3f}  {:>13.3f}\n'.format(
+                str(c), stats.packets, stats.rate, stats.mean_gap, stats.std_gap,
+                stats.min_gap if stats.packets > 1 else 0, stats.max_gap))
+
@@ -0,0 +1,110 @@
+import glob
+import io
+import os
+import string
+import numpy as np
+
+from helper import BUFFER_FILE_EXTENSION, FLOW_FILE_EXTENSION
+from helper.util import open_compressed_file, get_ip_from_filename, get_interface_from_filename
+
+# The logs are normalised as a whole into plain ';' separated numbers and parsed in one
+# np.loadtxt call, instead of splitting and converting them line by line.
+
+# field labels (bw:, mrtt:, pacing_gain:, ...) and unit suffixes (bps, b) are all lowercase
+LABELS = (string.ascii_lowercase + '_:').encode()
+# 12.3Mbps -> 12.3M -> 12.3e6, 30Kb -> 30K -> 30e3
+UNITS = [(b'G', b'e9'), (b'M', b'e6'), (b'K', b'e3')]
+
+# ss_script.sh : timestamp;cwnd;ssthresh[;rtt;delivery_rate;pacing_rate;retrans];bbr
+# bbr as bw:12.3Mbps,mrtt:10.5[,pacing_gain:1.25,cwnd_gain:2], the ss -tin fields in
+# brackets are only written by the current ss_script.sh
+FLOW_FIELDS = 4
+SS_FLOW_FIELDS = 8
+BBR_COLUMNS = 4
+
+
+def read_bytes(path):
+    f = open_compressed_file(path)
+    data = f.read()
+    f.close()
+    if type(data) == str:
+        data = data.encode('utf8')
+    return data
+
+
+def load_columns(data, columns, padding=0):
+    """
+    data : log with ';' separated fields
+    columns : number of columns to return
+    padding : fields that may be missing at the end of a line, they are filled with nan
+    Returns an array of shape (columns, lines), empty fields are nan
+    """
+    if len(data.strip()) == 0:
+        return np.zeros((columns, 0))
+    data = data.translate(bytes.maketrans(b',', b';'), LABELS)
+    for unit, exponent in UNITS:
+        data = data.replace(unit, exponent)
+    # empty fields, twice for runs of them as replace does not overlap
+    data = data.replace(b';;', b';nan;').replace(b';;', b';nan;').replace(b';\n', b';nan\n')
+    if not data.endswith(b'\n'):
+        data += b'\n'
+    if padding > 0:
+        data = data.replace(b'\n', b';nan' * padding + b'\n')
+    return np.loadtxt(io.StringIO(data.decode('utf8')), delimiter=';', usecols=range(columns), ndmin=2).T
+
+
+def parse_buffer_backlog(path):
+    output = {}
+    paths = glob.glob(os.path.join(path, '*.{}*'.format(BUFFER_FILE_EXTENSION)))
+
+    for file_path in paths:
+        intf = get_interface_from_filename(file_path)
+        timestamp, backlog = load_columns(read_bytes(file_path), 2)
+        output[intf] = (timestamp, np.nan_to_num(backlog) * 8)
+    return output
+
+
+def parse_bbr_and_cwnd_values(path):
+    """
+    Returns bbr_values, cwnd_values and ss_values of every sender, keyed by its ip
+
+    bbr_values : timestamp, BtlBw (bit/s), RTprop (ms), pacing gain, window gain, BDP (bit)
+    cwnd_values : timestamp, cwnd, ssthresh
+    ss_values : timestamp, rtt (ms), delivery rate (bit/s), pacing rate (bit/s), retransmissions,
+                empty for logs written without these fields
+    """
+    bbr_values = {}
+    cwnd_values = {}
+    ss_values = {}
+
+    paths = glob.glob(os.path.join(path, '*.{}*'.format(FLOW_FILE_EXTENSION)))
+
+    all_files = sorted(paths)
+
+    for file_path in all_files:
+
+        ip = get_ip_from_filename(file_path)
+        data = read_bytes(file_path)
+
+        # the bbr field has no ';' before normalisation, the first line tells the log format
+        fields = data[:data.find(b'\n')].count(b';') + 1
+        if len(data.strip()) > 0 and fields not in (FLOW_FIELDS, SS_FLOW_FIELDS):
+            raise ValueError('{}: unexpected number of fields {}'.format(file_path, fields))
+        values = load_columns(data, fields - 1 + BBR_COLUMNS, padding=BBR_COLUMNS - 1)
+
+        timestamp = values[0]
+        cwnd_values[ip] = (timestamp, np.nan_to_num(values[1]), np.nan_to_num(values[2]))
+
+        bbr = values[fields - 1:]
+        has_bbr = ~np.isnan(bbr[0])
+        bw, rtt, pacing_gain, cwnd_gain = np.nan_to_num(bbr[:, has_bbr])
+        bbr_values[ip] = (timestamp[has_bbr], bw, rtt, pacing_gain, cwnd_gain, bw * rtt / 1000)
+
+        if fields == SS_FLOW_FIELDS:
+            ss = values[3:fields - 1]
+            has_ss = ~np.isnan(ss[0])
+            ss_values[ip] = (timestamp[has_ss],) + tuple(np.nan_to_num(ss[:, has_ss]))
+        else:
+            ss_values[ip] = tuple(np.zeros(0) for _ in range(5))
+
+    return bbr_values, cwnd_values, ss_values
@@ -0,0 +1,106 @@
+import os
+import json
+import numpy as np
+
+from helper.pcap_data import PcapData, DataInfo
+from helper.udp_flows import FlowStats
+from helper import NPZ_FILE
+
+NPZ_FORMAT_VERSION = 1
+
+
+def encode_connection(connection):
+    # connections are tuples (ip, port, ip, port), ip strings or names like 'total'
+    if isinstance(connection, tuple):
+        return {'tuple': list(connection)}
+    return {'key': connection}
+
+
+def decode_connection(connection):
+    if 'tuple' in connection:
+        return tuple(connection['tuple'])
+    return connection['key']
+
+
+def encode_flows(flows):
+    # {connection: FlowStats} as JSON
+    return [[encode_connection(c), stats.as_dict()] for c, stats in flows.items()]
+
+
+def decode_flows(flows):
+    return {decode_connection(c): FlowStats.from_dict(stats) for c, stats in flows}
+
+
+def pack_metrics(metrics, arrays):
+    """
+    Adds every connection of metrics ({metric: {connection: columns}}) to arrays as one
+    (columns, samples) float64 array named '{metric}.{i}'.
+    Returns the JSON index of the arrays, for unpack_metrics
+    """
+    index = {}
+    for metric, connections in metrics.items():
+        index[metric] = []
+        for i, (connection, columns) in enumerate(connections.items()):
+            arrays['{}.{}'.format(metric, i)] = np.array([np.asarray(c, dtype=np.float64) for c in columns])
+            index[metric].append(encode_connection(connection))
+    return index
+
+
+def unpack_metrics(f, index):
+    values = {}
+    for metric, connections in index.items():
+        values[metric] = {}
+        for i, connection in enumerate(connections):
+            columns = f['{}.{}'.format(metric, i)]
+            values[metric][decode_connection(connection)] = tuple(columns)  # views of one array
+    return values
+
+
+def write_to_npz(path, pcap_data):
+    """
+    Writes every metric of pcap_data and its DataInfo into path/NPZ_FILE.
+
+    Each connection of a metric is one (columns, samples) float64 array, the index of the
+    arrays and the DataInfo are stored as JSON. The archive is not compressed, so loading
+    it is a plain read of the arrays instead of a parse per cell as with the CSV files.
+    """
+    arrays = {}
+    index = pack_metrics(pcap_data.values_as_dict(), arrays)
+
+    data_info = pcap_data.data_info
+    info = {}
+    if data_info is not None:
+        arrays['sync_phases'] = np.asarray(data_info.sync_phases, dtype=np.float64)
+        arrays['sync_duration'] = np.asarray(data_info.sync_duration, dtype=np.float64)
+        info['flow_stats'] = {capture: encode_flows(flows) for capture, flows in data_info.flow_stats.items()}
+
+    meta = {'version': NPZ_FORMAT_VERSION, 'index': index, 'data_info': info}
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    np.savez(os.path.join(path, NPZ_FILE), **arrays)
+
+
+def read_from_npz(path):
+    file_path = os.path.join(path, NPZ_FILE)
+    if not os.path.isfile(file_path):
+        raise IOError('File not found {}'.format(file_path))
+
+    with np.load(file_path) as f:
+        meta = json.loads(str(f['meta']))
+        if meta['version'] != NPZ_FORMAT_VERSION:
+            raise IOError('{}: format version {}, expected {}'.format(
+                file_path, meta['version'], NPZ_FORMAT_VERSION))
+
+        values = unpack_metrics(f, meta['index'])
+
+        data_info = None
+        if 'sync_phases' in f:
+            flow_stats = {capture: decode_flows(flows)
+                          for capture, flows in meta['data_info'].get('flow_stats', {}).items()}
+            data_info = DataInfo(sync_duration=f['sync_duration'].tolist(),
+                                 sync_phases=f['sync_phases'].tolist(),
+                                 flow_stats=flow_stats)
+
+    pcap_data = PcapData.from_dict(values)
+    pcap_data.data_info = data_info
+    return pcap_data
@@ -1,7 +1,25 @@
+from array import array
+import numpy as np
+
+
+def series(columns=2):
+    # Time series of one connection: a tuple of growable float64 columns (8 bytes per value),
+    # the first column holds the timestamps. PcapData.finalize() turns them into ndarrays.
+    return tuple(array('d') for _ in range(columns))
+
+
+def as_ndarray(column):
+    if isinstance(column, np.ndarray):
+        return column
+    if isinstance(column, array):
+        return np.frombuffer(column, dtype=np.float64)  # no copy, the array must not grow anymore
+    return np.asarray(column, dtype=np.float64)
+
+
 class PcapData:
     def __init__(self, rtt, inflight, throughput, fairness, avg_rtt, sending_rate, bbr_values,
                  bbr_total_values, cwnd_values, retransmissions, retransmissions_interval, buffer_backlog,
-                 data_info=None):
+                 ss_values=None, data_info=None):
         self.rtt = rtt
         self.inflight = inflight
         self.throughput = throughput
@@ -14,6 +32,8 @@ class PcapData:
         self.retransmissions = retransmissions
         self.retransmissions_interval = retransmissions_interval
         self.buffer_backlog = buffer_backlog
+        # timestamp, rtt, delivery rate, pacing rate, retransmissions of ss -tin per sender
+        self.ss_values = ss_values if ss_values is not None else {}
         self.data_info = data_info
 
     def values_as_dict(self):
@@ -29,7 +49,8 @@ class PcapData:
             'cwnd_values': self.cwnd_values,
             'retransmissions': self.retransmissions,
             'retransmissions_interval': self.retransmissions_interval,
-            'buffer_backlog': self.buffer_backlog
+            'buffer_backlog': self.buffer_backlog,
+            'ss_values': self.ss_values
         }
 
     @staticmethod
@@ -46,30 +67,33 @@ class PcapData:
             cwnd_values=pcap_dict['cwnd_values'],
             retransmissions=pcap_dict['retransmissions'],
             retransmissions_interval=pcap_dict['retransmissions_interval'],
-            buffer_backlog=pcap_dict['buffer_backlog']
+            buffer_backlog=pcap_dict['buffer_backlog'],
+            ss_values=pcap_dict.get('ss_values')
         )
 
-    def get_min_ts(self):
-        t_min = float('inf')
+    def finalize(self):
+        # every column as a float64 ndarray, for vectorized access
         data = self.values_as_dict()
         for v in data:
             for c in data[v]:
-                if len(data[v][c][0]) > 0:
-                    t_min = min(t_min, data[v][c][0][0])
-        return t_min
+                data[v][c] = tuple(as_ndarray(column) for column in data[v][c])
+        return self
+
+    def get_min_ts(self):
+        data = self.values_as_dict()
+        firsts = [data[v][c][0][0] for v in data for c in data[v] if len(data[v][c][0]) > 0]
+        return min(firsts, default=float('inf'))
 
     def get_max_ts(self):
-        t_max = -float('inf')
         data = self.values_as_dict()
-        for v in data:
-            for c in data[v]:
-                if len(data[v][c][0]) > 0:
-                    t_max = max(t_max, data[v][c][0][-1])
-        return t_max
+        lasts = [data[v][c][0][-1] for v in data for c in data[v] if len(data[v][c][0]) > 0]
+        return max(lasts, default=-float('inf'))
 
 
 class DataInfo:
 
-    def __init__(self, sync_duration, sync_phases):
+    def __init__(self, sync_duration, sync_phases, flow_stats=None):
         self.sync_duration = sync_duration
         self.sync_phases = sync_phases
+        # capture -> {UDP flow: FlowStats}
+        self.flow_stats = flow_stats if flow_stats is not None else {}
@@ -0,0 +1,65 @@
+import heapq
+from collections import deque
+
+
+class UnackedSequences:
+    """
+    Sequence numbers sent but not yet acknowledged by one connection.
+
+    A set answers "was this sequence number sent before" (a retransmission) in O(1),
+    a min-heap of the same numbers drops everything below a cumulative ACK in O(log n) each.
+    """
+
+    def __init__(self):
+        self._seqs = set()
+        self._heap = []
+
+    def __contains__(self, seq):
+        return seq in self._seqs
+
+    def __len__(self):
+        return len(self._seqs)
+
+    def add(self, seq):
+        if seq not in self._seqs:
+            self._seqs.add(seq)
+            heapq.heappush(self._heap, seq)
+
+    def ack(self, ack):
+        # remove every sequence number below the acknowledged one
+        heap = self._heap
+        while heap and heap[0] < ack:
+            self._seqs.discard(heapq.heappop(heap))
+
+
+class TimestampEchoes:
+    """
+    Send times of the data packets by TSval, matched against the TSecr of the ACKs for RTT samples.
+
+    Packets sharing a TSval are matched in the order they were sent.
+    """
+
+    def __init__(self):
+        self._sent = {}     # ts_val -> deque of capture timestamps
+
+    def __len__(self):
+        return sum(len(v) for v in self._sent.values())
+
+    def add(self, ts_val, ts):
+        sent = self._sent.get(ts_val)
+        if sent is None:
+            sent = self._sent[ts_val] = deque()
+        sent.append(ts)
+
+    def match(self, ts_ecr):
+        """
+        Returns the send time of the oldest packet whose TSval is ts_ecr and forgets it,
+        None if no packet is waiting for this echo.
+        """
+        sent = self._sent.get(ts_ecr)
+        if sent is None:
+            return None
+        ts = sent.popleft()
+        if not sent:
+            del self._sent[ts_ecr]
+        return ts
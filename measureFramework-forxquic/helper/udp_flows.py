@@ -0,0 +1,64 @@
+import math
+
+# QUIC hides its handshake and close, a UDP flow that sent nothing for this many seconds ends
+UDP_IDLE_TIMEOUT = 2.0
+
+
+class FlowStats:
+    """
+    Packet count, volume and inter-arrival times of one direction of a UDP flow.
+
+    The inter-arrival statistics are running sums (Welford), so a capture of any length
+    needs constant memory per flow.
+    """
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.min_gap = float('inf')
+        self.max_gap = 0.0
+        self._gap_mean = 0.0
+        self._gap_m2 = 0.0
+
+    def add(self, ts, size):
+        if self.last_ts is None:
+            self.first_ts = ts
+        else:
+            gap = (ts - self.last_ts) * 1000
+            gaps = self.packets  # gaps seen so far, including this one
+            delta = gap - self._gap_mean
+            self._gap_mean += delta / gaps
+            self._gap_m2 += delta * (gap - self._gap_mean)
+            self.min_gap = min(self.min_gap, gap)
+            self.max_gap = max(self.max_gap, gap)
+        self.last_ts = ts
+        self.packets += 1
+        self.bytes += size
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    @staticmethod
+    def from_dict(values):
+        stats = FlowStats()
+        stats.__dict__.update(values)
+        return stats
+
+    @property
+    def mean_gap(self):
+        # ms
+        return self._gap_mean if self.packets > 1 else 0.0
+
+    @property
+    def std_gap(self):
+        # ms
+        return math.sqrt(self._gap_m2 / (self.packets - 1)) if self.packets > 1 else 0.0
+
+    @property
+    def rate(self):
+        # bit/s over the lifetime of the flow
+        if self.packets < 2 or self.last_ts == self.first_ts:
+            return 0.0
+        return self.bytes * 8 / (self.last_ts - self.first_ts)
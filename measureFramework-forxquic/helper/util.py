@@ -186,6 +186,18 @@ def open_compressed_file(path, write=False):
         raise Exception(f'Unknown file extension: {path}')
 
 
+def open_compressed_stream(path):
+    # Returns (decompressed file, raw file). raw.tell() is the offset in the file on disk,
+    # used to estimate the progress of a single pass without counting the frames first.
+    raw = open(path, 'rb')
+    file_extension = os.path.splitext(path)[1]
+    if file_extension == '.gz':
+        return gzip.GzipFile(fileobj=raw, mode='rb'), raw
+    if file_extension == '.bz2':
+        return bz2.BZ2File(raw, 'rb'), raw
+    return raw, raw
+
+
 def check_directory(dir, only_new=False):
 
     pcap1_exists = find_file(os.path.join(dir, PCAP1)) is not None
@@ -1,5 +1,20 @@
 while true;
 do
-    ss -tin | sed -n -e 's/.* cwnd:\([0-9]*\).* bbr:(\([^)]*\)).*/\1;;\2/p' -e 's/.* cwnd:\([0-9]*\).* ssthresh:\([0-9]*\).*/\1;\2;/p';
+    # cwnd;ssthresh;rtt;delivery_rate;pacing_rate;retrans;bbr of every connection with a cwnd
+    ss -tin | awk '/ cwnd:/ {
+        cwnd = ""; ssthresh = ""; bbr = ""; rtt = ""; delivery = ""; pacing = ""; retrans = "";
+        for (i = 1; i <= NF; i++) {
+            if ($i ~ /^cwnd:/) cwnd = substr($i, 6);
+            else if ($i ~ /^ssthresh:/) ssthresh = substr($i, 10);
+            else if ($i ~ /^bbr:\(/) { bbr = substr($i, 6); sub(/\)$/, "", bbr) }
+            else if ($i ~ /^rtt:/) { rtt = substr($i, 5); sub(/\/.*/, "", rtt) }
+            else if ($i == "delivery_rate") delivery = $(i + 1);
+            else if ($i == "pacing_rate") pacing = $(i + 1);
+            else if ($i ~ /^retrans:/) { retrans = substr($i, 9); sub(/.*\//, "", retrans) }
+        }
+        if (retrans == "") retrans = 0;
+        print cwnd ";" ssthresh ";" rtt ";" delivery ";" pacing ";" retrans ";" bbr;
+        fflush();
+    }';
     sleep $1;
 done | ts '%.s;'
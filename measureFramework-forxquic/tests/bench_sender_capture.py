@@ -0,0 +1,64 @@
+"""
+Benchmark of parse_sender_capture on a synthetic capture, 1M frames by default
+
+python tests/bench_sender_capture.py
+python tests/bench_sender_capture.py -n 200000 --reference     # also the list based state, quadratic
+
+The capture is written once into the directory given by -d (default a temporary one) and
+reused by later runs with the same directory.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import analyze
+from helper import PCAP1
+from reference_tcp_state import ListUnackedSequences, ListTimestampEchoes
+from synthetic_capture import write_capture
+
+
+def time_sender_capture(directory):
+    path = os.path.join(directory, PCAP1 + '.gz')
+    start_ts = analyze.peek_start_ts(path)
+    progress = analyze.CaptureProgress([path])
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyze.parse_sender_capture(path, 0.2, start_ts, progress)
+    return time.perf_counter() - start, progress.frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', dest='packets', type=int, default=1000000, help='frames of the sender capture')
+    parser.add_argument('-d', dest='directory', default=None, help='directory of the capture')
+    parser.add_argument('-w', dest='window', type=int, default=200, help='unacknowledged packets per flow')
+    parser.add_argument('--reference', action='store_true',
+                        help='also time the list based state parse_sender_capture used before')
+    args = parser.parse_args()
+
+    directory = args.directory or os.path.join(tempfile.gettempdir(),
+                                               'bench_capture_{}_{}'.format(args.packets, args.window))
+    if not os.path.exists(os.path.join(directory, PCAP1 + '.gz')):
+        start = time.perf_counter()
+        write_capture(directory, args.packets, window=args.window)
+        print('capture written to {} in {:.1f}s'.format(directory, time.perf_counter() - start))
+
+    seconds, frames = time_sender_capture(directory)
+    print('tcp_state : {} frames in {:.2f}s, {:.0f} frames/s'.format(frames, seconds, frames / seconds))
+
+    if args.reference:
+        analyze.UnackedSequences = ListUnackedSequences
+        analyze.TimestampEchoes = ListTimestampEchoes
+        seconds, frames = time_sender_capture(directory)
+        print('lists     : {} frames in {:.2f}s, {:.0f} frames/s'.format(frames, seconds, frames / seconds))
+
+
+if __name__ == '__main__':
+    main()
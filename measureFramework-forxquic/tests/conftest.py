@@ -0,0 +1,6 @@
+import os
+import sys
+
+# analyze.py and helper/ are imported from the framework directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,49 @@
+"""
+The loop based compute_fairness / compute_jain_index of analyze.py before they were
+vectorized, as a reference for the equivalence test. Samples are matched by == on the
+accumulated timestamp of every interval.
+"""
+
+
+def compute_fairness(data, interval):
+    output = [[], []]
+    connections = {k: 0 for k in data.keys()}
+
+    max_ts = 0
+    min_ts = float('inf')
+    for c in data:
+        max_ts = max(max_ts, max(data[c][0]))
+        min_ts = min(min_ts, min(data[c][0]))
+
+    ts = min_ts
+    while True:
+        if ts > max_ts:
+            break
+
+        shares = []
+        for i in data.keys():
+            if len(data[i][0]) <= connections[i]:
+                continue
+            if data[i][0][connections[i]] == ts:
+                shares.append(data[i][1][connections[i]])
+                connections[i] += 1
+
+        output[0].append(ts)
+        output[1].append(compute_jain_index(*shares))
+        ts += interval
+    return output
+
+
+def compute_jain_index(*args):
+
+    sum_normal = 0
+    sum_square = 0
+
+    for arg in args:
+        sum_normal += arg
+        sum_square += arg**2
+
+    if len(args) == 0 or sum_square == 0:
+        return 1
+
+    return sum_normal ** 2 / (len(args) * sum_square)
@@ -0,0 +1,43 @@
+"""
+The list based state of parse_sender_capture before helper/tcp_state.py, as a reference
+for the equivalence test and the benchmark. Every operation is linear in the window.
+"""
+
+
+class ListUnackedSequences:
+
+    def __init__(self):
+        self._seqs = []
+
+    def __contains__(self, seq):
+        return seq in self._seqs
+
+    def __len__(self):
+        return len(self._seqs)
+
+    def add(self, seq):
+        self._seqs.append(seq)
+
+    def ack(self, ack):
+        self._seqs = [x for x in self._seqs if x >= ack]
+
+
+class ListTimestampEchoes:
+
+    def __init__(self):
+        self._ts = []
+        self._ts_vals = []
+
+    def __len__(self):
+        return len(self._ts)
+
+    def add(self, ts_val, ts):
+        self._ts.append(ts)
+        self._ts_vals.append(ts_val)
+
+    def match(self, ts_ecr):
+        if ts_ecr not in self._ts_vals:
+            return None
+        index = self._ts_vals.index(ts_ecr)
+        self._ts_vals.pop(index)
+        return self._ts.pop(index)
@@ -0,0 +1,88 @@
+"""
+Synthetic TCP captures for the tests and benchmarks of analyze.py
+
+s1.pcap.gz (sender side) : data packets and ACKs with TCP timestamps, about 3 % of the data
+packets are retransmissions and several packets of a flow share a TSval.
+s3.pcap.gz (bottleneck) : the data packets of s1, 2 ms later, about 2 % are lost.
+The first flow sends a FIN after 90 % of the packets.
+
+python tests/synthetic_capture.py <directory> <packets>
+"""
+import gzip
+import os
+import random
+import socket
+import sys
+
+import dpkt
+
+
+def tcp_frame(src, dst, sport, dport, seq, ack, flags, payload=b'', ts_val=None, ts_ecr=None):
+    tcp = dpkt.tcp.TCP(sport=sport, dport=dport, seq=seq % 2 ** 32, ack=ack % 2 ** 32, flags=flags, data=payload)
+    if ts_val is not None:
+        tcp.opts = bytes([1, 1, 8, 10]) + ts_val.to_bytes(4, 'big') + ts_ecr.to_bytes(4, 'big')
+        tcp.off = 5 + len(tcp.opts) // 4
+    ip = dpkt.ip.IP(src=socket.inet_aton(src), dst=socket.inet_aton(dst), p=dpkt.ip.IP_PROTO_TCP, data=tcp)
+    ip.len = len(ip)
+    return bytes(dpkt.ethernet.Ethernet(data=ip, type=dpkt.ethernet.ETH_TYPE_IP))
+
+
+def write_capture(directory, packets, flows=3, seed=1, window=200):
+    """
+    directory : experiment directory, s1.pcap.gz and s3.pcap.gz are written into it
+    packets : frames of the sender capture after the handshakes
+    window : data packets of a flow that may still be unacknowledged
+    """
+    rnd = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    s1 = dpkt.pcap.Writer(gzip.open(os.path.join(directory, 's1.pcap.gz'), 'wb'))
+    s3 = dpkt.pcap.Writer(gzip.open(os.path.join(directory, 's3.pcap.gz'), 'wb'))
+
+    state = []
+    for i in range(flows):
+        state.append({'client': '10.1.{}.1'.format(i), 'server': '10.2.0.1', 'cport': 40000 + i, 'sport': 5201,
+                      'isn': rnd.randrange(2 ** 32), 'seq': 0, 'ts_val': 1000, 'sent': [], 'fin': False})
+
+    t = 1000.0
+    for i, f in enumerate(state):
+        syn = tcp_frame(f['client'], f['server'], f['cport'], f['sport'], f['isn'], 0, dpkt.tcp.TH_SYN)
+        s1.writepkt(syn, t + 0.01 * i)
+        s3.writepkt(syn, t + 0.01 * i + 0.001)
+    t += 0.05
+
+    for n in range(packets):
+        f = state[rnd.randrange(flows)]
+        if f['fin']:
+            continue
+        t += rnd.expovariate(20000)
+        f['ts_val'] += rnd.randrange(0, 2)
+        if rnd.random() < 0.6 or not f['sent']:
+            if rnd.random() < 0.03 and f['sent']:
+                seq = rnd.choice(f['sent'][-50:])   # retransmission
+            else:
+                seq = f['seq']
+                f['seq'] += 1448
+                f['sent'].append(seq)
+                del f['sent'][:-window]
+            frame = tcp_frame(f['client'], f['server'], f['cport'], f['sport'], f['isn'] + 1 + seq, 1,
+                              dpkt.tcp.TH_ACK, b'x' * 1448, f['ts_val'], 0)
+            s1.writepkt(frame, t)
+            if rnd.random() < 0.98:
+                s3.writepkt(frame, t + 0.002)
+        else:
+            ack = rnd.choice(f['sent'][-20:]) + 1448
+            ts_ecr = f['ts_val'] - rnd.randrange(0, 3)
+            s1.writepkt(tcp_frame(f['server'], f['client'], f['sport'], f['cport'], 1, f['isn'] + 1 + ack,
+                                  dpkt.tcp.TH_ACK, b'', f['ts_val'] + 7, ts_ecr), t)
+        if n > packets * 0.9 and f is state[0]:
+            f['fin'] = True
+            fin = tcp_frame(f['client'], f['server'], f['cport'], f['sport'], f['isn'] + 1 + f['seq'], 1,
+                            dpkt.tcp.TH_FIN | dpkt.tcp.TH_ACK)
+            s1.writepkt(fin, t)
+            s3.writepkt(fin, t + 0.002)
+    s1.close()
+    s3.close()
+
+
+if __name__ == '__main__':
+    write_capture(sys.argv[1], int(sys.argv[2]))
@@ -0,0 +1,88 @@
+#
+# compute_fairness / jain_index of analyze.py against the loop based version they replaced
+#
+# cd measureFramework-forxquic; python -m pytest tests
+#
+
+import random
+
+import numpy as np
+import pytest
+
+import analyze
+import reference_fairness
+
+
+def grid(start, interval, n):
+    # timestamps accumulated like the old loop, so that its == matching finds them
+    ts, out = start, []
+    for _ in range(n):
+        out.append(ts)
+        ts += interval
+    return out
+
+
+def random_connections(rnd, interval, steps, count):
+    times = grid(rnd.uniform(0, 100), interval, steps)
+    data = {}
+    for c in range(count):
+        # flows start late, stop early and miss some intervals
+        first = rnd.randrange(steps // 2)
+        last = rnd.randrange(first, steps)
+        kept = [i for i in range(first, last + 1) if rnd.random() < 0.8] or [first]
+        data[f"conn{c}"] = [[times[i] for i in kept], [rnd.choice([0.0, rnd.uniform(0, 50)]) for _ in kept]]
+    return data
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_compute_fairness_matches_loop(seed):
+    rnd = random.Random(seed)
+    interval = rnd.choice([0.1, 0.2, 0.5, 1.0])
+    data = random_connections(rnd, interval, steps=rnd.randrange(1, 300), count=rnd.randrange(1, 8))
+
+    expected = reference_fairness.compute_fairness(data, interval)
+    ts, fairness = analyze.compute_fairness(data, interval)
+    assert len(ts) == len(expected[0])
+    np.testing.assert_allclose(ts, expected[0], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(fairness, expected[1], rtol=1e-12)
+
+
+def test_compute_jain_index_matches_loop():
+    rnd = random.Random(1)
+    cases = [(), (0.0,), (0.0, 0.0), (5.0,), (1.0, 1.0), (3.0, 0.0)]
+    cases += [tuple(rnd.uniform(0, 100) for _ in range(rnd.randrange(1, 20))) for _ in range(100)]
+    for args in cases:
+        assert analyze.compute_jain_index(*args) == pytest.approx(reference_fairness.compute_jain_index(*args),
+                                                                  rel=1e-12)
+
+
+def test_samples_are_matched_by_bin():
+    # k * interval differs from the accumulated timestamps in the last bits, the old loop
+    # stopped matching such a connection at the first difference
+    interval = 0.1
+    data = {"a": [[k * interval for k in range(100)], [10.0] * 100],
+            "b": [grid(0.0, interval, 100), [20.0] * 100]}
+    assert any(x != y for x, y in zip(data["a"][0], data["b"][0]))
+    _, fairness = analyze.compute_fairness(data, interval)
+    np.testing.assert_allclose(fairness, 0.9)     # (10 + 20)^2 / (2 * (100 + 400))
+    # the loop lost "a" and reported b alone as perfectly fair
+    assert reference_fairness.compute_fairness(data, interval)[1][-1] == 1.0
+
+
+def test_window_averages_each_connection():
+    interval = 1.0
+    data = {"a": [[0.0, 1.0, 2.0, 3.0], [10.0, 0.0, 10.0, 0.0]],
+            "b": [[0.0, 1.0, 2.0, 3.0], [0.0, 10.0, 0.0, 10.0]]}
+    _, fairness = analyze.compute_fairness(data, interval)
+    np.testing.assert_allclose(fairness, [0.5, 0.5, 0.5, 0.5])
+    # averaged over 2 bins both flows get 5 from the second bin on
+    _, fairness = analyze.compute_fairness(data, interval, window=2)
+    np.testing.assert_allclose(fairness, [0.5, 1.0, 1.0, 1.0])
+
+
+def test_connections_without_samples_are_skipped():
+    data = {"a": [[0.0, 1.0], [1.0, 3.0]], "empty": [[], []]}
+    ts, fairness = analyze.compute_fairness(data, 1.0)
+    np.testing.assert_allclose(ts, [0.0, 1.0])
+    np.testing.assert_allclose(fairness, [1.0, 1.0])
+    assert len(analyze.compute_fairness({"empty": [[], []]}, 1.0)[0]) == 0
@@ -0,0 +1,91 @@
+#
+# helper/tcp_state.py against the list based state it replaced, on random operations and on
+# a synthetic capture parsed end to end
+#
+# cd measureFramework-forxquic; python -m pytest tests
+#
+
+import io
+import contextlib
+import random
+
+import numpy as np
+import pytest
+
+import analyze
+from helper.tcp_state import UnackedSequences, TimestampEchoes
+from reference_tcp_state import ListUnackedSequences, ListTimestampEchoes
+from synthetic_capture import write_capture
+
+
+def test_unacked_sequences_random_operations():
+    rnd = random.Random(7)
+    new, old = UnackedSequences(), ListUnackedSequences()
+    next_seq = 0
+    for _ in range(20000):
+        if rnd.random() < 0.6:
+            # new data or a retransmission of a recent sequence number
+            seq = next_seq if rnd.random() < 0.9 else rnd.randrange(max(next_seq - 50 * 1448, 0), next_seq + 1, 1448)
+            assert (seq in new) == (seq in old)
+            if seq not in old:
+                new.add(seq)
+                old.add(seq)
+            if seq == next_seq:
+                next_seq += 1448
+        else:
+            ack = rnd.randrange(max(next_seq - 100 * 1448, 0), next_seq + 1, 1448)
+            new.ack(ack)
+            old.ack(ack)
+        assert len(new) == len(old)
+
+
+def test_timestamp_echoes_random_operations():
+    rnd = random.Random(7)
+    new, old = TimestampEchoes(), ListTimestampEchoes()
+    ts_val, ts = 1000, 0.0
+    for _ in range(20000):
+        ts += 0.001
+        if rnd.random() < 0.6:
+            ts_val += rnd.randrange(0, 2)   # several packets share a TSval
+            new.add(ts_val, ts)
+            old.add(ts_val, ts)
+        else:
+            ts_ecr = ts_val - rnd.randrange(0, 4)
+            assert new.match(ts_ecr) == old.match(ts_ecr)
+        assert len(new) == len(old)
+
+
+def parse(directory):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return analyze.parse_pcap(directory, 0.2, parallel=False, use_cache=False).values_as_dict()
+
+
+def assert_same(new, old, path='values'):
+    assert type(new) == type(old), path
+    if isinstance(new, dict):
+        assert new.keys() == old.keys(), path
+        for key in new:
+            assert_same(new[key], old[key], '{}[{!r}]'.format(path, key))
+    elif isinstance(new, (list, tuple)):
+        assert len(new) == len(old), path
+        for i, (a, b) in enumerate(zip(new, old)):
+            assert_same(a, b, '{}[{}]'.format(path, i))
+    elif isinstance(new, np.ndarray):
+        np.testing.assert_array_equal(new, old, err_msg=path)
+    else:
+        assert new == old, path
+
+
+@pytest.mark.parametrize('window', [20, 200])
+def test_pcap_data_equivalence(tmp_path, monkeypatch, window):
+    write_capture(str(tmp_path), 20000, window=window)
+    new = parse(str(tmp_path))
+
+    monkeypatch.setattr(analyze, 'UnackedSequences', ListUnackedSequences)
+    monkeypatch.setattr(analyze, 'TimestampEchoes', ListTimestampEchoes)
+    old = parse(str(tmp_path))
+
+    assert_same(new, old)
+    # the capture exercises retransmissions and RTT samples
+    assert any(len(v[0]) > 0 for c, v in new['retransmissions'].items() if c != 'total')
+    assert any(len(v[0]) > 0 for c, v in new['avg_rtt'].items() if c != 'total')
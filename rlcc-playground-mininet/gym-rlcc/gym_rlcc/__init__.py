@@ -32,3 +32,15 @@ register(
     entry_point="gym_rlcc.envs:RlccEnvQT",
 )
 
+
+# asyncio env core, blocking adapter
+register(
+    id="gym_rlcc/rlcc-v0-async",
+    entry_point="gym_rlcc.envs:RlccEnvAsync",
+)
+
+# replay of traces recorded by gym_rlcc.recorder, no network
+register(
+    id="gym_rlcc/rlcc-v0-replay",
+    entry_point="gym_rlcc.envs:RlccReplayEnv",
+)
@@ -3,4 +3,7 @@ from gym_rlcc.envs.rlcc_world_rllib import RlccEnvR
 from gym_rlcc.envs.rlcc_world_multi import RlccEnvMulti
 from gym_rlcc.envs.rlcc_world_multi_rllib import RlccEnvMultiR
 from gym_rlcc.envs.rlcc_world_qlearning import RlccEnvQ
-from gym_rlcc.envs.rlcc_world_qlearning_TCP import RlccEnvQT
\ No newline at end of file
+from gym_rlcc.envs.rlcc_world_qlearning_TCP import RlccEnvQT
+from gym_rlcc.envs.rlcc_world_vec import RlccVecEnv
+from gym_rlcc.envs.rlcc_world_async import RlccHub, AsyncRlccEnv, RlccEnvAsync
+from gym_rlcc.envs.rlcc_world_replay import RlccReplayEnv, ReplayTransitions
@@ -3,6 +3,8 @@ import numpy as np
 from redis.client import Redis
 from gym import spaces
 from typing import Optional, Union
+from gym_rlcc.protocol import StateDecoder, MessageStream, parse_info, observation, start_flow, flow_starter
+from gym_rlcc.protocol import STATE_SCALE, MSG_STATE, MSG_DONE, RESET_TIMEOUT, RESET_RETRIES
 # from gym.utils import seeding
 
 
@@ -77,6 +79,8 @@ class RlccEnv(gym.Env):
         config["reward_function"] : selfdefined reward function : 
             input : state : obs
             return : reward value
+        config["reset_timeout"] : seconds reset waits for the first state of a new flow, default 30
+        config["reset_retries"] : reset attempts before raising RlccResetError, default 5
 
     """
     # metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 4}
@@ -99,7 +103,7 @@ class RlccEnv(gym.Env):
         self.rp = Redis(host=redis_host, port=redis_port)
         pub = r.pubsub()
         pub.subscribe(channels)
-        self.msg_stream = pub.listen()
+        self.msg_stream = MessageStream(pub)   # pub.listen(), 可设超时
 
         high = np.array(
             [
@@ -119,7 +123,8 @@ class RlccEnv(gym.Env):
             dtype=np.float32,
         )
 
-        self.scale = np.array([1, 1, 512, 512, 512, 16384, 1, 1, 1, 1024, 1024, 1], dtype=np.float32)
+        self.scale = STATE_SCALE
+        self.decoder = StateDecoder(self.scale)
         
         if "plan" in config.keys():
             self.plan = config["plan"]
@@ -133,6 +138,17 @@ class RlccEnv(gym.Env):
             self.maxsteps = 1800
         self.step_count = 0
 
+        # reset 等待新流第一个状态的超时(秒) 与 连续失败上限, 见 reset()
+        if "reset_timeout" in config.keys():
+            self.reset_timeout = config["reset_timeout"]
+        else:
+            self.reset_timeout = RESET_TIMEOUT
+        if "reset_retries" in config.keys():
+            self.reset_retries = config["reset_retries"]
+        else:
+            self.reset_retries = RESET_RETRIES
+        self.reset_info = {}    # 最近一次 reset 的信息, reset_retries : 重试次数
+
         # 对应rlcc.c中 pacing rate，用倍率调整
         if self.plan == 1:
             self.action_max = 3.0
@@ -218,73 +234,21 @@ class RlccEnv(gym.Env):
 
         return reward
 
-    def _get_obs(self):
-        # also can : pub.get_message()
-        for msg in self.msg_stream:
+    def _get_obs(self, timeout: Optional[float] = None):
+        # timeout : 秒, None 一直阻塞; 超时返回 None
+        # 消息分类与状态解析统一在 gym_rlcc/protocol.py
+        for msg in self.msg_stream.messages(timeout):
             if msg["type"] == "message":
-                """
-                state_list = msg["data"].decode("utf-8").split(';')
-                current_channel = msg["channel"].decode("utf-8")
-
-                if len(state_list)==0:
-                    # print("get state from rlcc.c error")
-                    # 这里 throw 一个错误
-                    raise Exception('redis通信有误, gym收到空data')
-                    # continue
-
-                state_dict = {}
-                for d in state_list:
-                    k, v = d.split(":")
-                    state_dict[k] = v
-
-                if current_channel == "mininet" and state_dict['rlcc_flag'] == f"{self.rlcc_flag}": # and前成立才会判断and后
-                    # 流启动前，回返链路状态消息
-                    #print(state_list)   # 长度为4 是 miniet发回来的链路信息
-                    if len(state_dict)==3:  # 长度3 是 流执行完的统计信息
-                        # 这里返回done表示环境结束，gym环境的重启交给reset函数
-                        return 'done'
-                elif current_channel == f'rlccstate_{self.rlcc_flag}':
-                    # current_channel_id = current_channel.split('_')[-1]   # 此处的channel_id来自rlcc.c，为rlcc_flag
-                    if len(state_list)==1:
-                        # redis 频道初始化的第一条消息，跳过直接继续去获取状态
-                        #print(current_channel,":",state_dict['state'])
-                        continue
-
-                    # 解析状态
-                    for k,v in state_dict.items():
-                        state_dict[k] = float(v)
-
-                    # TODO: 转换为标准的状态
-                    state = np.array(list(state_dict.values()), dtype=np.float32)
-                    return state
-                """
-                # 去掉所有可能影响性能的点
-                # 硬编码保证高性能：rlcc直接传值，不传键，只用split后的长度来区分信息
-                # 携带rlcc信息的列表长度长于5，4包括4以下的均为链路信息，用于调试
-
-                """
-                len(data_list) 为0 出错
-                len(data_list) 为1 channel初始化消息
-                len(data_list) 为3 流结束通知
-                len(data_list) 为4 启动时的流初始状态信息
-                """
-                # data_list = np.char.split(
-                #     np.char.decode(msg["data"]), sep=';').tolist()
-                data_list = msg["data"].decode("utf-8").split(';')
-                len_of_list = len(data_list)
-
-                if len_of_list > 5:
-                    data = np.array(data_list, dtype=np.float32)    # receive with np.int64
-                    return np.divide(data, self.scale, dtype=np.float32)
-                elif len_of_list == 3:      # done
+                kind, state = self.decoder.decode(msg["data"])
+                if kind == MSG_STATE:
+                    return state.copy()     # decoder 复用输出缓冲, 返回的状态需要拷贝
+                elif kind == MSG_DONE and parse_info(self.decoder.fields)["rlcc_flag"] == str(self.rlcc_flag):
+                    # mininet 频道是所有流共用的, 只处理本流的结束消息
                     return np.array([0], dtype=np.float32)
-                # 只处理大于5的列表
-                else:
-                    continue
+                # init / link 等其他消息跳过
 
             elif msg["type"] == "subscribe":
                 continue
-                # print(f'{self.rlcc_flag}', str(msg["channel"], encoding="utf-8"), 'mininet订阅成功')
 
     def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
         # gym环境通过reset来启动和重新开启环境
@@ -292,24 +256,25 @@ class RlccEnv(gym.Env):
         if self.step_count > 50: # 连续重启不算
             self.rp.publish('redis', f"{self.rlcc_flag}stop") # 此时sampleFactory的重启会生效，50算是最短重启步数？
             self.step_count = 0
-        
-        # 重启新流
-        self.rp.publish('redis', self.rlcc_flag)
 
-        # 启动后，获取第一次状态
-        self.state = self._get_obs()
-        if len(self.state) == 1:   # sometimes reset failed while async samplers in rllib, continue reset
-                                    # tianshou 也出现了 重启失败的案例 ： 可能是上次退出的残留信息干扰了结果
-                                    # 重复启动可以解决问题，但是不完美 
-            self.reset()
+        self.state = self._start_flow()
         print(f"reset : {self.rlcc_flag} : {self.state}")
         
         # # tianshou, sampleFactory
         # # state, info
-        return self.state[:-3], {}
+        return observation(self.state), self.reset_info
 
         # # rllib 
-        # return self.state[:-3]      # 最后三位是专属用于计算奖励
+        # return observation(self.state)      # 最后三位是专属用于计算奖励
+
+    def _start_flow(self):
+        # 启动新流并获取第一次状态, 不递归, 有超时与重试上限, 见 gym_rlcc.protocol.start_flow
+        # sometimes reset failed while async samplers in rllib / tianshou :
+        # 上次退出的残留信息(done, state)会干扰结果, 启动前先丢弃
+        state, retries = start_flow(self._get_obs, flow_starter(self.rp, self.rlcc_flag), self.msg_stream.drain,
+                                    self.reset_timeout, self.reset_retries, name=f"rlcc_flag {self.rlcc_flag}")
+        self.reset_info = {"reset_retries": retries}
+        return state
         
 
     def step(self, action):
@@ -321,11 +286,11 @@ class RlccEnv(gym.Env):
             self.step_count = 0
             # # return
             # # old api
-            # return self.last_state[:-3], self.reward_function(self.last_state), True, {}
+            # return observation(self.last_state), self.reward_function(self.last_state), True, {}
 
             # # new api https://github.com/openai/gym/pull/2752
             # # state, reward, terminated, truncated, info
-            return self.last_state[:-3], self.reward_function(self.last_state), False, True, {}
+            return observation(self.last_state), self.reward_function(self.last_state), False, True, {}
 
         # 动作处理，适应不同的RL框架
         if self.plan >= 2:  # 离散cwnd动作
@@ -352,18 +317,18 @@ class RlccEnv(gym.Env):
         # # old api
         # if len(self.state) == 1:
         #     # # return
-        #     return self.last_state[:-3], self.reward_function(self.last_state), True, {}
+        #     return observation(self.last_state), self.reward_function(self.last_state), True, {}
         # # state, reward, done, info
         # self.last_state = self.state
         # # # return
-        # return self.state[:-3], self.reward_function(self.state), False, {}
+        # return observation(self.state), self.reward_function(self.state), False, {}
     
         # # new api https://github.com/openai/gym/pull/2752
         # # state, reward, terminated, truncated, info
         if len(self.state) == 1:
-            return self.last_state[:-3], self.reward_function(self.last_state), True, False, {}
+            return observation(self.last_state), self.reward_function(self.last_state), True, False, {}
         self.last_state = self.state
-        return self.state[:-3], self.reward_function(self.state), False, False, {}
+        return observation(self.state), self.reward_function(self.state), False, False, {}
         
 
     def render(self):
@@ -0,0 +1,312 @@
+import asyncio
+import gym
+import numpy as np
+from redis import asyncio as aioredis
+from gym import spaces
+from typing import Optional
+from gym_rlcc.protocol import StateDecoder, RlccResetError, parse_info, observation
+from gym_rlcc.protocol import STATE_SCALE, OBS_FIELDS, MSG_STATE, MSG_DONE, RESET_TIMEOUT, RESET_RETRIES
+
+
+class RlccHub:
+    """
+    One redis.asyncio connection + one pubsub shared by all AsyncRlccEnv of an event loop.
+
+    A reader task demultiplexes `rlccstate_<flag>` states and `mininet` done messages into one
+    asyncio.Queue per flag (state array, or None for done), so dozens of flows are serviced by one
+    event loop without threads. A message that fails to decode is logged and skipped; if the
+    reader itself stops (e.g. the connection is lost), its exception is put in every queue and
+    raised by the waiting envs and by register().
+
+    redis_host, redis_port : redis server
+    """
+
+    def __init__(self, redis_host: str="0.0.0.0", redis_port: int=6379):
+        self.redis = aioredis.Redis(host=redis_host, port=redis_port)
+        self.pubsub = self.redis.pubsub()
+        self.decoder = StateDecoder(STATE_SCALE)
+        self.queues = {}        # rlcc_flag -> asyncio.Queue
+        self._channel_flag = {}  # b"rlccstate_<flag>" -> rlcc_flag
+        self._subscribed = {}   # channel -> asyncio.Event, set on subscribe echo
+        self._reader = None
+        self._lock = None       # created in the event loop
+        self.error = None       # exception that stopped the reader
+
+    async def register(self, rlcc_flag) -> asyncio.Queue:
+        """
+        rlcc_flag : flow to listen to
+        return the queue of the flow, once its channel is subscribed
+        """
+        rlcc_flag = str(rlcc_flag)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:  # 并发注册时只启动一个 reader
+            if self.error is not None:
+                raise self.error
+            if rlcc_flag in self.queues:
+                return self.queues[rlcc_flag]
+            self.queues[rlcc_flag] = asyncio.Queue()
+            channel = f"rlccstate_{rlcc_flag}"
+            self._channel_flag[channel.encode()] = rlcc_flag
+
+            channels = [channel]
+            if self._reader is None:
+                channels.append('mininet')
+            for c in channels:
+                self._subscribed[c.encode()] = asyncio.Event()
+            await self.pubsub.subscribe(*channels)
+            if self._reader is None:
+                self._reader = asyncio.create_task(self._read())
+            # 等待订阅成功, 避免丢失流启动后的第一个状态
+            await asyncio.gather(*(self._subscribed[c.encode()].wait() for c in channels))
+            if self.error is not None:  # reader 在订阅完成前退出
+                raise self.error
+            return self.queues[rlcc_flag]
+
+    async def _read(self):
+        try:
+            async for msg in self.pubsub.listen():
+                try:
+                    self._dispatch(msg)
+                except Exception as e:     # 单条消息出错不能让 reader 退出
+                    print(f"RlccHub : skip message on {msg.get('channel')!r} : {e!r}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"RlccHub : reader stopped : {e!r}")
+            self._fail(e)
+
+    def _dispatch(self, msg):
+        if msg["type"] == "subscribe":
+            event = self._subscribed.get(msg["channel"])
+            if event is not None:
+                event.set()
+            return
+        if msg["type"] != "message":
+            return
+        kind, state = self.decoder.decode(msg["data"])
+        if kind == MSG_STATE:
+            flag = self._channel_flag.get(msg["channel"])
+            if flag is not None:
+                self.queues[flag].put_nowait(state.copy())  # decoder 复用输出缓冲
+        elif kind == MSG_DONE:
+            queue = self.queues.get(parse_info(self.decoder.fields).get("rlcc_flag"))
+            if queue is not None:
+                queue.put_nowait(None)
+
+    def _fail(self, error: Exception):
+        # 唤醒所有等待的 env 和 register(), 它们会抛出 error
+        self.error = error
+        for queue in self.queues.values():
+            queue.put_nowait(error)
+        for event in self._subscribed.values():
+            event.set()
+
+    async def publish(self, channel: str, data: str):
+        await self.redis.publish(channel, data)
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        await self.pubsub.aclose()
+        await self.redis.aclose()
+
+
+class AsyncRlccEnv:
+    """
+    ### Description
+
+    asyncio version of RlccEnv (gym_rlcc/rlcc-v0) : same action plans, observation and reward,
+    `await async_reset()` / `await async_step(action)` instead of reset() / step().
+
+    Many AsyncRlccEnv share one RlccHub, e.g. one sampler drives all flows of a host :
+
+        hub = RlccHub(redis_host)
+        envs = [AsyncRlccEnv({"rlcc_flag": 1001 + i}, hub) for i in range(32)]
+        await asyncio.gather(*(run_episode(env) for env in envs))
+
+    RlccEnvAsync wraps it as a blocking gym.Env.
+
+    ### Arguments
+    config : dict, same keys as RlccEnv
+        config['rlcc_flag'] : rlcc_flag
+        config['plan'] : action plan, default 1
+        config['maxsteps'] : steps before the flow is truncated, default 1800
+        config["reward_function"] : selfdefined reward function :
+            input : state : obs
+            return : reward value
+        config["reset_timeout"] : seconds reset waits for the first state of a new flow, default 30
+        config["reset_retries"] : reset attempts before raising RlccResetError, default 5
+    hub : RlccHub of the running event loop
+
+    """
+
+    def __init__(self, config: dict, hub: RlccHub):
+
+        assert config["rlcc_flag"], "you need init rlcc_flag by config['rlcc_flag']"
+
+        self.rlcc_flag = config["rlcc_flag"]
+        self.hub = hub
+        self.queue = None   # registered on first reset
+        self.last_state = None
+        self.state = None
+        if "reward_function" in config.keys():
+            self.reward_function = config["reward_function"]
+        else:
+            self.reward_function = self._reward
+
+        if "plan" in config.keys():
+            self.plan = config["plan"]
+        else:
+            self.plan = 1
+
+        if "maxsteps" in config.keys():
+            self.maxsteps = config["maxsteps"]
+        else:
+            self.maxsteps = 1800
+        self.step_count = 0
+
+        if "reset_timeout" in config.keys():
+            self.reset_timeout = config["reset_timeout"]
+        else:
+            self.reset_timeout = RESET_TIMEOUT
+        if "reset_retries" in config.keys():
+            self.reset_retries = config["reset_retries"]
+        else:
+            self.reset_retries = RESET_RETRIES
+
+        high = np.full(OBS_FIELDS, np.finfo(np.float32).max, dtype=np.float32)
+        self.observation_space = spaces.Box(0, high, dtype=np.float32)
+
+        if self.plan == 1:
+            self.action_max = 3.0
+            self.action_min = 0.5
+            self.action_space = spaces.Box(
+                low=self.action_min, high=self.action_max, shape=(1,), dtype=np.float32
+            )
+        if self.plan == 2:
+            self.action_max = 10
+            self.action_min = -10
+            self.action_space = spaces.Discrete(7)
+            self._action_to_direction = {0: -10, 1: -3, 2: -1, 3: 0, 4: 1, 5: 3, 6: 10}
+        if self.plan == 3:
+            self.action_max = 1
+            self.action_min = -1
+            self.action_space = spaces.Discrete(3)
+            self._action_to_direction = {0: 1, 1: 0, 2: -1}
+
+    def _reward(self, state):
+        # same as RlccEnv : throughput - (rtt - min_rtt)
+        return state[-2] - state[2] + state[3]
+
+    async def _get_obs(self, timeout: Optional[float] = None):
+        # timeout : 秒, None 一直等待; 超时返回 None
+        try:
+            state = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if isinstance(state, Exception):    # hub 的 reader 已退出
+            self.queue.put_nowait(state)    # 之后的调用同样抛出
+            raise state
+        if state is None:   # done
+            return np.array([0], dtype=np.float32)
+        return state
+
+    async def async_reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
+        if self.queue is None:
+            self.queue = await self.hub.register(self.rlcc_flag)
+
+        if self.step_count > 50: # 连续重启不算
+            await self.hub.publish('redis', f"{self.rlcc_flag}stop")
+            self.step_count = 0
+
+        # 与 gym_rlcc.protocol.start_flow 相同 : 等待期间收到的 done 属于上一个流, 跳过;
+        # 只有超时仍没有状态才发 <flag>stop
+        loop = asyncio.get_running_loop()
+        for retries in range(self.reset_retries):
+            while not self.queue.empty():   # 上次退出的残留信息
+                if self.hub.error is not None:
+                    raise self.hub.error
+                self.queue.get_nowait()
+            if retries == 0:
+                await self.hub.publish('redis', f"{self.rlcc_flag}")     # 重启新流
+            else:
+                await self.hub.publish('redis', f"{self.rlcc_flag}stop")     # mininet 关闭卡住的流并重启
+            deadline = loop.time() + self.reset_timeout
+            state = None
+            while True:
+                wait = deadline - loop.time()
+                if wait <= 0:
+                    state = None
+                    break
+                state = await self._get_obs(timeout=wait)
+                if state is None or len(state) > 1:
+                    break
+            if state is not None:
+                break
+            print(f"reset : {self.rlcc_flag} : no state from new flow, retry {retries + 1}/{self.reset_retries}")
+        else:
+            raise RlccResetError(f"rlcc_flag {self.rlcc_flag}: no state after {self.reset_retries} resets, "
+                                 f"{self.reset_timeout}s each")
+
+        self.state = state
+        self.last_state = state
+        return observation(self.state), {"reset_retries": retries}
+
+    async def async_step(self, action):
+        # 超时检测，太长时间没有结束，则主动结束此流
+        self.step_count += 1
+        if self.step_count >= self.maxsteps:
+            await self.hub.publish('redis', f"{self.rlcc_flag}stop")
+            self.step_count = 0
+            return observation(self.last_state), self.reward_function(self.last_state), False, True, {}
+
+        if self.plan >= 2:  # 离散cwnd动作
+            await self.hub.publish(f'rlccaction_{self.rlcc_flag}', f"{self._action_to_direction[np.asarray(action).item()]}")
+        else:
+            action = np.clip(np.asarray(action, dtype=np.float32).reshape(-1), self.action_min, self.action_max)
+            await self.hub.publish(f'rlccaction_{self.rlcc_flag}', f"0,{action[0]}")  # cwnd_rate, pacing_rate_rate
+
+        self.state = await self._get_obs()
+
+        if len(self.state) == 1:
+            return observation(self.last_state), self.reward_function(self.last_state), True, False, {}
+        self.last_state = self.state
+        return observation(self.state), self.reward_function(self.state), False, False, {}
+
+
+class RlccEnvAsync(gym.Env):
+    """
+    Blocking gym.Env adapter of AsyncRlccEnv, drop-in for RlccEnv (gym_rlcc/rlcc-v0-async).
+
+    It owns a private event loop and RlccHub, every reset() / step() runs the coroutine to the end.
+
+    ### Arguments
+    config : dict, see AsyncRlccEnv
+    """
+
+    def __init__(self, config: dict, render_mode: Optional[str] = None, redis_host: str="0.0.0.0", redis_port: int=6379):
+        self.loop = asyncio.new_event_loop()
+        self.hub = RlccHub(redis_host, redis_port)
+        self.env = AsyncRlccEnv(config, self.hub)
+        self.action_space = self.env.action_space
+        self.observation_space = self.env.observation_space
+
+    def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
+        return self.loop.run_until_complete(self.env.async_reset(seed, options))
+
+    def step(self, action):
+        return self.loop.run_until_complete(self.env.async_step(action))
+
+    def render(self):
+        return
+
+    def close(self):
+        if not self.loop.is_closed():
+            self.loop.run_until_complete(self.hub.close())
+            self.loop.close()
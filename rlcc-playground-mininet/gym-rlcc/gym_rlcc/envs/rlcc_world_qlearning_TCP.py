@@ -3,6 +3,8 @@ import numpy as np
 from redis.client import Redis
 from gym import spaces
 from typing import Optional, Union
+from gym_rlcc.protocol import StateDecoder, MessageStream, classify, start_flow
+from gym_rlcc.protocol import MSG_STATE, MSG_DONE, RESET_TIMEOUT, RESET_RETRIES
 # from gym.utils import seeding
 
 class RlccEnvQT(gym.Env):
@@ -67,6 +69,8 @@ class RlccEnvQT(gym.Env):
         config["reward_function"] : selfdefined reward function : 
             input : state : obs
             return : reward value
+        config["reset_timeout"] : seconds reset waits for the first state of a new flow, default 30
+        config["reset_retries"] : reset attempts before raising RlccResetError, default 5
 
     """
     # metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 4}
@@ -92,7 +96,7 @@ class RlccEnvQT(gym.Env):
         self.rp = Redis(host='0.0.0.0', port=6379)
         pub = r.pubsub()
         pub.psubscribe("rlccstate_*", "mininet")
-        self.msg_stream = pub.listen()
+        self.msg_stream = MessageStream(pub)   # pub.listen(), 可设超时
 
         high = np.array(
             [
@@ -109,6 +113,8 @@ class RlccEnvQT(gym.Env):
 
         # self.scale = np.array([1, 1, 512, 512], dtype=np.float32)
         self.scale = np.array([1, 1, 1, 1, 1, 1, 1], dtype=np.float32)
+        # tcp netlink 状态为 7 维, 更短的消息不是状态
+        self.decoder = StateDecoder(self.scale, parse_dtype=np.float64, min_fields=len(self.scale))
         
         if "plan" in config.keys():
             self.plan = config["plan"]
@@ -122,6 +128,17 @@ class RlccEnvQT(gym.Env):
             self.maxsteps = 1800
         self.step_count = 0
 
+        # reset 等待新流第一个状态的超时(秒) 与 连续失败上限, 见 reset()
+        if "reset_timeout" in config.keys():
+            self.reset_timeout = config["reset_timeout"]
+        else:
+            self.reset_timeout = RESET_TIMEOUT
+        if "reset_retries" in config.keys():
+            self.reset_retries = config["reset_retries"]
+        else:
+            self.reset_retries = RESET_RETRIES
+        self.reset_info = {}    # 最近一次 reset 的信息, reset_retries : 重试次数
+
         # 对应rlcc.c中 pacing rate，用倍率调整
         if self.plan == 1:
             self.action_max = 3.0
@@ -227,21 +244,15 @@ class RlccEnvQT(gym.Env):
 
         return reward
 
-    def _get_obs(self):
-        # also can : pub.get_message()
-        for msg in self.msg_stream:
+    def _get_obs(self, timeout: Optional[float] = None):
+        # timeout : 秒, None 一直阻塞; 超时返回 None
+        # 消息分类与状态解析统一在 gym_rlcc/protocol.py
+        for msg in self.msg_stream.messages(timeout):
             if msg["type"] == "pmessage":
-                """
-                mininet 
-                len(data_list) 为0 出错
-                len(data_list) 为1 channel初始化消息
-                len(data_list) 为3 流结束通知
-                len(data_list) 为4 启动时的流初始状态信息
-                """
                 channel = str(msg["channel"], encoding="utf-8")
                 if channel.startswith("mininet"):
-                    data_list = msg["data"].decode("utf-8").split(';')
-                    if len(data_list) == 3:      # done
+                    kind, _ = classify(msg["data"])
+                    if kind == MSG_DONE:
                         return np.array([0], dtype=np.float32)
 
                 if channel.startswith("rlccstate_"):
@@ -250,30 +261,28 @@ class RlccEnvQT(gym.Env):
                         self.cid = cid
                     elif cid != self.cid:
                         continue
-                    else:                    
-                        data_list = msg["data"].decode("utf-8").split(';')
-                        len_of_list = len(data_list)
-
-                        if len_of_list > 6:
-                            data = np.array(data_list, dtype=np.float64)    # receive with np.int64
-                            self.cwnd = data[-1]
-                            self.minrtt = data[2]
-                            return np.divide(data, self.scale, dtype=np.float32)
+                    else:
+                        kind, state = self.decoder.decode(msg["data"])
+                        if kind == MSG_STATE:
+                            self.cwnd = state[-1]
+                            self.minrtt = state[2]
+                            return state.copy()     # decoder 复用输出缓冲, 返回的状态需要拷贝
                         else:
                             continue
             
     def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
-        self.cid = None # get new cid
-        
-        self.rp.publish('tcpnl_control', "reset") # mininet重启iperf
-
-        self.state = self._get_obs()
-        if len(self.state) == 1: 
-            self.reset()
+        # 不递归, 有超时与重试上限; 启动前丢弃上次退出的残留信息, 见 gym_rlcc.protocol.start_flow
+        self.state, retries = start_flow(self._get_obs, self._restart_iperf, self.msg_stream.drain,
+                                         self.reset_timeout, self.reset_retries, name="tcpnl")
+        self.reset_info = {"reset_retries": retries}
         print(f"reset : {self.cid} : {self.state}")
 
         # # rllib 
-        return self.state, {}
+        return self.state, self.reset_info
+
+    def _restart_iperf(self, attempt):
+        self.cid = None # get new cid
+        self.rp.publish('tcpnl_control', "reset") # mininet重启iperf
 
     def EMA(self, new, old, rate): # rate 4, 8
         return (1/rate)*new + ((rate-1)/rate)*old
@@ -0,0 +1,266 @@
+import gym
+import numpy as np
+from gym import spaces
+from typing import Optional
+from gym_rlcc.protocol import observation
+from gym_rlcc.protocol import STATE_SCALE, OBS_FIELDS
+from gym_rlcc.trace import TraceIndex
+
+PLAN2_DIRECTIONS = np.array([-10, -3, -1, 0, 1, 3, 10])
+
+
+def recorded_actions(episode: dict, plan: int) -> np.ndarray:
+    """
+    episode : columns of a recorded episode, gym_rlcc.trace.read_chunks
+    plan : action plan of the recorded run
+    return (steps,) action published after each state, nan where the agent sent none.
+    plan 1 : pacing_rate_rate, plan 2 : Discrete(7) index, plan 3 : Discrete(3) index
+    """
+    state_seq, action_seq = episode["state_seq"], episode["action_seq"]
+    # 状态 i 之后、状态 i+1 之前的第一个动作
+    j = np.searchsorted(action_seq, state_seq, side="right")
+    next_seq = np.append(state_seq[1:], np.iinfo(np.int64).max)
+    valid = j < len(action_seq)
+    valid[valid] &= action_seq[j[valid]] < next_seq[valid]
+
+    values = episode["actions"][1 if plan == 1 else 0]
+    actions = np.full(len(state_seq), np.nan)
+    actions[valid] = values[j[valid]]
+    if plan == 2:   # 发布的是 cwnd 变化量, 换回动作序号
+        known = valid & np.isin(actions, PLAN2_DIRECTIONS)
+        actions[known] = np.searchsorted(PLAN2_DIRECTIONS, actions[known])
+        actions[valid & ~known] = np.nan
+    if plan == 3:   # 发布的是自动变速后的 cwnd 变化量, 符号即方向
+        actions[valid] = np.sign(actions[valid]) + 1
+    return actions
+
+
+def batch_rewards(reward_function, states: np.ndarray) -> np.ndarray:
+    """
+    states : (N, fields) scaled states
+    return (N,) rewards. reward_function is called once with a (fields, N) copy, so state[i]
+    is field i of the whole batch, elementwise numpy reward functions work unchanged; others
+    are called state by state. The states are never passed to reward_function themselves, a
+    reward that writes into its argument (e.g. state[-1]=1) leaves them unchanged.
+    """
+    if len(states) == 0:
+        return np.zeros(0, dtype=np.float32)
+    with np.errstate(all="ignore"):
+        try:
+            rewards = np.asarray(reward_function(states.T.copy()), dtype=np.float32)
+        except (TypeError, ValueError, IndexError):
+            rewards = None
+    if rewards is None or rewards.shape != (len(states),):
+        rewards = np.array([reward_function(state.copy()) for state in states], dtype=np.float32)
+    return rewards
+
+
+class ReplayTransitions:
+    """
+    All transitions of recorded episodes in flat arrays, for behaviour cloning, offline RL
+    and reward function comparisons without a network.
+
+    episodes : list of columns of recorded episodes (gym_rlcc.trace.read_chunks)
+    plan : action plan of the recorded run, see recorded_actions
+    reward_function : as config["reward_function"] of RlccEnvR, see batch_rewards
+
+    transition t : obs = state t, action = action published after state t,
+    reward = reward_function(state t + 1), next_obs = state t + 1, done on the last state of
+    an episode.
+    """
+
+    def __init__(self, episodes: list, plan: int = 1, reward_function=None, scale=STATE_SCALE):
+        states, next_index, actions, dones = [], [], [], []
+        offset = 0
+        for episode in episodes:
+            steps = episode["states"].shape[-1]
+            if steps < 2:
+                continue
+            states.append(np.divide(episode["states"].T, scale, dtype=np.float32))
+            next_index.append(np.arange(offset + 1, offset + steps))
+            actions.append(recorded_actions(episode, plan)[:-1])
+            done = np.zeros(steps - 1, dtype=bool)
+            done[-1] = True
+            dones.append(done)
+            offset += steps
+
+        self.states = np.concatenate(states) if states else np.zeros((0, len(scale)), dtype=np.float32)
+        self.next_index = np.concatenate(next_index) if next_index else np.zeros(0, dtype=np.int64)
+        self.index = self.next_index - 1
+        self.actions = np.concatenate(actions).astype(np.float32) if actions else np.zeros(0, dtype=np.float32)
+        self.dones = np.concatenate(dones) if dones else np.zeros(0, dtype=bool)
+        self.rewards = None
+        if reward_function is not None:
+            self.set_reward_function(reward_function)
+
+    def __len__(self):
+        return len(self.index)
+
+    def set_reward_function(self, reward_function):
+        """
+        recompute all rewards, e.g. to compare reward functions on the same data
+        """
+        self.rewards = batch_rewards(reward_function, self.states)[self.next_index]
+        return self.rewards
+
+    def batches(self, batch_size: int = 4096, shuffle: bool = True, seed: Optional[int] = None):
+        """
+        yield dicts of obs, actions, rewards, next_obs, dones with batch_size transitions,
+        one pass over all transitions
+        """
+        order = np.random.default_rng(seed).permutation(len(self)) if shuffle else None
+        for start in range(0, len(self), batch_size):
+            if order is None:
+                rows = slice(start, start + batch_size)
+            else:
+                rows = order[start:start + batch_size]
+            index, next_index = self.index[rows], self.next_index[rows]
+            yield {
+                "obs": observation(self.states[index]),
+                "actions": self.actions[rows],
+                "rewards": None if self.rewards is None else self.rewards[rows],
+                "next_obs": observation(self.states[next_index]),
+                "dones": self.dones[rows],
+            }
+
+
+class RlccReplayEnv(gym.Env):
+    """
+    ### Description
+
+    RlccEnvR (gym_rlcc/rlcc-v0-rllib) served from episodes recorded by gym_rlcc.recorder,
+    no mininet, xquic or redis needed. Observation, reward and the old step api are the same
+    as RlccEnvR.
+
+    The replay is open loop : the states are the recorded ones whatever the action, the action
+    the agent sent in the recording is in info["recorded_action"]. Use it for behaviour cloning,
+    offline RL and reward function comparisons, not for online training.
+
+    transitions() returns all transitions of the selected episodes as flat arrays,
+    ReplayTransitions.batches() iterates them batch by batch, without a step loop.
+
+    ### Arguments
+    config : dict
+        config['trace_root'] : trace directory written by gym_rlcc.recorder
+        config['rlcc_flags'] : recorded flags to replay, default all
+        config['reasons'] : episode end reasons to replay, e.g. ("done",), default all
+        config['link'] : link parameters to match, e.g. {"bandwidth": "20Mbit"}, default all
+        config['plan'] : action plan of the recorded run, see RlccEnvR, default 1
+        config['maxsteps'] : steps before an episode is cut, default 1800
+        config["reward_function"] : selfdefined reward function, as in RlccEnvR
+        config["shuffle"] : replay episodes in random order, default True
+
+    """
+
+    def __init__(self, config: dict, render_mode: Optional[str] = None):
+
+        assert config["trace_root"], "you need init trace_root by config['trace_root']"
+
+        self.index = TraceIndex(config["trace_root"])
+        self.entries = self.index.select(flags=config.get("rlcc_flags"), min_states=2,
+                                         reasons=config.get("reasons"), **config.get("link", {}))
+        assert self.entries, f"no recorded episode in {config['trace_root']} matches the config"
+
+        if config.__contains__("reward_function"):
+            self.reward_function = config["reward_function"]
+        else:
+            self.reward_function = self._reward
+
+        self.plan = config["plan"] if "plan" in config.keys() else 1
+        self.maxsteps = config["maxsteps"] if "maxsteps" in config.keys() else 1800
+        self.shuffle = config["shuffle"] if "shuffle" in config.keys() else True
+        self.scale = STATE_SCALE
+
+        high = np.full(OBS_FIELDS, np.finfo(np.float32).max, dtype=np.float32)
+        self.observation_space = spaces.Box(0, high, dtype=np.float32)
+        if self.plan == 1:
+            self.action_max = 3.0
+            self.action_min = 0.5
+            self.action_space = spaces.Box(
+                low=self.action_min, high=self.action_max, shape=(1,), dtype=np.float32
+            )
+        if self.plan == 2:
+            self.action_space = spaces.Discrete(7)
+        if self.plan == 3:
+            self.action_space = spaces.Discrete(3)
+
+        self.rng = np.random.default_rng()
+        self.episodes = {}      # path -> (scaled states, recorded actions), 读过的 episode 缓存在内存
+        self.order = []
+        self.entry = None
+        self.states = None
+        self.actions = None
+        self.step_count = 0
+        self.position = 0
+        self.state = None
+        self.last_state = None
+        self.reset_info = {}
+
+    def _reward(self, state):
+        # same as RlccEnvR._reward (line)
+        reward = state[-3] - 100*(state[2] - state[3])
+        return reward
+
+    def _load(self, entry):
+        if entry["path"] not in self.episodes:
+            episode = self.index.read(entry)
+            states = np.divide(episode["states"].T, self.scale, dtype=np.float32)
+            self.episodes[entry["path"]] = (states, recorded_actions(episode, self.plan))
+        return self.episodes[entry["path"]]
+
+    def transitions(self, reward_function=None) -> ReplayTransitions:
+        """
+        reward_function : default the env's reward function
+        return all transitions of the selected episodes
+        """
+        episodes = [self.index.read(entry) for entry in self.entries]
+        return ReplayTransitions(episodes, self.plan, reward_function or self.reward_function, self.scale)
+
+    def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        if not self.order:
+            self.order = list(self.rng.permutation(len(self.entries))) if self.shuffle \
+                else list(range(len(self.entries)))
+        self.entry = self.entries[self.order.pop(0)]
+        self.states, self.actions = self._load(self.entry)
+
+        self.step_count = 0
+        self.position = 0
+        self.state = self.states[0]
+        self.last_state = self.state
+        self.reset_info = {"reset_retries": 0, "episode": self.entry["path"]}
+        return observation(self.state)
+
+    def _info(self):
+        return {"recorded_action": self.actions[self.position], "episode": self.entry["path"]}
+
+    def _reward_of(self, state):
+        # 缓存的录制状态不能交给 reward_function 修改
+        return self.reward_function(state.copy())
+
+    def step(self, action):
+        info = self._info()
+
+        self.step_count += 1
+        if self.step_count >= self.maxsteps:
+            self.step_count = 0
+            # old api
+            return observation(self.last_state), self._reward_of(self.last_state), True, info
+
+        self.position += 1
+        if self.position >= len(self.states):   # 录制的流结束
+            return observation(self.last_state), self._reward_of(self.last_state), True, info
+
+        self.state = self.states[self.position]
+        self.last_state = self.state
+        return observation(self.state), self._reward_of(self.state), False, info
+
+    def render(self):
+        return
+
+    def close(self):
+        return
+
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
@@ -0,0 +1,286 @@
+import gym
+import time
+import numpy as np
+from collections import deque
+from redis.client import Redis
+from gym import spaces
+from gym.vector import VectorEnv
+from typing import Optional, Union
+from gym_rlcc.protocol import StateDecoder, MessageStream, RlccResetError, parse_info, observation
+from gym_rlcc.protocol import STATE_SCALE, OBS_FIELDS, MSG_STATE, MSG_DONE, RESET_TIMEOUT, RESET_RETRIES
+
+
+class RlccVecEnv(VectorEnv):
+    """
+    ### Description
+
+    Vectorized RlccEnv : one env drives N flows (rlcc_flag), e.g. all the mininet clients 1001..1010,
+    so one sampler process can run batched policy inference for all of them.
+
+    All flows share one pubsub connection subscribed to every `rlccstate_<flag>` channel and `mininet`,
+    states are demultiplexed by channel into a `(N, 9)` observation batch, the N actions of a step are
+    published in one pipelined round trip.
+
+    Action space, observation and reward of one flow are the same as RlccEnv (gym_rlcc/rlcc-v0).
+    gym >= 0.26 vector api :
+        reset() -> obs, infos
+        step(actions) -> obs, rewards, terminated, truncated, infos
+
+    ### Auto reset
+
+    A flow that is done (mininet done message, terminated) or runs maxsteps steps (truncated) is
+    restarted inside step(), its obs in the batch is the first state of the new flow. As in
+    gym.vector.SyncVectorEnv the last obs of the old flow is in infos["final_observation"],
+    infos["reset_retries"] is filled for every restarted flow.
+
+    A flow that sends no state within step_timeout seconds is stuck : it is truncated and restarted
+    with "<flag>stop" like a flow that ran maxsteps steps, its obs is its last state.
+
+    ### Arguments
+    config : dict
+        config['rlcc_flags'] : list of rlcc_flag, one sub env per flag
+        config['plan'] : action plan, see RlccEnv, default 1
+        config['maxsteps'] : steps before a flow is truncated, default 1800
+        config["reward_function"] : selfdefined reward function :
+            input : state : obs
+            return : reward value
+        config["reset_timeout"] : seconds a reset waits for the first state of a new flow, default 30
+        config["reset_retries"] : reset attempts before raising RlccResetError, default 5
+        config["step_timeout"] : seconds a step waits for the next state of a flow, default reset_timeout
+
+    """
+
+    def __init__(self, config: dict, redis_host: str="0.0.0.0", redis_port: int=6379):
+
+        assert config["rlcc_flags"], "you need init rlcc_flags by config['rlcc_flags']"
+
+        self.rlcc_flags = [str(flag) for flag in config["rlcc_flags"]]
+        num_envs = len(self.rlcc_flags)
+
+        if "reward_function" in config.keys():
+            self.reward_function = config["reward_function"]
+        else:
+            self.reward_function = self._reward
+
+        if "plan" in config.keys():
+            self.plan = config["plan"]
+        else:
+            self.plan = 1
+
+        if "maxsteps" in config.keys():
+            self.maxsteps = config["maxsteps"]
+        else:
+            self.maxsteps = 1800
+
+        if "reset_timeout" in config.keys():
+            self.reset_timeout = config["reset_timeout"]
+        else:
+            self.reset_timeout = RESET_TIMEOUT
+        if "reset_retries" in config.keys():
+            self.reset_retries = config["reset_retries"]
+        else:
+            self.reset_retries = RESET_RETRIES
+        if "step_timeout" in config.keys():
+            self.step_timeout = config["step_timeout"]
+        else:
+            self.step_timeout = self.reset_timeout
+
+        # 一个连接发布所有动作, 一个 pubsub 订阅所有流
+        self.rp = Redis(host=redis_host, port=redis_port)
+        self.pub = self.rp.pubsub()
+        self.pub.subscribe([f"rlccstate_{flag}" for flag in self.rlcc_flags] + ['mininet'])
+        self.msg_stream = MessageStream(self.pub)
+
+        self._channel_index = {f"rlccstate_{flag}".encode(): i for i, flag in enumerate(self.rlcc_flags)}
+        self._flag_index = {flag: i for i, flag in enumerate(self.rlcc_flags)}
+        self.decoder = StateDecoder(STATE_SCALE)
+
+        # 每个流先到的消息 (state 或 None 表示 done), 按到达顺序留给之后的 step
+        self.pending = [deque() for _ in range(num_envs)]
+        self.states = np.zeros((num_envs, len(STATE_SCALE)), dtype=np.float32)
+        self.step_counts = np.zeros(num_envs, dtype=np.int64)
+        self._truncated = np.zeros(num_envs, dtype=bool)
+
+        high = np.full(OBS_FIELDS, np.finfo(np.float32).max, dtype=np.float32)
+        single_observation_space = spaces.Box(0, high, dtype=np.float32)
+
+        if self.plan == 1:
+            self.action_max = 3.0
+            self.action_min = 0.5
+            single_action_space = spaces.Box(
+                low=self.action_min, high=self.action_max, shape=(1,), dtype=np.float32
+            )
+        if self.plan == 2:
+            single_action_space = spaces.Discrete(7)
+            self._action_to_direction = {0: -10, 1: -3, 2: -1, 3: 0, 4: 1, 5: 3, 6: 10}
+        if self.plan == 3:
+            single_action_space = spaces.Discrete(3)
+            self._action_to_direction = {0: 1, 1: 0, 2: -1}
+
+        super().__init__(num_envs, single_observation_space, single_action_space)
+
+    def _reward(self, state):
+        # same as RlccEnv : throughput - (rtt - min_rtt)
+        return state[-2] - state[2] + state[3]
+
+    def _collect(self, need: set, timeout: Optional[float] = None) -> dict:
+        """
+        need : indexes of flows waiting for their next message
+        timeout : seconds, None to block
+        return {index: state or None (done)}, flows missing on timeout are not in it
+        """
+        got = {}
+        for i in need:
+            if self.pending[i]:
+                got[i] = self.pending[i].popleft()
+        if len(got) == len(need):
+            return got
+
+        for msg in self.msg_stream.messages(timeout):
+            if msg["type"] != "message":
+                continue
+            kind, state = self.decoder.decode(msg["data"])
+            if kind == MSG_STATE:
+                i = self._channel_index.get(msg["channel"])
+                if i is None:
+                    continue
+                state = state.copy()    # decoder 复用输出缓冲
+            elif kind == MSG_DONE:
+                i = self._flag_index.get(parse_info(self.decoder.fields)["rlcc_flag"])
+                if i is None:
+                    continue
+                state = None
+            else:
+                continue
+
+            if i in need and i not in got:
+                got[i] = state
+                if len(got) == len(need):
+                    break
+            else:
+                self.pending[i].append(state)   # 已经拿到本步状态的流, 留给下一步
+        return got
+
+    def _start_flows(self, indexes: list, started: bool = False) -> dict:
+        """
+        indexes : flows to (re)start
+        started : the start message is already sent (e.g. "<flag>stop" restarts the flow)
+        return {index: retries}, the first state of each flow is in self.states
+        """
+        missing = set(indexes)
+        retries = {}
+        for attempt in range(self.reset_retries):
+            pipe = self.rp.pipeline(transaction=False)
+            for i in missing:
+                self.pending[i].clear()     # 上一个流残留的消息
+                if attempt > 0:
+                    pipe.publish('redis', f"{self.rlcc_flags[i]}stop")   # mininet 关闭卡住的流并重启
+                elif not started:
+                    pipe.publish('redis', self.rlcc_flags[i])
+            pipe.execute()
+
+            # 只有超时仍没有状态的流才发 <flag>stop, 见 gym_rlcc.protocol.start_flow
+            deadline = time.monotonic() + self.reset_timeout
+            while missing:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    break
+                for i, state in self._collect(missing, timeout=wait).items():
+                    if state is None:
+                        # 上一个流的结束消息 (如 maxsteps 后 <flag>stop 关闭的 client), 继续等待
+                        continue
+                    self.states[i] = state
+                    self.step_counts[i] = 0
+                    retries[i] = attempt
+                    missing.discard(i)
+            if not missing:
+                return retries
+            print(f"reset : {[self.rlcc_flags[i] for i in missing]} : no state from new flow, "
+                  f"retry {attempt + 1}/{self.reset_retries}")
+        raise RlccResetError(f"rlcc_flags {[self.rlcc_flags[i] for i in missing]}: no state after "
+                             f"{self.reset_retries} resets, {self.reset_timeout}s each")
+
+    def reset_async(self, seed: Optional[Union[int, list]] = None, options: Optional[dict] = None):
+        # 丢弃所有流上次退出的残留信息, 跑过的流先关闭 (mininet 收到 stop 会重启流)
+        self.msg_stream.drain()
+        pipe = self.rp.pipeline(transaction=False)
+        for i, flag in enumerate(self.rlcc_flags):
+            self.pending[i].clear()
+            if self.step_counts[i] > 50:    # 连续重启不算
+                pipe.publish('redis', f"{flag}stop")
+            else:
+                pipe.publish('redis', flag)
+        pipe.execute()
+
+    def reset_wait(self, seed: Optional[Union[int, list]] = None, options: Optional[dict] = None):
+        retries = self._start_flows(range(self.num_envs), started=True)
+        print(f"reset : {self.rlcc_flags} : retries {retries}")
+
+        infos = {}
+        for i, r in retries.items():
+            infos = self._add_info(infos, {"reset_retries": r}, i)
+        return observation(self.states).copy(), infos
+
+    def step_async(self, actions):
+        # N 个动作一次 pipeline 发布
+        self.step_counts += 1
+        self._truncated = self.step_counts >= self.maxsteps
+
+        pipe = self.rp.pipeline(transaction=False)
+        for i, flag in enumerate(self.rlcc_flags):
+            if self._truncated[i]:
+                # 超时检测，太长时间没有结束，则主动结束此流 (mininet 会重启)
+                pipe.publish('redis', f"{flag}stop")
+                continue
+            action = actions[i]
+            if self.plan >= 2:  # 离散cwnd动作
+                pipe.publish(f'rlccaction_{flag}', f"{self._action_to_direction[int(np.asarray(action).item())]}")
+            else:
+                action = np.clip(np.asarray(action, dtype=np.float32).reshape(-1), self.action_min, self.action_max)
+                pipe.publish(f'rlccaction_{flag}', f"0,{action[0]}")   # cwnd_rate, pacing_rate_rate
+        pipe.execute()
+
+    def step_wait(self):
+        running = set(np.flatnonzero(~self._truncated).tolist())
+        got = self._collect(running, timeout=self.step_timeout)
+
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = self._truncated.copy()
+        stuck = sorted(running - got.keys())
+        if stuck:
+            # 超时没有状态的流, 主动结束 (mininet 会重启), 返回上一个状态
+            print(f"step : {[self.rlcc_flags[i] for i in stuck]} : no state in {self.step_timeout}s, stop")
+            pipe = self.rp.pipeline(transaction=False)
+            for i in stuck:
+                pipe.publish('redis', f"{self.rlcc_flags[i]}stop")
+            pipe.execute()
+            truncated[stuck] = True
+        for i in range(self.num_envs):
+            if i in got:
+                if got[i] is None:
+                    terminated[i] = True    # 流结束, 返回上一个状态
+                else:
+                    self.states[i] = got[i]
+            rewards[i] = self.reward_function(self.states[i])
+
+        obs = observation(self.states).copy()
+        infos = {}
+        done = np.flatnonzero(terminated | truncated).tolist()
+        if done:
+            # auto reset : 结束的流重启, 返回新流的第一个状态
+            final_obs = obs[done].copy()
+            terminated_done = [i for i in done if terminated[i]]
+            truncated_done = [i for i in done if truncated[i]]
+            retries = self._start_flows(terminated_done)
+            retries.update(self._start_flows(truncated_done, started=True))
+            for j, i in enumerate(done):
+                obs[i] = observation(self.states[i])
+                infos = self._add_info(infos, {"final_observation": final_obs[j], "reset_retries": retries[i]}, i)
+        self._truncated[:] = False
+
+        return obs, rewards, terminated, truncated, infos
+
+    def close_extras(self, **kwargs):
+        self.pub.close()
+        self.rp.close()
@@ -0,0 +1,90 @@
+"""
+Binary state frames published by rlcc.c (RLCC_BINARY_STATE = 1)
+
+The text frame is the 12 sample fields joined by ';' :
+    cwnd;pacing_rate;rtt;min_rtt;srtt;inflight;lost_interval;lost_pkts;
+    is_app_limited;delivery_rate;throughput;sended_interval
+
+The binary frame carries the same 12 fields, packed behind a small versioned
+header, so a consumer decodes it with one np.frombuffer instead of
+decode + split + float parsing on every step.
+
+| offset | size   | field                          |
+|--------|--------|--------------------------------|
+| 0      | 4      | magic b"RLST"                  |
+| 4      | 1      | version (FRAME_VERSION)        |
+| 5      | 1      | number of fields (n)           |
+| 6      | 2      | reserved, 0                    |
+| 8      | 8 * n  | fields, little-endian int64    |
+
+Text frames stay supported everywhere, binary frames are optional.
+"""
+import struct
+import numpy as np
+
+
+FRAME_MAGIC = b"RLST"
+FRAME_VERSION = 1
+STATE_FIELDS = 12
+
+FRAME_HEADER = struct.Struct("<4sBBH")
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+FIELD_DTYPE = np.dtype("<i8")
+
+
+def is_state_frame(data: bytes) -> bool:
+    """
+    data : raw redis message data
+    return True if data is a binary state frame
+    """
+    return data[:4] == FRAME_MAGIC
+
+
+def encode_state_frame(fields) -> bytes:
+    """
+    fields : sequence of ints, rlcc.c sample fields
+    return binary state frame, same bytes as push_state_frame in rlcc.c
+    """
+    fields = np.asarray(fields, dtype=FIELD_DTYPE)
+    return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(fields), 0) + fields.tobytes()
+
+
+def decode_state_frame(data: bytes) -> np.ndarray:
+    """
+    data : binary state frame
+    return read-only int64 view of the raw fields (no copy)
+    """
+    magic, version, n_fields, _ = FRAME_HEADER.unpack_from(data)
+    if magic != FRAME_MAGIC:
+        raise ValueError(f"not a state frame: {bytes(data[:8])!r}")
+    if version != FRAME_VERSION:
+        raise ValueError(f"unsupported state frame version {version}, expect {FRAME_VERSION}")
+    if len(data) != FRAME_HEADER_SIZE + n_fields * FIELD_DTYPE.itemsize:
+        raise ValueError(f"truncated state frame, {len(data)} bytes for {n_fields} fields")
+    return np.frombuffer(data, dtype=FIELD_DTYPE, count=n_fields, offset=FRAME_HEADER_SIZE)
+
+
+class StateFrameDecoder:
+    """
+    Decode and scale state frames into one preallocated float32 buffer.
+
+    scale : per field divisor, its length is the expected number of fields
+
+    decode() returns the decoder's own buffer, it is overwritten by the next
+    call. Copy it if the state has to be kept.
+    """
+
+    def __init__(self, scale):
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.n_fields = len(self.scale)
+        self.buffer = np.empty(self.n_fields, dtype=np.float32)
+        # expected header and size, checked with one bytes compare per frame
+        self._header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, self.n_fields, 0)
+        self._size = FRAME_HEADER_SIZE + self.n_fields * FIELD_DTYPE.itemsize
+
+    def decode(self, data: bytes) -> np.ndarray:
+        if len(data) != self._size or data[:FRAME_HEADER_SIZE] != self._header:
+            fields = decode_state_frame(data)  # raise on a bad frame
+            raise ValueError(f"state frame has {len(fields)} fields, expect {self.n_fields}")
+        fields = np.frombuffer(data, FIELD_DTYPE, self.n_fields, FRAME_HEADER_SIZE)
+        return np.divide(fields, self.scale, out=self.buffer, dtype=np.float32)
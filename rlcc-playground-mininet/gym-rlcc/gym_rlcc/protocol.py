@@ -0,0 +1,226 @@
+"""
+rlcc redis message protocol, shared by all gym_rlcc envs and the deploy workers
+
+rlcc.c / mininet only send values, no keys, a message is told apart by the
+length of its ';' split list (or by the magic of a binary state frame):
+
+| len  | kind       | channel          | example                                        |
+|------|------------|------------------|------------------------------------------------|
+| 1    | MSG_INIT   | rlccstate_<flag> | state:init                                     |
+| 3    | MSG_DONE   | mininet          | rlcc_flag:1001;state:done;time:12.3            |
+| 4    | MSG_LINK   | mininet          | rlcc_flag:1001;bandwidth:10;rtt:20;loss:0      |
+| > 5  | MSG_STATE  | rlccstate_<flag> | cwnd;pacing_rate;rtt;...;sended_interval       |
+| else | MSG_OTHER  |                  | skipped                                        |
+
+"> 5" is STATE_MIN_FIELDS, an env with a state of another length (the 7 field
+tcp netlink state of rlcc_world_qlearning_TCP) passes its own min_fields.
+
+A state is scaled by STATE_SCALE, the first OBS_FIELDS fields are the
+observation, the last REWARD_FIELDS fields are only used by reward functions.
+
+MessageStream replaces pubsub.listen() in the envs, it can wait with a
+timeout and drop messages left over from the previous flow.
+"""
+import time
+import numpy as np
+from gym_rlcc.frame import StateFrameDecoder, is_state_frame
+
+
+MSG_INIT = "init"
+MSG_DONE = "done"
+MSG_LINK = "link"
+MSG_STATE = "state"
+MSG_OTHER = "other"
+
+# cwnd;pacing_rate;rtt;min_rtt;srtt;inflight;lost_interval;lost_pkts;is_app_limited;delivery_rate;throughput;sended_interval
+STATE_SCALE = np.array([1, 1, 512, 512, 512, 16384, 1, 1, 1, 1024, 1024, 1], dtype=np.float32)
+REWARD_FIELDS = 3   # delivery_rate, throughput, sended_interval
+OBS_FIELDS = len(STATE_SCALE) - REWARD_FIELDS
+
+_KIND_BY_LENGTH = {1: MSG_INIT, 3: MSG_DONE, 4: MSG_LINK}
+STATE_MIN_FIELDS = 6    # 字段数不少于此的文本消息为状态
+
+# env reset, config["reset_timeout"] / config["reset_retries"]
+RESET_TIMEOUT = 30.0    # 秒, 等待新流第一个状态的时间
+RESET_RETRIES = 5       # 连续失败次数上限
+
+
+class RlccResetError(TimeoutError):
+    """
+    env reset got no state from a new flow after reset_retries attempts
+    """
+
+
+def kind_of_length(length: int, min_fields: int = STATE_MIN_FIELDS) -> str:
+    """
+    length : length of the ';' split list of a text message
+    min_fields : fewest fields of a state, shorter messages that are not init / done / link are MSG_OTHER
+    return message kind
+    """
+    if length >= min_fields:
+        return MSG_STATE
+    return _KIND_BY_LENGTH.get(length, MSG_OTHER)
+
+
+def classify(data: bytes):
+    """
+    data : raw redis message data
+    return (kind, fields), fields is the ';' split list of a text message, None for a binary frame
+    """
+    if is_state_frame(data):
+        return MSG_STATE, None
+    fields = data.decode("utf-8").split(';')
+    return kind_of_length(len(fields)), fields
+
+
+def parse_info(fields) -> dict:
+    """
+    fields : split list of a MSG_DONE / MSG_LINK message
+    return {key: value} of the "key:value" items, values are str
+    """
+    return dict(d.split(':', 1) for d in fields)
+
+
+def observation(state: np.ndarray) -> np.ndarray:
+    """
+    state : scaled state, or a (N, fields) batch of states
+    return the fields fed to the agent (view)
+    """
+    return state[..., :-REWARD_FIELDS]
+
+
+def reward_fields(state: np.ndarray) -> np.ndarray:
+    """
+    state : scaled state, or a (N, fields) batch of states
+    return delivery_rate, throughput, sended_interval (view)
+    """
+    return state[..., -REWARD_FIELDS:]
+
+
+class StateDecoder:
+    """
+    Classify a redis message and decode a state, text or binary frame, into
+    one preallocated float32 buffer.
+
+    scale : per field divisor
+    parse_dtype : dtype used to parse text fields before scaling
+    min_fields : fewest fields of a text state, see kind_of_length
+
+    decode() returns (kind, state). state is the decoder's own buffer for
+    MSG_STATE and None otherwise, it is overwritten by the next call, copy it
+    if the state has to be kept.
+    """
+
+    def __init__(self, scale=STATE_SCALE, parse_dtype=np.float32, min_fields=STATE_MIN_FIELDS):
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.parse_dtype = parse_dtype
+        self.min_fields = min_fields
+        self.buffer = np.empty(len(self.scale), dtype=np.float32)
+        self.frame_decoder = StateFrameDecoder(self.scale)   # rlcc.c RLCC_BINARY_STATE 二进制状态帧
+        self.frame_decoder.buffer = self.buffer     # 文本帧与二进制帧共用一个输出缓冲
+        self.fields = None  # split list of the last text message
+
+    def decode(self, data: bytes):
+        if is_state_frame(data):
+            self.fields = None
+            return MSG_STATE, self.frame_decoder.decode(data)
+        self.fields = data.decode("utf-8").split(';')
+        kind = kind_of_length(len(self.fields), self.min_fields)
+        if kind != MSG_STATE:
+            return kind, None
+        np.divide(np.array(self.fields, dtype=self.parse_dtype), self.scale, out=self.buffer, dtype=np.float32)
+        return MSG_STATE, self.buffer
+
+
+class MessageStream:
+    """
+    pubsub.listen() with an optional timeout.
+
+    pubsub : redis PubSub, already subscribed
+
+    iterating the stream blocks like pubsub.listen(), messages(timeout) stops
+    once timeout seconds are passed.
+    """
+
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    def __iter__(self):
+        return self.messages()
+
+    def messages(self, timeout: float = None):
+        """
+        timeout : seconds, None to block forever
+        yield messages until the timeout is passed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if deadline is None:
+                wait = None
+            else:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    return
+            msg = self.pubsub.get_message(timeout=wait)
+            if msg is not None:     # None: 超时或 health check
+                yield msg
+
+    def drain(self) -> int:
+        """
+        drop all messages already received, e.g. states and done of the last flow
+        return number of dropped messages
+        """
+        dropped = 0
+        while self.pubsub.get_message(timeout=0) is not None:
+            dropped += 1
+        return dropped
+
+
+def flow_starter(rp, rlcc_flag):
+    """
+    rp : redis connection to publish with
+    return restart(attempt) for start_flow : the first attempt asks mininet for a new flow
+    (publish rlcc_flag on 'redis'), the later ones to kill the stuck client and restart (<flag>stop)
+    """
+    def restart(attempt: int):
+        if attempt == 0:
+            rp.publish('redis', rlcc_flag)    # 重启新流
+        else:
+            rp.publish('redis', f"{rlcc_flag}stop")   # 超时没有任何状态, mininet 关闭卡住的流并重启
+    return restart
+
+
+def start_flow(get_obs, restart, drain=None, reset_timeout: float = RESET_TIMEOUT,
+               reset_retries: int = RESET_RETRIES, name: str = ""):
+    """
+    Start a new flow and wait for its first state, shared by the envs' reset()
+
+    get_obs : get_obs(timeout) -> a state, the 1-element done sentinel of the env's own flow,
+              or None once timeout seconds are passed
+    restart : restart(attempt), publishes the start of the flow, see flow_starter
+    drain : drops messages left over from the previous flow, called before each attempt
+    name : flow name for messages, e.g. "rlcc_flag 1001"
+    return (first state, number of retries)
+
+    A done received while waiting belongs to the previous flow, e.g. the client killed by the
+    <flag>stop published after maxsteps reports its done after the new flow started. It is
+    skipped and the attempt keeps waiting until its deadline. Only an attempt that times out
+    without a state restarts the flow, after reset_retries of them RlccResetError is raised.
+    """
+    for retries in range(reset_retries):
+        if drain is not None:
+            drain()
+        restart(retries)
+        deadline = time.monotonic() + reset_timeout
+        while True:
+            wait = deadline - time.monotonic()
+            if wait <= 0:
+                break
+            state = get_obs(timeout=wait)
+            if state is None:   # 超时
+                break
+            if len(state) > 1:
+                return state, retries
+            # 上一个流的结束消息, 继续等待新流的状态
+        print(f"reset : {name} : no state from new flow, retry {retries + 1}/{reset_retries}")
+    raise RlccResetError(f"{name}: no state after {reset_retries} resets, {reset_timeout}s each")
@@ -0,0 +1,139 @@
+"""
+Record the rlcc redis streams of a training run, for offline analysis and RlccReplayEnv
+
+One connection pattern subscribes to rlccstate_*, rlccaction_* and mininet, the
+messages are written per flag and per episode by gym_rlcc.trace.TraceWriter:
+
+| message                        | effect                                          |
+|--------------------------------|-------------------------------------------------|
+| mininet link info (MSG_LINK)   | new episode of the flag, link parameters kept   |
+| rlccstate_<flag> state:init    | new episode, unless the open one has no message |
+| rlccstate_<flag> state         | state of the open episode (opened if needed)    |
+| rlccaction_<flag> action       | action of the open episode                      |
+| mininet done (MSG_DONE)        | episode closed, reason "done", unless the open one has no message |
+| mininet other rlcc_flag:...    | episode closed, reason its state, e.g. stop_by_mininet |
+
+python -m gym_rlcc.recorder -o traces
+"""
+import argparse
+import signal
+import struct
+import time
+from redis.client import Redis
+
+from gym_rlcc.frame import decode_state_frame
+from gym_rlcc.protocol import MSG_INIT, MSG_LINK, MSG_DONE, MSG_STATE, classify, parse_info
+from gym_rlcc.trace import TraceWriter, CHUNK_ROWS, FLUSH_INTERVAL
+
+LINK_KEYS = ("bandwidth", "rtt", "loss")
+
+
+class Recorder:
+    """
+    root : trace directory
+    chunk_rows, flush_interval : a chunk is written every chunk_rows messages or flush_interval seconds
+    """
+
+    def __init__(self, root, redis_ip='0.0.0.0', redis_port=6379,
+                 chunk_rows=CHUNK_ROWS, flush_interval=FLUSH_INTERVAL):
+        self.redis_ip = redis_ip
+        self.redis_port = redis_port
+        self.writer = TraceWriter(root, chunk_rows=chunk_rows, flush_interval=flush_interval)
+        self.dropped = 0    # 没有打开的 episode 时收到的动作, 无法解析的消息
+        self.running = False
+
+    def handle(self, channel: str, data: bytes, now: float):
+        """
+        channel : redis channel of the message
+        data : raw message data
+        now : receive time
+        a message that cannot be parsed is counted in dropped, recording goes on
+        """
+        try:
+            self._handle(channel, data, now)
+        except (ValueError, KeyError, struct.error) as e:
+            self.dropped += 1
+            print(f"Recorder : skip message on {channel} : {e!r}")
+
+    def _handle(self, channel: str, data: bytes, now: float):
+        if channel.startswith("rlccaction_"):
+            flag = channel[len("rlccaction_"):]
+            episode = self.writer.get(flag)
+            if episode is None:
+                self.dropped += 1
+                return
+            try:
+                values = [float(v) for v in data.decode("utf-8").split(',')]
+            except ValueError:
+                self.dropped += 1
+                return
+            episode.add_action(now, values)
+            return
+
+        kind, fields = classify(data)
+
+        if channel == "mininet":
+            if kind == MSG_LINK:
+                info = parse_info(fields)
+                self.writer.open(info["rlcc_flag"], now, {k: info[k] for k in LINK_KEYS if k in info})
+            elif kind == MSG_DONE:
+                info = parse_info(fields)
+                episode = self.writer.get(info["rlcc_flag"])
+                # <flag>stop 重启时被杀掉的 client 的 done 可能晚于新流的 link info, 保留新的空 episode
+                if episode is not None and episode.seq == 0:
+                    return
+                self.writer.close(info["rlcc_flag"], now, "done", {"time": info.get("time")})
+            else:
+                info = parse_info(fields)
+                if "rlcc_flag" in info:     # rlcc_flag:1001;state:stop_by_mininet
+                    self.writer.close(info["rlcc_flag"], now, info.get("state", "stop"))
+            return
+
+        if channel.startswith("rlccstate_"):
+            flag = channel[len("rlccstate_"):]
+            episode = self.writer.get(flag)
+            if kind == MSG_INIT:
+                if episode is None or episode.seq > 0:
+                    self.writer.open(flag, now)
+            elif kind == MSG_STATE:
+                if episode is None:
+                    episode = self.writer.open(flag, now)
+                # 二进制状态帧字段顺序与文本帧相同
+                episode.add_state(now, decode_state_frame(data) if fields is None else fields)
+
+    def run(self):
+        r = Redis(host=self.redis_ip, port=self.redis_port)
+        pub = r.pubsub()
+        pub.psubscribe("rlccstate_*", "rlccaction_*", "mininet")
+        self.running = True
+        try:
+            while self.running:
+                msg = pub.get_message(timeout=self.writer.flush_interval)
+                now = time.time()
+                if msg is not None and msg["type"] == "pmessage":
+                    self.handle(str(msg["channel"], encoding="utf-8"), msg["data"], now)
+                self.writer.flush_due(now)
+        finally:
+            self.writer.close_all(time.time())
+            pub.close()
+
+    def stop(self, *args):
+        self.running = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', dest='root', default='traces', help='trace directory')
+    parser.add_argument('-r', dest='redis_host', default='0.0.0.0', help='redis host')
+    parser.add_argument('-p', dest='redis_port', type=int, default=6379, help='redis port')
+    parser.add_argument('-c', dest='chunk_rows', type=int, default=CHUNK_ROWS, help='messages per chunk')
+    parser.add_argument('-i', dest='flush_interval', type=float, default=FLUSH_INTERVAL,
+                        help='seconds a message is buffered at most')
+    args = parser.parse_args()
+
+    recorder = Recorder(args.root, args.redis_host, args.redis_port, args.chunk_rows, args.flush_interval)
+    signal.signal(signal.SIGTERM, recorder.stop)
+    try:
+        recorder.run()
+    except KeyboardInterrupt:
+        pass
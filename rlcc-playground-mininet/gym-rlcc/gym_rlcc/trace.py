@@ -0,0 +1,291 @@
+"""
+Recorded rlcc traces, written by gym_rlcc/recorder.py, read by RlccReplayEnv
+
+    <root>/index.jsonl                  one line per closed episode (TraceWriter.close)
+    <root>/<flag>/<episode>/meta.json   flag, episode, start time, link parameters
+    <root>/<flag>/<episode>/00000.npz   chunks, np.savez_compressed, never rewritten
+
+An episode is one flow of one rlcc_flag, from the mininet link info (or
+state:init) to its done message. Messages are buffered in memory and written
+as one chunk every CHUNK_ROWS messages or FLUSH_INTERVAL seconds, so every
+message is written once, plus meta.json and one index line per episode.
+
+A chunk is column-wise:
+
+| array       | shape                | content                                        |
+|-------------|----------------------|------------------------------------------------|
+| state_time  | (n,) float64         | unix time the state was received               |
+| state_seq   | (n,) int64           | message number in the episode                  |
+| states      | (fields, n) float64  | raw (unscaled) state fields, one row per field |
+| action_time | (m,) float64         | unix time the action was received              |
+| action_seq  | (m,) int64           | message number in the episode                  |
+| actions     | (ACTION_FIELDS, m)   | action values as published, nan padded         |
+
+state_seq / action_seq keep the order of states and actions, the action
+answering a state has the next sequence number.
+"""
+import glob
+import json
+import os
+import numpy as np
+
+
+INDEX_FILE = "index.jsonl"
+META_FILE = "meta.json"
+CHUNK_ROWS = 4096       # messages per chunk
+FLUSH_INTERVAL = 10.0   # 秒, 最长缓存时间
+ACTION_FIELDS = 2       # "cwnd_rate,pacing_rate_rate" 或 "cwnd_value"
+
+STATE_COLUMNS = ("state_time", "state_seq", "states")
+ACTION_COLUMNS = ("action_time", "action_seq", "actions")
+
+
+def episode_dir(root, flag, episode):
+    return os.path.join(root, str(flag), f"{episode:06d}")
+
+
+def write_atomic(path, write):
+    # 写临时文件再改名, 中断的写入不会留下不完整的文件
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def write_json(path, value):
+    write_atomic(path, lambda f: f.write(json.dumps(value).encode("utf-8")))
+
+
+class EpisodeWriter:
+    """
+    Messages of one episode, buffered and written as chunks
+
+    path : episode directory, created with the first chunk
+    meta : written to meta.json with the first chunk
+    """
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.fields = None      # state fields, fixed by the first state
+        self.seq = 0
+        self.chunks = 0
+        self.states = 0
+        self.actions = 0
+        self.skipped = 0        # states with another number of fields
+        self.last_time = meta["start"]
+        self._clear()
+
+    def _clear(self):
+        self.buffer = {name: [] for name in STATE_COLUMNS + ACTION_COLUMNS}
+        self.buffered = 0
+        self.buffered_since = None
+
+    def add_state(self, t, fields):
+        """
+        fields : raw state fields, split list of a text frame or int64 view of a binary frame
+        """
+        fields = np.asarray(fields, dtype=np.float64)
+        if self.fields is None:
+            self.fields = len(fields)
+        elif len(fields) != self.fields:
+            self.skipped += 1
+            return
+        self._add(t, "state", fields)
+        self.states += 1
+
+    def add_action(self, t, values):
+        """
+        values : action values as published, at most ACTION_FIELDS
+        """
+        action = np.full(ACTION_FIELDS, np.nan)
+        action[:len(values)] = values[:ACTION_FIELDS]
+        self._add(t, "action", action)
+        self.actions += 1
+
+    def _add(self, t, kind, row):
+        self.buffer[f"{kind}_time"].append(t)
+        self.buffer[f"{kind}_seq"].append(self.seq)
+        self.buffer[f"{kind}s"].append(row)
+        self.seq += 1
+        self.last_time = t
+        if self.buffered_since is None:
+            self.buffered_since = t
+        self.buffered += 1
+
+    def due(self, now, chunk_rows=CHUNK_ROWS, flush_interval=FLUSH_INTERVAL):
+        return self.buffered >= chunk_rows or \
+            self.buffered_since is not None and now - self.buffered_since >= flush_interval
+
+    def flush(self):
+        if self.buffered == 0:
+            return
+        if self.chunks == 0:
+            os.makedirs(self.path, exist_ok=True)
+            write_json(os.path.join(self.path, META_FILE), self.meta)
+        arrays = {}
+        for kind, width in (("state", self.fields or 0), ("action", ACTION_FIELDS)):
+            rows = self.buffer[f"{kind}s"]
+            arrays[f"{kind}_time"] = np.array(self.buffer[f"{kind}_time"], dtype=np.float64)
+            arrays[f"{kind}_seq"] = np.array(self.buffer[f"{kind}_seq"], dtype=np.int64)
+            arrays[f"{kind}s"] = np.ascontiguousarray(np.array(rows, dtype=np.float64).reshape(len(rows), width).T)
+        write_atomic(os.path.join(self.path, f"{self.chunks:05d}.npz"),
+                     lambda f: np.savez_compressed(f, **arrays))
+        self.chunks += 1
+        self._clear()
+
+    def entry(self, end, reason, info=None):
+        """
+        return the index line of the episode
+        """
+        return dict(self.meta, end=end, reason=reason, info=info or {},
+                    states=self.states, actions=self.actions, fields=self.fields,
+                    skipped=self.skipped, chunks=self.chunks)
+
+
+class TraceWriter:
+    """
+    Open episodes of all flags of one trace directory, one at a time per flag
+
+    root : trace directory, episodes of an earlier run are kept, numbering continues
+    """
+
+    def __init__(self, root, chunk_rows=CHUNK_ROWS, flush_interval=FLUSH_INTERVAL):
+        self.root = root
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.episodes = {}      # flag -> open EpisodeWriter
+        self.numbers = {}       # flag -> next episode number
+        os.makedirs(root, exist_ok=True)
+        recover(root)
+
+    def next_number(self, flag):
+        if flag not in self.numbers:
+            existing = [int(os.path.basename(p)) for p in glob.glob(os.path.join(self.root, flag, "[0-9]*"))
+                        if os.path.basename(p).isdigit()]
+            self.numbers[flag] = max(existing, default=-1) + 1
+        number = self.numbers[flag]
+        self.numbers[flag] += 1
+        return number
+
+    def open(self, flag, t, link=None) -> EpisodeWriter:
+        """
+        flag : rlcc_flag, str
+        link : link parameters of the mininet link info, e.g. {"bandwidth": "20Mbit", "rtt": "10ms", "loss": "0%"}
+        close the open episode of flag and start a new one
+        """
+        self.close(flag, t, "restart")
+        number = self.next_number(flag)
+        meta = {"flag": flag, "episode": number, "path": os.path.join(flag, f"{number:06d}"),
+                "start": t, "link": link or {}}
+        episode = self.episodes[flag] = EpisodeWriter(episode_dir(self.root, flag, number), meta)
+        return episode
+
+    def get(self, flag) -> EpisodeWriter:
+        return self.episodes.get(flag)
+
+    def close(self, flag, t, reason, info=None):
+        """
+        reason : done, restart, stop, ...
+        write the rest of the episode and its index line, empty episodes leave nothing
+        """
+        episode = self.episodes.pop(flag, None)
+        if episode is None:
+            return None
+        episode.flush()
+        if episode.chunks == 0:
+            return None
+        entry = episode.entry(t, reason, info)
+        with open(os.path.join(self.root, INDEX_FILE), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def flush_due(self, now):
+        for episode in self.episodes.values():
+            if episode.due(now, self.chunk_rows, self.flush_interval):
+                episode.flush()
+
+    def close_all(self, t, reason="stop"):
+        for flag in list(self.episodes):
+            self.close(flag, t, reason)
+
+
+def read_chunks(path):
+    """
+    path : episode directory
+    return {column: array} of all chunks, states (fields, n), actions (ACTION_FIELDS, m)
+    """
+    columns = {name: [] for name in STATE_COLUMNS + ACTION_COLUMNS}
+    for chunk in sorted(glob.glob(os.path.join(path, "[0-9]*.npz"))):
+        with np.load(chunk) as f:
+            for name in columns:
+                if f[name].shape[-1] > 0:   # 只有动作的 chunk 里 states 为 (0, 0)
+                    columns[name].append(f[name])
+    empty = {"states": (0, 0), "actions": (ACTION_FIELDS, 0)}
+    return {name: np.concatenate(arrays, axis=-1) if arrays else np.zeros(empty.get(name, 0))
+            for name, arrays in columns.items()}
+
+
+def recover(root):
+    """
+    index the episodes left open by a recorder that was killed, reason "recovered"
+    return number of recovered episodes
+    """
+    indexed = {entry["path"] for entry in TraceIndex(root).episodes}
+    recovered = 0
+    for meta_path in sorted(glob.glob(os.path.join(root, "*", "*", META_FILE))):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["path"] in indexed:
+            continue
+        columns = read_chunks(os.path.dirname(meta_path))
+        times = np.concatenate((columns["state_time"], columns["action_time"]))
+        entry = dict(meta, end=float(times.max()) if len(times) else meta["start"], reason="recovered", info={},
+                     states=len(columns["state_time"]), actions=len(columns["action_time"]),
+                     fields=len(columns["states"]) if len(columns["state_time"]) else None, skipped=0,
+                     chunks=len(glob.glob(os.path.join(os.path.dirname(meta_path), "[0-9]*.npz"))))
+        with open(os.path.join(root, INDEX_FILE), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        recovered += 1
+    return recovered
+
+
+class TraceIndex:
+    """
+    Closed episodes of a trace directory, from index.jsonl
+
+    root : trace directory
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.episodes = []
+        index_path = os.path.join(root, INDEX_FILE)
+        if os.path.isfile(index_path):
+            with open(index_path) as f:
+                self.episodes = [json.loads(line) for line in f if line.strip()]
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def select(self, flags=None, min_states=1, reasons=None, **link):
+        """
+        flags : rlcc_flags to keep, all if None
+        min_states : episodes with fewer states are dropped
+        reasons : e.g. ("done",) for complete flows only, all if None
+        link : link parameters that must match, e.g. bandwidth="20Mbit"
+        return index lines of the matching episodes
+        """
+        flags = None if flags is None else {str(flag) for flag in flags}
+        return [entry for entry in self.episodes
+                if (flags is None or entry["flag"] in flags)
+                and entry["states"] >= min_states
+                and (reasons is None or entry["reason"] in reasons)
+                and all(entry["link"].get(k) == v for k, v in link.items())]
+
+    def read(self, entry) -> dict:
+        """
+        entry : index line
+        return {column: array} of the episode, see read_chunks
+        """
+        return read_chunks(os.path.join(self.root, entry["path"]))
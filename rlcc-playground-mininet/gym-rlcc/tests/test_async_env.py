@@ -0,0 +1,105 @@
+#
+# AsyncRlccEnv and RlccHub over fakeredis : stale done during reset, reader errors
+#
+
+import asyncio
+
+import numpy as np
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from gym_rlcc.envs import rlcc_world_async
+from gym_rlcc.protocol import STATE_SCALE
+
+# redis.asyncio 已弃用的 close() 不能再用
+pytestmark = pytest.mark.filterwarnings("error::DeprecationWarning")
+
+FIELDS = [37, 1284, 411701, 393194, 402231, 160240, 0, 12016, 0, 1288342, 1311744, 131174]
+STATE = ';'.join(str(v) for v in FIELDS)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(rlcc_world_async.aioredis, "Redis",
+                        lambda host=None, port=None: fakeredis.FakeAsyncRedis(server=server))
+    return server
+
+
+async def restarts(pubsub):
+    # messages the env published to mininet on the 'redis' channel
+    published = []
+    while True:
+        msg = await pubsub.get_message(timeout=0.01)
+        if msg is None:
+            return published
+        if msg["type"] == "message":
+            published.append(msg["data"].decode())
+
+
+async def publish_after_reset(r, *messages):
+    await asyncio.sleep(0.05)   # env 已经订阅并发布了重启
+    for channel, data in messages:
+        await r.publish(channel, data)
+
+
+def test_stale_done_does_not_stop(server):
+    async def run():
+        r = fakeredis.FakeAsyncRedis(server=server)
+        control = r.pubsub()
+        await control.subscribe('redis')
+        hub = rlcc_world_async.RlccHub()
+        env = rlcc_world_async.AsyncRlccEnv({"rlcc_flag": 1001, "reset_timeout": 0.5, "reset_retries": 2}, hub)
+        # 被 <flag>stop 关闭的 client 晚到的 done, 然后才是新流的状态
+        (obs, info), _ = await asyncio.gather(
+            env.async_reset(),
+            publish_after_reset(r, ('mininet', "rlcc_flag:1001;state:done;time:3.00 sec"),
+                                ('rlccstate_1001', STATE)))
+        published = await restarts(control)
+        await hub.close()
+        return obs, info, published
+
+    obs, info, published = asyncio.run(run())
+    np.testing.assert_allclose(obs, (np.array(FIELDS, dtype=np.float32) / STATE_SCALE)[:len(obs)], rtol=1e-6)
+    assert info == {"reset_retries": 0}
+    assert published == ["1001"]
+
+
+def test_bad_message_is_skipped(server):
+    async def run():
+        r = fakeredis.FakeAsyncRedis(server=server)
+        hub = rlcc_world_async.RlccHub()
+        env = rlcc_world_async.AsyncRlccEnv({"rlcc_flag": 1001, "reset_timeout": 0.5, "reset_retries": 2}, hub)
+        (obs, info), _ = await asyncio.gather(
+            env.async_reset(),
+            publish_after_reset(r, ('mininet', "flag:1001;state:done;time:3.00 sec"),  # 没有 rlcc_flag
+                                ('rlccstate_1001', "1;2;3;x;5;6;7;8;9;10;11;12"),       # 无法解析
+                                ('rlccstate_1001', STATE)))
+        await hub.close()
+        return info
+
+    assert asyncio.run(run()) == {"reset_retries": 0}
+
+
+def test_reader_error_reaches_envs(server, monkeypatch):
+    async def run():
+        hub = rlcc_world_async.RlccHub()
+        env = rlcc_world_async.AsyncRlccEnv({"rlcc_flag": 1001, "reset_timeout": 5, "reset_retries": 2}, hub)
+        handle_message = hub.pubsub.handle_message
+
+        async def lost(response, *args, **kwargs):
+            if response is not None and response[0] == b"message":
+                raise ConnectionError("connection lost")
+            return await handle_message(response, *args, **kwargs)
+        monkeypatch.setattr(hub.pubsub, "handle_message", lost)
+        env.queue = await hub.register(1001)
+        await hub.publish('rlccstate_1001', STATE)   # reader 收到第一条消息时断开
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(env.async_step([1.0]), 2)
+        with pytest.raises(ConnectionError):        # 之后的调用同样抛出, 不会一直等待
+            await asyncio.wait_for(env.async_reset(), 2)
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(hub.register(1002), 2)
+
+    asyncio.run(run())
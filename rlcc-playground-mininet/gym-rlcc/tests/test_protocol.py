@@ -0,0 +1,178 @@
+#
+# gym_rlcc.protocol, driven by messages recorded from rlcc.c and mininet (fixtures/messages.jsonl)
+#
+# cd gym-rlcc; python -m pytest tests
+#
+
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+import pytest
+
+from gym_rlcc.protocol import (MSG_INIT, MSG_LINK, MSG_DONE, MSG_STATE, MSG_OTHER, STATE_SCALE,
+                               OBS_FIELDS, REWARD_FIELDS, MessageStream, StateDecoder, classify,
+                               kind_of_length, observation, parse_info, reward_fields)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "messages.jsonl")
+
+
+def load_messages():
+    messages = []
+    with open(FIXTURES) as f:
+        for line in f:
+            message = json.loads(line)
+            message["raw"] = bytes.fromhex(message["hex"]) if "hex" in message else message["data"].encode("utf-8")
+            messages.append(message)
+    return messages
+
+
+MESSAGES = load_messages()
+STATES = [m for m in MESSAGES if m["kind"] == MSG_STATE]
+
+
+def by_kind(kind):
+    return next(m for m in MESSAGES if m["kind"] == kind)
+
+
+@pytest.mark.parametrize("message", MESSAGES, ids=lambda m: m["kind"] + ("-binary" if "hex" in m else ""))
+def test_classify(message):
+    kind, fields = classify(message["raw"])
+    assert kind == message["kind"]
+    if "hex" in message:
+        assert fields is None
+    else:
+        assert fields == message["data"].split(';')
+
+
+def test_kind_of_length():
+    assert kind_of_length(1) == MSG_INIT
+    assert kind_of_length(3) == MSG_DONE
+    assert kind_of_length(4) == MSG_LINK
+    assert kind_of_length(12) == MSG_STATE
+    assert kind_of_length(2) == MSG_OTHER
+    assert kind_of_length(5) == MSG_OTHER
+    assert kind_of_length(6) == MSG_STATE
+    assert kind_of_length(6, min_fields=7) == MSG_OTHER
+    assert kind_of_length(7, min_fields=7) == MSG_STATE
+
+
+def test_parse_info_link():
+    _, fields = classify(by_kind(MSG_LINK)["raw"])
+    assert parse_info(fields) == {"rlcc_flag": "1001", "bandwidth": "20Mbit", "rtt": "10ms", "loss": "0%"}
+
+
+def test_parse_info_done():
+    _, fields = classify(by_kind(MSG_DONE)["raw"])
+    info = parse_info(fields)
+    assert info["rlcc_flag"] == "1001"
+    assert info["state"] == "done"
+    assert info["time"] == "12.31 sec"   # 只按第一个 ':' 切分
+
+
+@pytest.mark.parametrize("message", STATES, ids=lambda m: "binary" if "hex" in m else "text")
+def test_decoder_scaling(message):
+    decoder = StateDecoder()
+    kind, state = decoder.decode(message["raw"])
+    assert kind == MSG_STATE
+    assert state.dtype == np.float32
+    expected = np.array(message["fields"], dtype=np.float32) / STATE_SCALE
+    np.testing.assert_allclose(state, expected, rtol=1e-6)
+
+
+def test_decoder_reuses_buffer():
+    decoder = StateDecoder()
+    text, binary = STATES[0], STATES[1]
+    _, first = decoder.decode(text["raw"])
+    kept = first.copy()
+    _, second = decoder.decode(binary["raw"])
+    # 同一个输出缓冲, 下一次 decode 覆盖上一次的状态
+    assert first is decoder.buffer and second is decoder.buffer
+    assert not np.allclose(first, kept)
+    np.testing.assert_allclose(kept, np.array(text["fields"], dtype=np.float32) / STATE_SCALE, rtol=1e-6)
+
+
+def test_decoder_other_messages():
+    decoder = StateDecoder()
+    for kind in (MSG_INIT, MSG_LINK, MSG_DONE):
+        assert decoder.decode(by_kind(kind)["raw"]) == (kind, None)
+    # 结束消息的字段留给 parse_info
+    assert parse_info(decoder.fields)["state"] == "done"
+
+
+def test_decoder_custom_scale():
+    scale = np.ones(len(STATE_SCALE), dtype=np.float32)
+    decoder = StateDecoder(scale, parse_dtype=np.float64)
+    _, state = decoder.decode(STATES[0]["raw"])
+    np.testing.assert_array_equal(state, np.array(STATES[0]["fields"], dtype=np.float32))
+
+
+def test_decoder_min_fields():
+    # tcp netlink 的 7 维状态 (rlcc_world_qlearning_TCP), 6 个字段的消息不是状态
+    decoder = StateDecoder(np.ones(7, dtype=np.float32), parse_dtype=np.float64, min_fields=7)
+    assert decoder.decode(b"1;2;3;4;5;6") == (MSG_OTHER, None)
+    kind, state = decoder.decode(b"1;2;3;4;5;6;7")
+    assert kind == MSG_STATE
+    np.testing.assert_array_equal(state, np.arange(1, 8, dtype=np.float32))
+
+
+def test_observation_and_reward_fields():
+    _, state = StateDecoder().decode(STATES[0]["raw"])
+    obs, reward = observation(state), reward_fields(state)
+    assert obs.shape == (OBS_FIELDS,) and reward.shape == (REWARD_FIELDS,)
+    np.testing.assert_array_equal(np.concatenate((obs, reward)), state)
+    assert np.shares_memory(obs, state)
+
+    batch = np.stack([state, state * 2])
+    assert observation(batch).shape == (2, OBS_FIELDS)
+    np.testing.assert_array_equal(reward_fields(batch)[1], reward * 2)
+
+
+class FakePubSub:
+    """
+    redis PubSub.get_message(timeout) over a list of recorded messages
+    """
+
+    def __init__(self, messages=()):
+        self.pending = deque(messages)
+
+    def push(self, channel, data):
+        self.pending.append({"type": "message", "channel": channel.encode(), "data": data})
+
+    def get_message(self, timeout=None):
+        if self.pending:
+            return self.pending.popleft()
+        if timeout:
+            time.sleep(timeout)
+        return None
+
+
+def recorded_pubsub():
+    pubsub = FakePubSub()
+    for message in MESSAGES:
+        pubsub.push(message["channel"], message["raw"])
+    return pubsub
+
+
+def test_stream_yields_in_order():
+    stream = MessageStream(recorded_pubsub())
+    received = [msg["data"] for msg in stream.messages(timeout=0.05)]
+    assert received == [m["raw"] for m in MESSAGES]
+
+
+def test_stream_timeout():
+    stream = MessageStream(FakePubSub())
+    start = time.monotonic()
+    assert list(stream.messages(timeout=0.05)) == []
+    assert 0.04 <= time.monotonic() - start < 1.0
+
+
+def test_stream_drain():
+    pubsub = recorded_pubsub()
+    stream = MessageStream(pubsub)
+    assert stream.drain() == len(MESSAGES)
+    assert stream.drain() == 0
+    pubsub.push("rlccstate_1001", STATES[0]["raw"])
+    assert [msg["data"] for msg in stream.messages(timeout=0.01)] == [STATES[0]["raw"]]
@@ -0,0 +1,68 @@
+#
+# gym_rlcc.recorder.Recorder.handle : episodes opened and closed by the mininet messages
+#
+
+import json
+import os
+
+from gym_rlcc.frame import encode_state_frame
+from gym_rlcc.recorder import Recorder
+from gym_rlcc.trace import INDEX_FILE
+
+FIELDS = [37, 1284, 411701, 393194, 402231, 160240, 0, 12016, 0, 1288342, 1311744, 131174]
+STATE = ';'.join(str(v) for v in FIELDS).encode()
+LINK = b"rlcc_flag:1001;bandwidth:20Mbit;rtt:10ms;loss:0%"
+DONE = b"rlcc_flag:1001;state:done;time:3.00 sec"
+
+
+def index(root):
+    path = os.path.join(root, INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_done_closes_episode(tmp_path):
+    recorder = Recorder(str(tmp_path))
+    recorder.handle("mininet", LINK, 1.0)
+    recorder.handle("rlccstate_1001", STATE, 1.1)
+    recorder.handle("rlccaction_1001", b"0,1.5", 1.2)
+    recorder.handle("mininet", DONE, 2.0)
+    entries = index(str(tmp_path))
+    assert len(entries) == 1
+    assert entries[0]["reason"] == "done"
+    assert recorder.writer.get("1001") is None
+
+
+def test_late_done_keeps_new_episode(tmp_path):
+    # <flag>stop : mininet 先启动新流 (link info), 被杀掉的 client 的 done 后到
+    recorder = Recorder(str(tmp_path))
+    recorder.handle("mininet", LINK, 1.0)
+    recorder.handle("rlccstate_1001", STATE, 1.1)
+    recorder.handle("mininet", LINK.replace(b"20Mbit", b"50Mbit"), 2.0)
+    recorder.handle("mininet", DONE, 2.1)
+    recorder.handle("rlccstate_1001", STATE, 2.2)
+    recorder.handle("mininet", DONE, 3.0)
+
+    entries = index(str(tmp_path))
+    assert [e["reason"] for e in entries] == ["restart", "done"]
+    assert entries[1]["link"] == {"bandwidth": "50Mbit", "rtt": "10ms", "loss": "0%"}
+
+
+def test_bad_messages_are_dropped(tmp_path):
+    recorder = Recorder(str(tmp_path))
+    recorder.handle("mininet", LINK, 1.0)
+    recorder.handle("mininet", b"x;y;z;w", 1.1)                        # 链路信息的形状, 无法解析
+    recorder.handle("mininet", b"flag:1001;state:done;time:1 sec", 1.2)  # 结束消息缺少 rlcc_flag
+    recorder.handle("rlccstate_1001", encode_state_frame(FIELDS)[:-3], 1.3)    # 截断的二进制帧
+    recorder.handle("rlccstate_1001", b"RLST", 1.4)
+    recorder.handle("rlccstate_1001", b"a;b;c;d;e;f;g;h;i;j;k;l", 1.5)
+    recorder.handle("rlccaction_1001", b"fast", 1.6)
+    recorder.handle("rlccstate_1001", STATE, 2.0)
+    recorder.handle("mininet", DONE, 3.0)
+
+    assert recorder.dropped == 6
+    entries = index(str(tmp_path))
+    assert len(entries) == 1
+    assert entries[0]["states"] == 1 and entries[0]["reason"] == "done"
@@ -0,0 +1,150 @@
+#
+# gym_rlcc.envs.rlcc_world_replay : a trace recorded with Recorder.handle, replayed by
+# RlccReplayEnv and ReplayTransitions, checked against the raw states
+#
+
+import numpy as np
+import pytest
+
+from gym_rlcc.envs.rlcc_world_replay import (RlccReplayEnv, ReplayTransitions, batch_rewards,
+                                             recorded_actions)
+from gym_rlcc.protocol import STATE_SCALE, OBS_FIELDS
+from gym_rlcc.recorder import Recorder
+from gym_rlcc.trace import TraceIndex
+
+LINK = b"rlcc_flag:1001;bandwidth:20Mbit;rtt:10ms;loss:0%"
+DONE = b"rlcc_flag:1001;state:done;time:3.00 sec"
+STEPS = 5
+
+
+def raw_states(steps=STEPS):
+    base = np.array([37, 1284, 411701, 393194, 402231, 160240, 0, 12016, 0, 1288342, 1311744, 131174],
+                    dtype=np.float64)
+    return [base * (i + 1) for i in range(steps)]
+
+
+def text(state):
+    return ';'.join(str(int(v)) for v in state).encode()
+
+
+@pytest.fixture
+def trace(tmp_path):
+    # 每个状态之后一个动作, 第 3 个状态没有动作
+    recorder = Recorder(str(tmp_path))
+    recorder.handle("mininet", LINK, 1.0)
+    for i, state in enumerate(raw_states()):
+        recorder.handle("rlccstate_1001", text(state), 1.1 + i)
+        if i != 2:
+            recorder.handle("rlccaction_1001", f"0,{1.0 + i / 10}".encode(), 1.2 + i)
+    recorder.handle("mininet", DONE, 10.0)
+    return str(tmp_path)
+
+
+def scaled(state):
+    return (state / STATE_SCALE).astype(np.float32)
+
+
+def episode(plan_values):
+    # states 0..3, actions after states 0, 1, 3, values in row 0 (plan 2/3) and row 1 (plan 1)
+    return {"state_seq": np.array([0, 2, 4, 5]), "action_seq": np.array([1, 3, 6]),
+            "actions": np.array([plan_values, [1.5, 2.0, 0.7]], dtype=np.float64)}
+
+
+def test_recorded_actions_plans():
+    np.testing.assert_array_equal(recorded_actions(episode([0, 0, 0]), 1), [1.5, 2.0, np.nan, 0.7])
+    # plan 2 : cwnd 变化量 -> Discrete(7) 序号, 未知的变化量为 nan
+    np.testing.assert_array_equal(recorded_actions(episode([-10, 3, 7]), 2), [0, 5, np.nan, np.nan])
+    # plan 3 : 符号 -> Discrete(3)
+    np.testing.assert_array_equal(recorded_actions(episode([-4, 0, 9]), 3), [0, 1, np.nan, 2])
+
+
+def test_recorded_actions_none():
+    columns = {"state_seq": np.array([0, 1]), "action_seq": np.zeros(0, dtype=np.int64),
+               "actions": np.zeros((2, 0))}
+    assert np.isnan(recorded_actions(columns, 1)).all()
+
+
+def test_batch_rewards_vectorised_and_fallback():
+    states = np.arange(24, dtype=np.float32).reshape(2, 12)
+    np.testing.assert_array_equal(batch_rewards(lambda s: s[-3] - s[2], states), states[:, -3] - states[:, 2])
+
+    def per_state(s):
+        return float(s[-3]) if float(s[0]) < 100 else 0.0  # float() 不接受批量数组
+    np.testing.assert_array_equal(batch_rewards(per_state, states), states[:, -3])
+    assert batch_rewards(per_state, np.zeros((0, 12), dtype=np.float32)).shape == (0,)
+
+
+def aurora(state):
+    # 与 RlccEnvR._reward 注释中的 owl / aurora 写法相同, 修改参数
+    state[2] -= state[3]    # rtt - min_rtt
+    state[-1] = np.maximum(state[-1], 1)
+    return state[-3] / state[-1] - state[2]
+
+
+def latency(state):
+    return -state[2]
+
+
+def test_reward_functions_do_not_modify_states(trace):
+    index = TraceIndex(trace)
+    episodes = [index.read(entry) for entry in index.select()]
+
+    alone = ReplayTransitions(episodes).set_reward_function(latency).copy()
+    transitions = ReplayTransitions(episodes)
+    states = transitions.states.copy()
+    transitions.set_reward_function(aurora)
+    np.testing.assert_array_equal(transitions.states, states)
+    np.testing.assert_array_equal(transitions.set_reward_function(latency), alone)
+
+    # 逐状态调用的 reward 同样不能修改
+    per_state = ReplayTransitions(episodes)
+    per_state.set_reward_function(lambda s: aurora(s) + float(s[0]) * 0)
+    np.testing.assert_array_equal(per_state.states, states)
+
+
+def test_transitions_match_raw_states(trace):
+    index = TraceIndex(trace)
+    entries = index.select()
+    assert len(entries) == 1 and entries[0]["link"]["bandwidth"] == "20Mbit"
+    transitions = ReplayTransitions([index.read(e) for e in entries], plan=1, reward_function=latency)
+    raw = [scaled(s) for s in raw_states()]
+
+    assert len(transitions) == STEPS - 1
+    batch = next(transitions.batches(batch_size=16, shuffle=False))
+    np.testing.assert_allclose(batch["obs"], [s[:OBS_FIELDS] for s in raw[:-1]], rtol=1e-6)
+    np.testing.assert_allclose(batch["next_obs"], [s[:OBS_FIELDS] for s in raw[1:]], rtol=1e-6)
+    np.testing.assert_allclose(batch["rewards"], [-s[2] for s in raw[1:]], rtol=1e-6)
+    np.testing.assert_allclose(batch["actions"], [1.0, 1.1, np.nan, 1.3], rtol=1e-6)
+    assert batch["dones"].tolist() == [False, False, False, True]
+
+    shuffled = list(transitions.batches(batch_size=3, seed=0))
+    assert sum(len(b["obs"]) for b in shuffled) == STEPS - 1
+
+
+def test_env_replays_episode(trace):
+    env = RlccReplayEnv({"trace_root": trace, "reward_function": aurora, "shuffle": False})
+    raw = [scaled(s) for s in raw_states()]
+
+    obs = env.reset()
+    np.testing.assert_allclose(obs, raw[0][:OBS_FIELDS], rtol=1e-6)
+    for i in range(1, STEPS):
+        obs, reward, done, info = env.step(env.action_space.sample())
+        assert not done
+        np.testing.assert_allclose(obs, raw[i][:OBS_FIELDS], rtol=1e-6)
+        assert reward == pytest.approx(aurora(raw[i].copy()))
+        if i - 1 != 2:
+            assert info["recorded_action"] == pytest.approx(1.0 + (i - 1) / 10)
+        else:
+            assert np.isnan(info["recorded_action"])
+    # 录制的流结束
+    _, _, done, _ = env.step(env.action_space.sample())
+    assert done
+    # reward 修改的是副本
+    np.testing.assert_allclose(env.states, raw, rtol=1e-6)
+
+
+def test_env_maxsteps(trace):
+    env = RlccReplayEnv({"trace_root": trace, "maxsteps": 3, "shuffle": False})
+    env.reset()
+    assert [env.step(0)[2] for _ in range(3)] == [False, False, True]
+    assert env.reset_info["reset_retries"] == 0
@@ -0,0 +1,85 @@
+#
+# gym_rlcc.protocol.start_flow, the reset loop shared by the envs
+#
+
+import numpy as np
+import pytest
+
+from gym_rlcc.protocol import RlccResetError, flow_starter, start_flow
+
+STATE = np.arange(12, dtype=np.float32)
+DONE = np.array([0], dtype=np.float32)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, data):
+        self.published.append((channel, data))
+
+
+def scripted(*results):
+    """
+    get_obs returning results one by one, None (timeout) once they are used up
+    """
+    results = list(results)
+
+    def get_obs(timeout=None):
+        return results.pop(0) if results else None
+    return get_obs
+
+
+def test_first_state():
+    rp = FakeRedis()
+    drained = []
+    state, retries = start_flow(scripted(STATE), flow_starter(rp, 1001), lambda: drained.append(1), 1.0, 3)
+    assert retries == 0
+    np.testing.assert_array_equal(state, STATE)
+    assert rp.published == [('redis', 1001)]
+    assert drained == [1]
+
+
+def test_stale_done_is_skipped():
+    # done of the client killed by <flag>stop after maxsteps, arriving after the new flow started
+    rp = FakeRedis()
+    state, retries = start_flow(scripted(DONE, DONE, STATE), flow_starter(rp, 1001), None, 1.0, 3)
+    assert retries == 0
+    np.testing.assert_array_equal(state, STATE)
+    assert rp.published == [('redis', 1001)]   # 没有 <flag>stop
+
+
+def test_stop_only_after_timeout():
+    rp = FakeRedis()
+    results = iter([None, STATE])   # 第一次超时
+
+    state, retries = start_flow(lambda timeout=None: next(results), flow_starter(rp, 1001), None, 1.0, 3)
+    assert retries == 1
+    assert rp.published == [('redis', 1001), ('redis', '1001stop')]
+
+
+def test_done_then_timeout_counts_as_one_attempt():
+    rp = FakeRedis()
+    results = iter([DONE, None, STATE])
+    state, retries = start_flow(lambda timeout=None: next(results), flow_starter(rp, 1001), None, 1.0, 3)
+    assert retries == 1
+    assert rp.published == [('redis', 1001), ('redis', '1001stop')]
+
+
+def test_waits_only_until_deadline():
+    waits = []
+
+    def get_obs(timeout=None):
+        waits.append(timeout)
+        return DONE     # 一直只有结束消息
+
+    with pytest.raises(RlccResetError):
+        start_flow(get_obs, flow_starter(FakeRedis(), 1001), None, 0.05, 2)
+    assert all(0 < w <= 0.05 for w in waits)
+
+
+def test_raises_after_retries():
+    rp = FakeRedis()
+    with pytest.raises(RlccResetError):
+        start_flow(scripted(), flow_starter(rp, 1001), None, 0.01, 3, name="rlcc_flag 1001")
+    assert rp.published == [('redis', 1001), ('redis', '1001stop'), ('redis', '1001stop')]
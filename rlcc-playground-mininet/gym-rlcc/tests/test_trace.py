@@ -0,0 +1,81 @@
+#
+# gym_rlcc.trace : chunks written by EpisodeWriter / TraceWriter read back by read_chunks,
+# episodes of a killed recorder indexed by recover()
+#
+
+import json
+import os
+
+import numpy as np
+
+from gym_rlcc.trace import (ACTION_FIELDS, INDEX_FILE, TraceIndex, TraceWriter, read_chunks,
+                            recover)
+
+FIELDS = 12
+
+
+def state(i):
+    return np.arange(FIELDS, dtype=np.float64) + 100 * i
+
+
+def test_chunks_round_trip(tmp_path):
+    writer = TraceWriter(str(tmp_path), chunk_rows=4)
+    episode = writer.open("1001", 0.0, {"bandwidth": "20Mbit"})
+    for i in range(6):
+        episode.add_state(1.0 + i, state(i))
+        if episode.due(1.0 + i, writer.chunk_rows):
+            episode.flush()
+        episode.add_action(1.5 + i, [0, 1.0 + i] if i % 2 else [3])
+    episode.add_state(9.0, np.zeros(FIELDS - 1))    # 字段数不同, 跳过
+    entry = writer.close("1001", 10.0, "done")
+
+    assert entry["states"] == 6 and entry["actions"] == 6 and entry["skipped"] == 1
+    assert entry["chunks"] == 3
+    columns = read_chunks(os.path.join(str(tmp_path), entry["path"]))
+    np.testing.assert_array_equal(columns["states"], np.stack([state(i) for i in range(6)], axis=1))
+    np.testing.assert_array_equal(columns["state_time"], 1.0 + np.arange(6))
+    np.testing.assert_array_equal(columns["state_seq"], np.arange(0, 12, 2))
+    np.testing.assert_array_equal(columns["action_seq"], np.arange(1, 12, 2))
+    assert columns["actions"].shape == (ACTION_FIELDS, 6)
+    np.testing.assert_array_equal(columns["actions"][0], [3, 0, 3, 0, 3, 0])
+    np.testing.assert_array_equal(columns["actions"][1], [np.nan, 2, np.nan, 4, np.nan, 6])
+
+    index = TraceIndex(str(tmp_path))
+    assert len(index) == 1 and index.select(bandwidth="20Mbit") == [entry]
+    assert index.select(min_states=7) == [] and index.select(reasons=("restart",)) == []
+
+
+def test_empty_episode_leaves_nothing(tmp_path):
+    writer = TraceWriter(str(tmp_path))
+    writer.open("1001", 0.0)
+    assert writer.close("1001", 1.0, "done") is None
+    assert not os.path.exists(os.path.join(str(tmp_path), INDEX_FILE))
+    assert read_chunks(os.path.join(str(tmp_path), "1001", "000000"))["states"].shape == (0, 0)
+
+
+def test_recover_killed_recorder(tmp_path):
+    root = str(tmp_path)
+    writer = TraceWriter(root, chunk_rows=2)
+    done = writer.open("1001", 0.0)
+    done.add_state(1.0, state(0))
+    writer.close("1001", 2.0, "done")
+    killed = writer.open("1002", 3.0, {"rtt": "10ms"})
+    for i in range(3):
+        killed.add_state(4.0 + i, state(i))
+    killed.add_action(7.5, [1])
+    killed.flush()
+    killed.add_state(8.0, state(3))     # 还在缓存中, 随进程丢失
+    del writer
+
+    # 下一次启动的 TraceWriter 调用 recover(), 继续编号
+    writer = TraceWriter(root)
+    entries = TraceIndex(root).episodes
+    assert [(e["flag"], e["reason"]) for e in entries] == [("1001", "done"), ("1002", "recovered")]
+    recovered = entries[1]
+    assert recovered["states"] == 3 and recovered["actions"] == 1 and recovered["fields"] == FIELDS
+    assert recovered["end"] == 7.5 and recovered["link"] == {"rtt": "10ms"}
+    assert writer.open("1002", 9.0).meta["episode"] == 1
+
+    assert recover(root) == 0   # 已经索引
+    with open(os.path.join(root, INDEX_FILE)) as f:
+        assert len([json.loads(line) for line in f]) == 2
@@ -0,0 +1,151 @@
+#
+# RlccVecEnv reset over fakeredis : a done left by the previous flow must not trigger <flag>stop
+# step and auto reset : terminated, truncated by maxsteps, a stuck flow truncated after step_timeout
+#
+
+import threading
+
+import numpy as np
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from gym_rlcc.envs import rlcc_world_vec
+from gym_rlcc.protocol import STATE_SCALE
+
+FIELDS = [37, 1284, 411701, 393194, 402231, 160240, 0, 12016, 0, 1288342, 1311744, 131174]
+
+
+def state(k):
+    return ';'.join(str(v * k) for v in FIELDS)
+
+
+def obs_of(k):
+    return (np.array(FIELDS, dtype=np.float32) * k / STATE_SCALE)[:len(STATE_SCALE) - 3]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(rlcc_world_vec, "Redis", lambda host=None, port=None: fakeredis.FakeRedis(server=server))
+    return server
+
+
+def restarts(pubsub):
+    # messages the env published to mininet on the 'redis' channel
+    published = []
+    while True:
+        msg = pubsub.get_message(timeout=0)
+        if msg is None:
+            return published
+        if msg["type"] == "message":
+            published.append(msg["data"].decode())
+
+
+def test_stale_done_does_not_stop(server):
+    r = fakeredis.FakeRedis(server=server)
+    control = r.pubsub()
+    control.subscribe('redis')
+
+    env = rlcc_world_vec.RlccVecEnv({"rlcc_flags": [1001, 1002], "reset_timeout": 0.5, "reset_retries": 2})
+    env.reset_async()
+    # 1001 : 被 <flag>stop 关闭的 client 晚到的 done, 然后才是新流的状态
+    r.publish('mininet', "rlcc_flag:1001;state:done;time:3.00 sec")
+    r.publish('rlccstate_1002', ';'.join(str(v) for v in FIELDS))
+    r.publish('rlccstate_1001', ';'.join(str(v) for v in FIELDS))
+    obs, infos = env.reset_wait()
+
+    np.testing.assert_allclose(obs[0], (np.array(FIELDS, dtype=np.float32) / STATE_SCALE)[:obs.shape[1]], rtol=1e-6)
+    assert list(infos["reset_retries"]) == [0, 0]
+    assert [m for m in restarts(control) if m.endswith("stop")] == []
+
+
+def test_timeout_stops_missing_flow_only(server):
+    r = fakeredis.FakeRedis(server=server)
+    control = r.pubsub()
+    control.subscribe('redis')
+
+    env = rlcc_world_vec.RlccVecEnv({"rlcc_flags": [1001, 1002], "reset_timeout": 0.1, "reset_retries": 2})
+    env.reset_async()
+    r.publish('rlccstate_1001', ';'.join(str(v) for v in FIELDS))
+    with pytest.raises(rlcc_world_vec.RlccResetError):
+        env.reset_wait()
+    assert [m for m in restarts(control) if m.endswith("stop")] == ["1002stop"]
+
+
+def started_env(server, **config):
+    # 两个流都已经 reset, 第一个状态为 state(1)
+    r = fakeredis.FakeRedis(server=server)
+    control = r.pubsub()
+    control.subscribe('redis')
+    env = rlcc_world_vec.RlccVecEnv(dict({"rlcc_flags": [1001, 1002], "reset_timeout": 2, "reset_retries": 2},
+                                         **config))
+    env.reset_async()
+    r.publish('rlccstate_1001', state(1))
+    r.publish('rlccstate_1002', state(1))
+    env.reset_wait()
+    restarts(control)
+    return r, control, env
+
+
+def test_step(server):
+    r, control, env = started_env(server)
+    r.publish('rlccstate_1002', state(3))
+    r.publish('rlccstate_1001', state(2))
+    obs, rewards, terminated, truncated, infos = env.step(np.ones((2, 1), dtype=np.float32))
+
+    np.testing.assert_allclose(obs, [obs_of(2), obs_of(3)], rtol=1e-6)
+    np.testing.assert_allclose(rewards, [env._reward(s) for s in env.states], rtol=1e-6)
+    assert not terminated.any() and not truncated.any()
+    assert infos == {}
+    assert restarts(control) == []
+
+
+def test_done_flow_is_terminated_and_restarted(server):
+    r, control, env = started_env(server)
+    r.publish('mininet', "rlcc_flag:1001;state:done;time:3.00 sec")
+    r.publish('rlccstate_1002', state(3))
+    r.publish('rlccstate_1001', state(5))    # 新流的第一个状态
+    obs, _, terminated, truncated, infos = env.step(np.ones((2, 1), dtype=np.float32))
+
+    assert terminated.tolist() == [True, False] and not truncated.any()
+    np.testing.assert_allclose(obs, [obs_of(5), obs_of(3)], rtol=1e-6)
+    np.testing.assert_allclose(infos["final_observation"][0], obs_of(1), rtol=1e-6)
+    assert infos["_final_observation"].tolist() == [True, False]
+    assert infos["reset_retries"][0] == 0 and infos["_reset_retries"].tolist() == [True, False]
+    assert restarts(control) == ["1001"]
+
+
+def test_maxsteps_truncates(server):
+    r, control, env = started_env(server, maxsteps=2)
+    r.publish('rlccstate_1001', state(2))
+    r.publish('rlccstate_1002', state(2))
+    env.step(np.ones((2, 1), dtype=np.float32))
+    # 第二步不发动作, 发 <flag>stop, mininet 重启流
+    r.publish('rlccstate_1001', state(4))
+    r.publish('rlccstate_1002', state(4))
+    obs, _, terminated, truncated, infos = env.step(np.ones((2, 1), dtype=np.float32))
+
+    assert truncated.tolist() == [True, True] and not terminated.any()
+    np.testing.assert_allclose(obs, [obs_of(4), obs_of(4)], rtol=1e-6)
+    np.testing.assert_allclose(np.stack(infos["final_observation"]), [obs_of(2), obs_of(2)], rtol=1e-6)
+    assert restarts(control) == ["1001stop", "1002stop"]
+    assert env.step_counts.tolist() == [0, 0]
+
+
+def test_stuck_flow_is_truncated(server):
+    r, control, env = started_env(server, step_timeout=0.1)
+    r.publish('rlccstate_1002', state(3))
+    # 1001 没有状态, step_timeout 之后被关闭, 新流的状态稍后才到
+    timer = threading.Timer(0.5, r.publish, ('rlccstate_1001', state(5)))
+    timer.start()
+    try:
+        obs, _, terminated, truncated, infos = env.step(np.ones((2, 1), dtype=np.float32))
+    finally:
+        timer.cancel()
+
+    assert truncated.tolist() == [True, False] and not terminated.any()
+    np.testing.assert_allclose(obs, [obs_of(5), obs_of(3)], rtol=1e-6)
+    np.testing.assert_allclose(infos["final_observation"][0], obs_of(1), rtol=1e-6)
+    assert infos["reset_retries"][0] == 0
+    assert restarts(control) == ["1001stop"]
@@ -0,0 +1,70 @@
+#
+# RlccEnvR (每个流一个阻塞 env + 线程) vs AsyncRlccEnv (一个事件循环) 的 steps/sec
+# 需要 redis, 流由 fake_rlcc.py 伪装
+#
+
+import argparse
+import asyncio
+import threading
+import time
+
+from gym_rlcc.envs import RlccEnvR, RlccHub, AsyncRlccEnv
+import fake_rlcc
+
+
+def flow_config(i):
+    return {"rlcc_flag": 1001 + i, "plan": 2, "maxsteps": 10 ** 9}
+
+
+def bench_sync(flows, steps, redis_host, redis_port):
+    envs = [RlccEnvR(flow_config(i), redis_host=redis_host, redis_port=redis_port) for i in range(flows)]
+
+    def run(env):
+        env.reset()
+        for _ in range(steps):
+            env.step(3)
+
+    threads = [threading.Thread(target=run, args=(env,)) for env in envs]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return flows * steps / (time.perf_counter() - start)
+
+
+async def bench_async(flows, steps, redis_host, redis_port):
+    hub = RlccHub(redis_host, redis_port)
+    envs = [AsyncRlccEnv(flow_config(i), hub) for i in range(flows)]
+
+    async def run(env):
+        await env.async_reset()
+        for _ in range(steps):
+            await env.async_step(3)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(env) for env in envs))
+    cost = time.perf_counter() - start
+    await hub.close()
+    return flows * steps / cost
+
+
+def main(flow_counts, steps, redis_host, redis_port):
+    fake = fake_rlcc.start(redis_host, redis_port)
+    print(f"{'flows':>6} | {'RlccEnvR steps/s':>16} | {'AsyncRlccEnv steps/s':>20} | speedup")
+    for flows in flow_counts:
+        sync_rate = bench_sync(flows, steps, redis_host, redis_port)
+        async_rate = asyncio.run(bench_async(flows, steps, redis_host, redis_port))
+        print(f"{flows:>6} | {sync_rate:>16.0f} | {async_rate:>20.0f} | {async_rate / sync_rate:.2f}x")
+    fake.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', dest='redis_host', default='0.0.0.0', help='redis host')
+    parser.add_argument('-p', dest='redis_port', type=int, default=6379, help='redis port')
+    parser.add_argument('-f', dest='flows', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32],
+                        help='flow counts to run')
+    parser.add_argument('-s', dest='steps', type=int, default=500, help='steps per flow')
+    args = parser.parse_args()
+    main(args.flows, args.steps, args.redis_host, args.redis_port)
@@ -0,0 +1,47 @@
+#
+# 文本状态帧 vs 二进制状态帧 解码耗时对比
+#
+
+import argparse
+import timeit
+import numpy as np
+
+from gym_rlcc.frame import StateFrameDecoder, encode_state_frame
+
+SCALE = np.array([1, 1, 512, 512, 512, 16384, 1, 1, 1, 1024, 1024, 1], dtype=np.float32)
+
+# one sample recorded from rlcc.c (plan 2)
+FIELDS = [37, 1284, 411701, 393194, 402231, 160240, 0, 12016, 0, 1288342, 1311744, 131174]
+
+
+def decode_text(data):
+    # same path as _get_obs in gym_rlcc envs
+    data_list = data.decode("utf-8").split(';')
+    if len(data_list) > 5:
+        state = np.array(data_list, dtype=np.float32)
+        return np.divide(state, SCALE, dtype=np.float32)
+
+
+def main(number):
+    text = ';'.join(str(v) for v in FIELDS).encode("utf-8")
+    binary = encode_state_frame(FIELDS)
+    decoder = StateFrameDecoder(SCALE)
+
+    assert np.allclose(decode_text(text), decoder.decode(binary))
+
+    results = {
+        "text": min(timeit.repeat(lambda: decode_text(text), number=number, repeat=5)),
+        "binary": min(timeit.repeat(lambda: decoder.decode(binary), number=number, repeat=5)),
+    }
+    print(f"frame size : text {len(text)} bytes, binary {len(binary)} bytes")
+    for name, cost in results.items():
+        print(f"{name:>6} : {cost / number * 1e6:.3f} us/step")
+    print(f"speedup : {results['text'] / results['binary']:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', dest='number', type=int, default=100000,
+                        help='decode calls per repeat')
+    args = parser.parse_args()
+    main(args.number)
@@ -0,0 +1,79 @@
+#
+# 伪装 mininet + xquic(rlcc.c), 不需要 mininet 就能驱动 gym 环境
+#
+# 收到 redis 频道的 rlcc_flag  : 启动流, 发布 state:init 和第一个状态
+# 收到 rlccaction_<flag> 的动作 : 回一个状态, 流跑满 episode 步后在 mininet 频道发布 done
+#
+
+import argparse
+import multiprocessing
+from redis.client import Redis
+
+# one sample recorded from rlcc.c (plan 2)
+FIELDS = [37, 1284, 411701, 393194, 402231, 160240, 0, 12016, 0, 1288342, 1311744, 131174]
+
+
+def run(redis_host='0.0.0.0', redis_port=6379, episode=0, ready=None):
+    """
+    episode : steps of a flow before its done message, 0 never ends
+    ready : multiprocessing.Event, set once subscribed
+    """
+    r = Redis(host=redis_host, port=redis_port)
+    rp = Redis(host=redis_host, port=redis_port)
+    pub = r.pubsub()
+    pub.subscribe('redis')
+    pub.psubscribe('rlccaction_*')
+    state = ';'.join(str(v) for v in FIELDS)
+    steps = {}
+    subscribed = 0
+
+    for msg in pub.listen():
+        if msg["type"] in ("subscribe", "psubscribe"):
+            subscribed += 1
+            if subscribed == 2 and ready is not None:
+                ready.set()
+            continue
+
+        channel = msg["channel"].decode("utf-8")
+        if channel == 'redis':
+            rlcc_flag = msg["data"].decode("utf-8")
+            if rlcc_flag.endswith("stop"):  # 关闭并重启流
+                rlcc_flag = rlcc_flag[:-4]
+            steps[rlcc_flag] = 0
+            rp.publish(f"rlccstate_{rlcc_flag}", "state:init")
+            rp.publish(f"rlccstate_{rlcc_flag}", state)
+            continue
+
+        rlcc_flag = channel.replace("rlccaction_", "", 1)
+        if rlcc_flag not in steps:
+            continue
+        steps[rlcc_flag] += 1
+        if episode and steps[rlcc_flag] >= episode:
+            del steps[rlcc_flag]
+            rp.publish('mininet', f"rlcc_flag:{rlcc_flag};state:done;time:0.00 sec")
+        else:
+            rp.publish(f"rlccstate_{rlcc_flag}", state)
+
+
+def start(redis_host='0.0.0.0', redis_port=6379, episode=0) -> multiprocessing.Process:
+    """
+    run the fake flows in a daemon process, return once it is subscribed
+    """
+    ready = multiprocessing.Event()
+    p = multiprocessing.Process(target=run, args=(redis_host, redis_port, episode, ready), daemon=True)
+    p.start()
+    ready.wait()
+    return p
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', dest='redis_host', default='0.0.0.0', help='redis host')
+    parser.add_argument('-p', dest='redis_port', type=int, default=6379, help='redis port')
+    parser.add_argument('-e', dest='episode', type=int, default=0,
+                        help='steps of a flow before done, 0 never ends')
+    args = parser.parse_args()
+    try:
+        run(args.redis_host, args.redis_port, args.episode)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,69 @@
+#
+# 伪装多个流持续发布状态, 不需要 mininet 和智能体, 用于测试 webui (app.py / stream.py)
+#
+# 每个流先在 mininet 频道发布链路信息, 再发布 state:init, 之后按固定频率发布状态,
+# 吞吐量和 rtt 按正弦变化, 每跑满 episode 步重新开始一个流
+#
+
+import argparse
+import time
+import numpy as np
+from redis.client import Redis
+
+from gym_rlcc.frame import encode_state_frame
+
+# one sample recorded from rlcc.c (plan 2)
+FIELDS = np.array([37, 1284, 411701, 393194, 402231, 160240, 0, 12016, 0, 1288342, 1311744, 131174], dtype=np.int64)
+
+
+def run(redis_host='0.0.0.0', redis_port=6379, flows=10, rate=100, episode=0, binary=False, first_flag=1001):
+    """
+    flows : number of flows, rlcc_flag first_flag, first_flag + 1, ...
+    rate : states per second of each flow
+    episode : states of a flow before it starts again, 0 never ends
+    binary : publish binary state frames instead of text frames
+    """
+    rp = Redis(host=redis_host, port=redis_port)
+    flags = [first_flag + i for i in range(flows)]
+    phase = np.arange(flows) * 2 * np.pi / max(flows, 1)
+    step = 0
+    start = time.monotonic()
+
+    while True:
+        if step == 0 or episode and step % episode == 0:
+            for i, flag in enumerate(flags):
+                rp.publish('mininet', f"rlcc_flag:{flag};bandwidth:{10 + i};rtt:{20 + 2 * i};loss:0")
+                rp.publish(f"rlccstate_{flag}", "state:init")
+
+        wave = 1 + 0.5 * np.sin(step / rate + phase)
+        pipe = rp.pipeline(transaction=False)
+        for i, flag in enumerate(flags):
+            fields = FIELDS.copy()
+            fields[[2, 9, 10]] = fields[[2, 9, 10]] * wave[i]                   # rtt, delivery_rate, throughput
+            fields[6] = np.random.poisson(0.5)                                  # lost_interval
+            if binary:
+                pipe.publish(f"rlccstate_{flag}", encode_state_frame(fields))
+            else:
+                pipe.publish(f"rlccstate_{flag}", ';'.join(str(v) for v in fields))
+        pipe.execute()
+        step += 1
+
+        wait = start + step / rate - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', dest='redis_host', default='0.0.0.0', help='redis host')
+    parser.add_argument('-p', dest='redis_port', type=int, default=6379, help='redis port')
+    parser.add_argument('-f', dest='flows', type=int, default=10, help='number of flows')
+    parser.add_argument('-s', dest='rate', type=float, default=100, help='states per second of each flow')
+    parser.add_argument('-e', dest='episode', type=int, default=0,
+                        help='states of a flow before it starts again, 0 never ends')
+    parser.add_argument('-b', dest='binary', action='store_true', help='binary state frames')
+    args = parser.parse_args()
+    try:
+        run(args.redis_host, args.redis_port, args.flows, args.rate, args.episode, args.binary)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,112 @@
+"""
+Collector of the web ui, shared by the streamlit app (app.py) and the streaming dashboard (stream.py)
+"""
+from redis.client import Redis
+import numpy as np
+import threading
+from gym_rlcc.frame import decode_state_frame
+from gym_rlcc.protocol import MSG_INIT, MSG_LINK, MSG_STATE, classify, parse_info
+from ring_buffer import RingBuffer
+
+METRICS = ('throughput', 'delivered_rate', 'rtt', 'loss')
+
+
+class DataSource:
+    """
+    Collect the states of all flows with one redis connection and one thread.
+
+    rlccstate_* is pattern subscribed, a flow is added to channels when its
+    first message (or its link info on mininet) arrives, the ui adds its charts
+    from channels.
+
+    channels : flows to show first, before they publish anything
+    """
+
+    def __init__(self, channels: list = (), redis_ip='0.0.0.0', redis_port=6379):
+        self.redis_ip = redis_ip
+        self.redis_port = redis_port
+
+        self.channels = []      # 按发现顺序
+        self.datas = {}         # channel -> RingBuffer
+        self.states = {}        # channel -> 链路参数
+        self.lock = threading.Lock()
+        for channel in channels:
+            self.add_channel(channel)
+
+        self.collector = None
+        self.dropped = 0        # 无法解析而跳过的消息
+
+    def add_channel(self, channel: str) -> RingBuffer:
+        """
+        channel : rlccstate_<flag>
+        return the ring buffer of channel, created on first use
+        """
+        data = self.datas.get(channel)
+        if data is None:
+            with self.lock:
+                if channel not in self.datas:
+                    self.states[channel] = {}
+                    self.datas[channel] = RingBuffer(METRICS)
+                    self.channels.append(channel)
+                data = self.datas[channel]
+        return data
+
+    def parser_redis_data(self):
+        r = Redis(host=self.redis_ip, port=self.redis_port)
+        pub = r.pubsub()
+        pub.psubscribe("rlccstate_*", "mininet")
+        for msg in pub.listen():
+            if msg["type"] != "pmessage":
+                continue
+            try:
+                self.handle(str(msg["channel"], encoding="utf-8"), msg["data"])
+            except Exception as e:  # 一条错误的消息不能停掉所有流共用的采集线程
+                self.dropped += 1
+                print(f"DataSource : skip message on {msg['channel']!r} : {e!r}")
+
+    def handle(self, current_channel: str, raw: bytes):
+        """
+        current_channel : rlccstate_<flag> or mininet
+        raw : message data
+        """
+        kind, data_list = classify(raw)
+
+        if current_channel == "mininet":
+            if kind == MSG_LINK:  # mininet发回来的链路信息, 流启动
+                info = parse_info(data_list)
+                channel = f"rlccstate_{info['rlcc_flag']}"
+                link = {
+                    "bandwidth": info["bandwidth"],
+                    "rtt": info["rtt"],
+                    "loss": info["loss"]
+                }
+                self.add_channel(channel)
+                self.states[channel] = link
+            # MSG_DONE 流执行完的统计信息，流结束
+            return
+
+        data = self.add_channel(current_channel)
+        if kind == MSG_INIT:
+            # init 启动确认相关的信息, 重置数据
+            data.reset()
+        elif kind == MSG_STATE:
+            if data_list is None:
+                # 二进制状态帧，字段顺序与文本帧相同
+                data_list = decode_state_frame(raw)
+            # cwnd;pacing_rate;rtt;min_rtt;srtt;inflight;lost_interval;lost_pkts;
+            # is_app_limited;delivery_rate;throughput;sended_interval
+            self.append_state(current_channel, data_list)
+
+    def append_state(self, channel: str, fields):
+        """
+        fields : 12 state fields, text frame split list or binary frame int64 view
+        """
+        self.datas[channel].append((
+            np.float32(fields[-2])*8/1024/1024,  # throughput
+            np.float32(fields[-3])*8/1024/1024,  # delivered_rate
+            np.float32(fields[2])/1024,          # rtt
+            np.float32(fields[-6])))             # loss
+
+    def run_collector(self):
+        self.collector = threading.Thread(target=self.parser_redis_data, daemon=True)
+        self.collector.start()
@@ -0,0 +1,135 @@
+"""
+Fixed capacity time series store of the web ui
+
+Every channel keeps its samples in a RingBuffer: one preallocated float32 array
+of shape (capacity, metrics), the oldest row is overwritten once it is full.
+Each sample has a sequence number (0 for the first sample after a reset), it is
+used as x axis and lets a reader ask for the samples it has not seen yet.
+
+A snapshot holds the last `recent` samples at full resolution and the older
+samples still in the buffer min/max decimated into `bins` chunks, so memory and
+the cost of one refresh do not grow with the length of the run.
+"""
+import threading
+import numpy as np
+
+
+DEFAULT_CAPACITY = 1 << 16   # samples per channel, 1 MB with 4 metrics
+DEFAULT_RECENT = 2000        # samples of a snapshot at full resolution
+DEFAULT_BINS = 500           # min/max chunks of a snapshot for the older samples
+
+
+class RingBuffer:
+    def __init__(self, metrics, capacity=DEFAULT_CAPACITY):
+        """
+        metrics : names of the columns of a sample
+        capacity : samples kept, older ones are dropped
+        """
+        self.metrics = tuple(metrics)
+        self.capacity = capacity
+        self.data = np.zeros((capacity, len(self.metrics)), dtype=np.float32)
+        self.count = 0  # samples appended since the last reset, next sequence number
+        self.resets = 0  # a reader that saw another value has to start again from 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, values):
+        """
+        values : one sample, a value per metric
+        """
+        with self.lock:
+            self.data[self.count % self.capacity] = values
+            self.count += 1
+
+    def reset(self):
+        with self.lock:
+            self.count = 0
+            self.resets += 1
+
+    def last(self):
+        """
+        return the latest sample, None if empty
+        """
+        with self.lock:
+            if self.count == 0:
+                return None
+            return self.data[(self.count - 1) % self.capacity].copy()
+
+    def _take(self, start, stop):
+        # rows of sequence numbers [start, stop), the caller holds the lock
+        seq = np.arange(start, stop)
+        return seq, self.data.take(seq % self.capacity, axis=0)
+
+    def window(self, n=None):
+        """
+        n : number of samples, all kept samples if None
+        return sequence numbers (n,) and a copy of the latest n samples (n, metrics)
+        """
+        with self.lock:
+            size = min(self.count, self.capacity)
+            n = size if n is None else min(n, size)
+            return self._take(self.count - n, self.count)
+
+    def since(self, seq):
+        """
+        seq : first sequence number wanted, e.g. the count of the last read
+        return sequence numbers and samples appended from seq on, the ones already
+        overwritten are skipped
+        """
+        with self.lock:
+            start = max(seq, self.count - self.capacity, 0)
+            return self._take(min(start, self.count), self.count)
+
+    def updates(self, resets, seq):
+        """
+        resets, seq : resets and count returned by the last read of the reader
+        return resets, sequence numbers and samples the reader has not seen. If the
+        buffer was reset since, the returned resets differ and the samples start from 0
+        """
+        with self.lock:
+            if resets != self.resets:
+                seq = 0
+            start = max(seq, self.count - self.capacity, 0)
+            return (self.resets,) + self._take(min(start, self.count), self.count)
+
+    def snapshot(self, recent=DEFAULT_RECENT, bins=DEFAULT_BINS):
+        """
+        recent : latest samples returned at full resolution
+        bins : chunks the older samples are decimated into
+        return sequence numbers and samples, at most recent + 2 * bins rows.
+        Each chunk of older samples becomes two rows, the minimum of every metric at
+        the first sequence number of the chunk and the maximum at the last one, so
+        peaks and drops stay visible.
+        """
+        return self._snapshot(recent, bins)[1:]
+
+    def resets_and_snapshot(self, recent=DEFAULT_RECENT, bins=DEFAULT_BINS):
+        """
+        snapshot() and the resets it was taken at, to continue with updates()
+        """
+        return self._snapshot(recent, bins)
+
+    def _snapshot(self, recent, bins):
+        with self.lock:
+            resets = self.resets
+            start = max(self.count - self.capacity, 0)
+            split = max(self.count - recent, start)
+            seq, values = self._take(start, self.count)
+
+        old = split - start
+        if old <= 2 * bins:
+            return resets, seq, values
+
+        edges = np.linspace(0, old, bins + 1).astype(np.int64)
+        first, last = edges[:-1], edges[1:] - 1
+        decimated = np.empty((2 * bins, values.shape[1]), dtype=values.dtype)
+        decimated[0::2] = np.minimum.reduceat(values[:old], first, axis=0)
+        decimated[1::2] = np.maximum.reduceat(values[:old], first, axis=0)
+        decimated_seq = np.empty(2 * bins, dtype=seq.dtype)
+        decimated_seq[0::2] = seq[first]
+        decimated_seq[1::2] = seq[last]
+
+        return (resets, np.concatenate((decimated_seq, seq[old:])),
+                np.concatenate((decimated, values[old:])))
@@ -0,0 +1,226 @@
+"""
+Streaming dashboard of the web ui, a lighter alternative to the streamlit app
+
+A plain ASGI app, no web framework, any ASGI server (uvicorn, hypercorn) runs it:
+
+| path     | content                                                          |
+|----------|------------------------------------------------------------------|
+| /        | static/index.html, draws the charts on canvas                    |
+| /events  | server-sent events, one "samples" event per tick with new points |
+| /flows   | json, channels and link parameters                               |
+
+A new /events client gets a decimated snapshot (RingBuffer.snapshot) of every
+flow once, after that each tick only carries the samples appended since the
+previous tick (RingBuffer.updates). A tick reads every ring buffer once and
+writes one event, so the cost follows the number of new samples and not the
+length of the run.
+
+cd webui
+python stream.py -r 127.0.0.1 -P 8502      # or: uvicorn stream:app --port 8502
+"""
+import argparse
+import asyncio
+import json
+import os
+import numpy as np
+
+from datasource import DataSource, METRICS
+
+STATIC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+TICK = 0.05             # 秒, 每秒 20 次推送
+MIN_TICK = 0.01
+KEEPALIVE = 15.0        # 秒, 没有新数据时发注释行, 防止代理断开空闲连接
+DECIMALS = 3
+
+
+def columns(values):
+    # (n, metrics) float32 -> one rounded list per metric, keeps the json small
+    return values.astype(np.float64).round(DECIMALS).T.tolist()
+
+
+class FlowCursor:
+    """
+    Position of one /events client in the ring buffer of one flow
+    """
+
+    def __init__(self):
+        self.resets = None
+        self.seq = 0
+        self.link = None
+
+
+class StreamApp:
+    """
+    datasource : DataSource, its collector is started with the app
+    tick : default seconds between two events, a client can ask for another one with ?tick=
+    """
+
+    def __init__(self, datasource: DataSource, tick=TICK):
+        self.datasource = datasource
+        self.tick = tick
+        self.started = False
+
+    def start(self):
+        if not self.started:
+            self.started = True
+            self.datasource.run_collector()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        self.start()    # 没有 lifespan 的服务器
+        path = scope["path"]
+        if path == "/events":
+            await self.events(scope, receive, send)
+        elif path == "/flows":
+            await self.respond(send, 200, "application/json", json.dumps(self.flows()).encode("utf-8"))
+        elif path in ("/", "/index.html"):
+            with open(os.path.join(STATIC_PATH, "index.html"), "rb") as f:
+                await self.respond(send, 200, "text/html; charset=utf-8", f.read())
+        else:
+            await self.respond(send, 404, "text/plain", b"not found")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # 采集线程是 daemon 线程, 随进程退出
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def respond(send, status, content_type, body: bytes):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type.encode("latin-1")),
+                        (b"content-length", str(len(body)).encode("latin-1"))],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def flows(self):
+        return {
+            "metrics": METRICS,
+            "flows": {channel: self.datasource.states[channel] for channel in list(self.datasource.channels)},
+        }
+
+    def query_tick(self, scope):
+        for item in scope.get("query_string", b"").decode("latin-1").split('&'):
+            key, _, value = item.partition('=')
+            if key == "tick":
+                try:
+                    return max(float(value), MIN_TICK)
+                except ValueError:
+                    break
+        return self.tick
+
+    def collect(self, cursors: dict) -> dict:
+        """
+        cursors : channel -> FlowCursor of one client, updated
+        return {channel: new points} of all flows that changed since the last call
+        """
+        changes = {}
+        for channel in list(self.datasource.channels):
+            data = self.datasource.datas[channel]
+            cursor = cursors.get(channel)
+            change = {}
+            if cursor is None:
+                cursor = cursors[channel] = FlowCursor()
+                resets, seq, values = data.resets_and_snapshot()
+                change["reset"] = True
+            else:
+                resets, seq, values = data.updates(cursor.resets, cursor.seq)
+                if resets != cursor.resets:
+                    change["reset"] = True
+            cursor.resets = resets
+            if len(seq) > 0:
+                cursor.seq = int(seq[-1]) + 1
+                change["seq"] = seq.tolist()
+                change["values"] = columns(values)
+            elif change:
+                cursor.seq = 0
+
+            link = self.datasource.states[channel]
+            if link is not cursor.link:     # 链路信息整体替换, 比较引用即可
+                cursor.link = link
+                change["link"] = link
+            if change:
+                changes[channel] = change
+        return changes
+
+    async def events(self, scope, receive, send):
+        tick = self.query_tick(scope)
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no")],
+        })
+
+        disconnected = asyncio.Event()
+
+        async def wait_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(wait_disconnect())
+        cursors = {}
+        loop = asyncio.get_running_loop()
+        idle_since = loop.time()
+        try:
+            event = "event: metrics\ndata: {}\n\n".format(json.dumps(METRICS))
+            await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+            while not disconnected.is_set():
+                changes = self.collect(cursors)
+                if changes:
+                    body = "event: samples\ndata: {}\n\n".format(json.dumps(changes, separators=(',', ':')))
+                    idle_since = loop.time()
+                elif loop.time() - idle_since > KEEPALIVE:
+                    body = ": keepalive\n\n"
+                    idle_since = loop.time()
+                else:
+                    body = None
+                if body is not None:
+                    await send({"type": "http.response.body", "body": body.encode("utf-8"), "more_body": True})
+                try:
+                    await asyncio.wait_for(disconnected.wait(), tick)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            watcher.cancel()
+
+
+def create_app(redis_ip=None, redis_port=None, channels=(), tick=TICK) -> StreamApp:
+    """
+    redis_ip, redis_port : default to $RLCC_REDIS_HOST / $RLCC_REDIS_PORT, 127.0.0.1:6379
+    """
+    redis_ip = redis_ip or os.environ.get("RLCC_REDIS_HOST", "127.0.0.1")
+    redis_port = redis_port or int(os.environ.get("RLCC_REDIS_PORT", 6379))
+    return StreamApp(DataSource(channels=channels, redis_ip=redis_ip, redis_port=redis_port), tick=tick)
+
+
+# uvicorn stream:app
+app = create_app()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', dest='redis_host', default='127.0.0.1', help='redis host')
+    parser.add_argument('-p', dest='redis_port', type=int, default=6379, help='redis port')
+    parser.add_argument('-H', dest='host', default='0.0.0.0', help='http host')
+    parser.add_argument('-P', dest='port', type=int, default=8502, help='http port')
+    parser.add_argument('-t', dest='tick', type=float, default=TICK, help='seconds between two pushes')
+    parser.add_argument('channels', nargs='*', help='flows to show first, e.g. rlccstate_1002')
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.redis_host, args.redis_port, args.channels, args.tick),
+                host=args.host, port=args.port, log_level="warning")
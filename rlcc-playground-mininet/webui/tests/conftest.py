@@ -0,0 +1,10 @@
+import os
+import sys
+
+# webui 的模块按目录导入 (streamlit run app.py / python stream.py), gym_rlcc 未安装时用源码目录
+WEBUI = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, WEBUI)
+try:
+    import gym_rlcc  # noqa: F401
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(WEBUI), "gym-rlcc"))
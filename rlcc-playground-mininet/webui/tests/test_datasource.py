@@ -0,0 +1,67 @@
+#
+# datasource.DataSource : the collector thread over fakeredis
+#
+
+import time
+
+import numpy as np
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import datasource
+from gym_rlcc.frame import encode_state_frame
+
+FIELDS = [37, 1284, 411701, 393194, 402231, 160240, 0, 12016, 0, 1288342, 1311744, 131174]
+STATE = ';'.join(str(v) for v in FIELDS)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(datasource, "Redis", lambda host=None, port=None: fakeredis.FakeRedis(server=server))
+    return server
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def started(server):
+    source = datasource.DataSource()
+    source.run_collector()
+    r = fakeredis.FakeRedis(server=server)
+    assert wait_for(lambda: r.execute_command("PUBSUB", "NUMPAT") >= 2)
+    return source, r
+
+
+def test_collects_flows(server):
+    source, r = started(server)
+    r.publish("mininet", "rlcc_flag:1001;bandwidth:20Mbit;rtt:10ms;loss:0%")
+    r.publish("rlccstate_1001", STATE)
+    r.publish("rlccstate_1002", encode_state_frame(np.array(FIELDS, dtype=np.int64)))
+    assert wait_for(lambda: len(source.datas.get("rlccstate_1002", ())) == 1)
+
+    assert source.channels == ["rlccstate_1001", "rlccstate_1002"]
+    assert source.states["rlccstate_1001"] == {"bandwidth": "20Mbit", "rtt": "10ms", "loss": "0%"}
+    np.testing.assert_allclose(source.datas["rlccstate_1001"].last(), source.datas["rlccstate_1002"].last())
+    assert source.datas["rlccstate_1001"].last()[2] == pytest.approx(411701 / 1024)
+
+
+def test_bad_messages_do_not_stop_collector(server):
+    source, r = started(server)
+    r.publish("mininet", "x;y;z;w")                     # 4 个字段但不是链路信息
+    r.publish("mininet", "rlcc_flag:1001;rtt:10ms;loss:0%;x:1")     # 缺少 bandwidth
+    r.publish("rlccstate_1001", encode_state_frame(FIELDS)[:-3])    # 截断的二进制帧
+    r.publish("rlccstate_1001", "a;b;c;d;e;f;g;h;i;j;k;l")
+    for _ in range(3):
+        r.publish("rlccstate_1001", STATE)
+    assert wait_for(lambda: len(source.datas.get("rlccstate_1001", ())) == 3)
+    assert source.collector.is_alive()
+    assert source.dropped == 4
+    assert source.channels == ["rlccstate_1001"]
@@ -0,0 +1,150 @@
+#
+# ring_buffer.RingBuffer : wraparound, reads after a reset or an overwrite, snapshot decimation
+#
+
+import numpy as np
+import pytest
+
+from ring_buffer import RingBuffer
+
+METRICS = ("a", "b")
+
+
+def filled(n, capacity):
+    # 第 i 个样本为 (i, -i), 序号即数值
+    data = RingBuffer(METRICS, capacity=capacity)
+    for i in range(n):
+        data.append((i, -i))
+    return data
+
+
+def rows(seq):
+    seq = np.asarray(seq, dtype=np.float32)
+    return np.stack((seq, -seq), axis=1).reshape(-1, 2)
+
+
+def test_empty():
+    data = RingBuffer(METRICS, capacity=4)
+    assert len(data) == 0 and data.last() is None
+    seq, values = data.window()
+    assert seq.shape == (0,) and values.shape == (0, 2)
+    seq, values = data.snapshot()
+    assert seq.shape == (0,) and values.shape == (0, 2)
+
+
+@pytest.mark.parametrize("n", [3, 4, 5, 11])
+def test_wraparound(n):
+    data = filled(n, capacity=4)
+    kept = list(range(max(n - 4, 0), n))
+    assert len(data) == len(kept)
+    np.testing.assert_array_equal(data.last(), rows([n - 1])[0])
+
+    seq, values = data.window()
+    assert seq.tolist() == kept
+    np.testing.assert_array_equal(values, rows(kept))
+    seq, values = data.window(2)
+    assert seq.tolist() == kept[-2:]
+    np.testing.assert_array_equal(values, rows(kept[-2:]))
+    assert data.window(100)[0].tolist() == kept
+
+
+def test_since_skips_overwritten():
+    data = filled(10, capacity=4)
+    assert data.since(0)[0].tolist() == [6, 7, 8, 9]
+    assert data.since(8)[0].tolist() == [8, 9]
+    np.testing.assert_array_equal(data.since(8)[1], rows([8, 9]))
+    assert data.since(10)[0].tolist() == []
+    assert data.since(12)[0].tolist() == []     # 序号超过 count, 什么都没有
+
+
+def test_updates_follow_reader():
+    data = filled(3, capacity=4)
+    resets, seq, _ = data.updates(0, 0)
+    assert (resets, seq.tolist()) == (0, [0, 1, 2])
+    for i in range(3, 5):
+        data.append((i, -i))
+    resets, seq, values = data.updates(resets, int(seq[-1]) + 1)
+    assert (resets, seq.tolist()) == (0, [3, 4])
+    np.testing.assert_array_equal(values, rows([3, 4]))
+    assert data.updates(resets, 5)[1].tolist() == []
+
+
+def test_updates_after_overwrite():
+    data = filled(2, capacity=4)
+    for i in range(2, 10):
+        data.append((i, -i))
+    # 读者停在序号 2, 之后的 2..5 已经被覆盖
+    resets, seq, values = data.updates(0, 2)
+    assert (resets, seq.tolist()) == (0, [6, 7, 8, 9])
+    np.testing.assert_array_equal(values, rows([6, 7, 8, 9]))
+
+
+def test_updates_after_reset():
+    data = filled(6, capacity=4)
+    data.reset()
+    assert len(data) == 0 and data.last() is None
+    # 旧的读者 (resets 0, 序号 6) 从 0 重新开始, 此时还没有样本
+    resets, seq, _ = data.updates(0, 6)
+    assert (resets, seq.tolist()) == (1, [])
+    data.append((7, -7))
+    data.append((8, -8))
+    resets, seq, values = data.updates(0, 6)
+    assert (resets, seq.tolist()) == (1, [0, 1])
+    np.testing.assert_array_equal(values, rows([7, 8]))
+    # 旧数据不会出现
+    assert data.window()[0].tolist() == [0, 1]
+    assert data.since(0)[0].tolist() == [0, 1]
+
+    data.reset()
+    data.reset()
+    assert data.updates(1, 2)[0] == 3
+
+
+def test_snapshot_small_is_exact():
+    data = filled(30, capacity=64)
+    seq, values = data.snapshot(recent=10, bins=10)     # 20 个旧样本 <= 2 * bins, 不抽稀
+    assert seq.tolist() == list(range(30))
+    np.testing.assert_array_equal(values, rows(range(30)))
+
+
+@pytest.mark.parametrize("n, capacity, recent, bins", [
+    (1000, 4096, 100, 20),
+    (5000, 1024, 100, 20),     # 已经回绕
+    (1000, 4096, 2000, 20),    # 全部是最近的样本
+    (1000, 4096, 0, 7),
+])
+def test_snapshot_decimation(n, capacity, recent, bins):
+    data = filled(n, capacity)
+    rng = np.random.default_rng(0)
+    noise = rng.normal(size=(capacity, 2)).astype(np.float32)
+    data.data += noise          # 样本不再单调, 检查最小/最大值
+    _, kept = data.window()
+    first = max(n - capacity, 0)
+
+    resets, seq, values = data.resets_and_snapshot(recent=recent, bins=bins)
+    assert resets == 0
+    assert len(seq) == len(values) <= recent + 2 * bins
+    assert seq[0] == first and seq[-1] == n - 1
+    assert (np.diff(seq) >= 0).all()
+
+    # 最近的样本保持原样
+    exact = min(recent, n - first)
+    np.testing.assert_array_equal(seq[len(seq) - exact:], np.arange(n - exact, n))
+    np.testing.assert_array_equal(values[len(values) - exact:], kept[len(kept) - exact:])
+
+    # 旧样本的每个区块两行 : 最小值在区块的第一个序号, 最大值在最后一个序号
+    old = len(kept) - exact
+    if old > 2 * bins:
+        assert len(seq) == 2 * bins + exact
+        starts, ends = seq[0:2 * bins:2] - first, seq[1:2 * bins:2] - first
+        # 区块首尾相接, 覆盖全部旧样本
+        assert starts[0] == 0 and ends[-1] == old - 1
+        assert (starts[1:] == ends[:-1] + 1).all() and (ends >= starts).all()
+        for j, (start, end) in enumerate(zip(starts, ends)):
+            np.testing.assert_array_equal(values[2 * j], kept[start:end + 1].min(axis=0))
+            np.testing.assert_array_equal(values[2 * j + 1], kept[start:end + 1].max(axis=0))
+        # 峰值不会被抽稀掉
+        np.testing.assert_array_equal(values.max(axis=0), kept.max(axis=0))
+        np.testing.assert_array_equal(values.min(axis=0), kept.min(axis=0))
+    else:
+        np.testing.assert_array_equal(values, kept)
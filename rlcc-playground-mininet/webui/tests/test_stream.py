@@ -0,0 +1,185 @@
+#
+# stream.StreamApp : per client cursors of collect() across resets and overwrites, the ASGI app in process
+#
+
+import asyncio
+import json
+
+import pytest
+
+import datasource
+import stream
+from ring_buffer import RingBuffer
+
+FIELDS = [37, 1284, 411701, 393194, 402231, 160240, 0, 12016, 0, 1288342, 1311744, 131174]
+LINK = b"rlcc_flag:1001;bandwidth:20Mbit;rtt:10ms;loss:0%"
+CHANNEL = "rlccstate_1001"
+RTT = datasource.METRICS.index("rtt")
+
+
+def state(k):
+    # rtt (第 3 个字段) 为 k ms
+    fields = list(FIELDS)
+    fields[2] = k * 1024
+    return ';'.join(str(v) for v in fields).encode()
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # 不启动采集线程, 测试直接调用 DataSource.handle
+    source = datasource.DataSource()
+    monkeypatch.setattr(source, "run_collector", lambda: None)
+    return stream.StreamApp(source, tick=0.01)
+
+
+def test_collect_sends_new_points_only(app):
+    source = app.datasource
+    source.handle("mininet", LINK)
+    for k in range(3):
+        source.handle(CHANNEL, state(k))
+    cursors = {}
+
+    # 新的客户端 : snapshot 和链路信息
+    change = app.collect(cursors)[CHANNEL]
+    assert change["reset"] and change["seq"] == [0, 1, 2] and change["values"][RTT] == [0, 1, 2]
+    assert change["link"] == {"bandwidth": "20Mbit", "rtt": "10ms", "loss": "0%"}
+    assert len(change["values"]) == len(datasource.METRICS)
+
+    assert app.collect(cursors) == {}
+
+    source.handle(CHANNEL, state(3))
+    source.handle(CHANNEL, state(4))
+    change = app.collect(cursors)[CHANNEL]
+    assert sorted(change) == ["seq", "values"]
+    assert change["seq"] == [3, 4] and change["values"][RTT] == [3, 4]
+    assert app.collect(cursors) == {}
+
+    # 新的链路信息 (同一个 flag 重新启动), 只发链路
+    source.handle("mininet", LINK.replace(b"20Mbit", b"50Mbit"))
+    assert app.collect(cursors) == {CHANNEL: {"link": {"bandwidth": "50Mbit", "rtt": "10ms", "loss": "0%"}}}
+
+
+def test_collect_across_resets(app):
+    source = app.datasource
+    for k in range(5):
+        source.handle(CHANNEL, state(k))
+    cursors = {}
+    app.collect(cursors)
+
+    # init : 重置, 还没有新的样本
+    source.handle(CHANNEL, b"init")
+    assert app.collect(cursors) == {CHANNEL: {"reset": True}}
+    assert cursors[CHANNEL].seq == 0
+    assert app.collect(cursors) == {}
+    source.handle(CHANNEL, state(7))
+    change = app.collect(cursors)[CHANNEL]
+    assert sorted(change) == ["seq", "values"] and change["seq"] == [0] and change["values"][RTT] == [7]
+
+    # 两次之间重置并有新样本 : 从 0 开始, 旧的样本不再出现
+    source.handle(CHANNEL, state(8))
+    source.handle(CHANNEL, b"init")
+    source.handle(CHANNEL, state(9))
+    source.handle(CHANNEL, state(10))
+    change = app.collect(cursors)[CHANNEL]
+    assert change["reset"] and change["seq"] == [0, 1] and change["values"][RTT] == [9, 10]
+
+    # 连续两次重置, 序号与上次相同也要重新开始
+    source.handle(CHANNEL, b"init")
+    source.handle(CHANNEL, state(11))
+    source.handle(CHANNEL, state(12))
+    source.handle(CHANNEL, b"init")
+    source.handle(CHANNEL, state(13))
+    source.handle(CHANNEL, state(14))
+    change = app.collect(cursors)[CHANNEL]
+    assert change["reset"] and change["seq"] == [0, 1] and change["values"][RTT] == [13, 14]
+
+
+def test_collect_after_overwrite(app):
+    source = app.datasource
+    source.add_channel(CHANNEL)
+    source.datas[CHANNEL] = RingBuffer(datasource.METRICS, capacity=4)
+    source.handle(CHANNEL, state(0))
+    cursors = {}
+    assert app.collect(cursors)[CHANNEL]["seq"] == [0]
+
+    # 客户端落后超过容量, 被覆盖的样本跳过
+    for k in range(1, 10):
+        source.handle(CHANNEL, state(k))
+    change = app.collect(cursors)[CHANNEL]
+    assert "reset" not in change
+    assert change["seq"] == [6, 7, 8, 9] and change["values"][RTT] == [6, 7, 8, 9]
+
+
+def test_clients_have_own_cursors(app):
+    source = app.datasource
+    source.handle(CHANNEL, state(0))
+    first, second = {}, {}
+    app.collect(first)
+    source.handle(CHANNEL, state(1))
+    source.handle("rlccstate_1002", state(2))   # 新的流
+
+    changes = app.collect(first)
+    assert changes[CHANNEL]["seq"] == [1] and "reset" not in changes[CHANNEL]
+    assert changes["rlccstate_1002"]["reset"] and changes["rlccstate_1002"]["seq"] == [0]
+    assert app.collect(second)[CHANNEL]["seq"] == [0, 1]
+
+
+def run_asgi(app, path, query=b"", disconnect_after=0, on_samples=None):
+    """
+    call the app in process
+    disconnect_after : /events, the client disconnects after this many samples events
+    on_samples : called with the number of samples events sent so far
+    return status, body chunks
+    """
+    async def run():
+        sent = []
+        samples = asyncio.Event()
+        count = 0
+
+        async def receive():
+            await samples.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal count
+            sent.append(message)
+            if message.get("body", b"").startswith(b"event: samples"):
+                count += 1
+                if count >= disconnect_after:
+                    samples.set()
+                if on_samples is not None:
+                    on_samples(count)
+
+        scope = {"type": "http", "path": path, "query_string": query}
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        return sent[0]["status"], [m["body"] for m in sent[1:]]
+
+    return asyncio.run(run())
+
+
+def test_asgi_flows(app):
+    app.datasource.handle("mininet", LINK)
+    status, body = run_asgi(app, "/flows")
+    assert status == 200
+    assert json.loads(b"".join(body)) == {"metrics": list(datasource.METRICS),
+                                          "flows": {CHANNEL: {"bandwidth": "20Mbit", "rtt": "10ms", "loss": "0%"}}}
+    assert run_asgi(app, "/nothing")[0] == 404
+
+
+def test_asgi_events(app):
+    source = app.datasource
+    source.handle(CHANNEL, state(0))
+    source.handle(CHANNEL, state(1))
+
+    def on_samples(count):
+        if count == 1:  # 第一个 samples 事件之后才有新样本
+            source.handle(CHANNEL, state(2))
+
+    status, body = run_asgi(app, "/events", b"tick=0.001", disconnect_after=2, on_samples=on_samples)
+    assert status == 200
+    assert body[0] == "event: metrics\ndata: {}\n\n".format(json.dumps(datasource.METRICS)).encode()
+    events = [json.loads(chunk.split(b"data: ", 1)[1]) for chunk in body[1:]]
+    assert len(events) == 2
+    assert events[0][CHANNEL]["reset"] and events[0][CHANNEL]["seq"] == [0, 1]
+    assert list(events[1]) == [CHANNEL] and sorted(events[1][CHANNEL]) == ["seq", "values"]
+    assert events[1][CHANNEL]["seq"] == [2] and events[1][CHANNEL]["values"][RTT] == [2]
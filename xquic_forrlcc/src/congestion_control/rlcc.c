@@ -11,6 +11,7 @@
 #include "pthread.h"
 #include <time.h>
 #include <hiredis/hiredis.h>
+#include <inttypes.h>
 
 #define XQC_RLCC_MSS 				XQC_MSS
 #define MONITOR_INTERVAL 			100
@@ -26,6 +27,12 @@
 #define PROBE_INTERVAL 				2000000 // 2s
 // #define PROBE_INTERVAL 				10000000 // 10s
 #define XQC_DEFAULT_PACING_RATE (((2 * XQC_MSS * 1000000ULL)/(XQC_kInitialRtt * 1000)))
+/* state published to rlccstate_<flag> */
+#define RLCC_STATE_FIELDS 			12
+#define RLCC_FRAME_HEADER_SIZE 		8
+#define RLCC_FRAME_VERSION 			1
+/* 1 : publish binary state frames; 0 : publish ';' joined text (default, read by every consumer) */
+#define RLCC_BINARY_STATE 			0
 
 const float xqc_rlcc_init_pacing_gain = 2.885;
 
@@ -107,6 +114,55 @@ push_state(redisContext *conn, u_int32_t key, char *value)
 	return;
 }
 
+/*
+ * binary state frame, see gym_rlcc/frame.py
+ * header : magic "RLST" | version u8 | field count u8 | reserved u16
+ * body   : RLCC_STATE_FIELDS * int64, little-endian
+ */
+static void
+push_state_frame(redisContext *conn, u_int32_t key, const int64_t *fields)
+{
+	unsigned char frame[RLCC_FRAME_HEADER_SIZE + 8 * RLCC_STATE_FIELDS] = {
+		'R', 'L', 'S', 'T', RLCC_FRAME_VERSION, RLCC_STATE_FIELDS, 0, 0};
+	redisReply *reply;
+	int i, b;
+
+	for (i = 0; i < RLCC_STATE_FIELDS; i++)
+	{
+		uint64_t v = (uint64_t)fields[i];
+		for (b = 0; b < 8; b++)
+		{
+			frame[RLCC_FRAME_HEADER_SIZE + 8 * i + b] = (v >> (8 * b)) & 0xff;
+		}
+	}
+
+	reply = redisCommand(conn, "PUBLISH rlccstate_%d %b", key, frame, sizeof(frame));
+
+	if (reply != NULL)
+		freeReplyObject(reply);
+
+	return;
+}
+
+/* publish one sample, text "a;b;c;..." by default, binary frame if RLCC_BINARY_STATE */
+static void
+push_state_fields(redisContext *conn, u_int32_t key, const int64_t *fields)
+{
+#if RLCC_BINARY_STATE
+	push_state_frame(conn, key, fields);
+#else
+	char value[500] = {0};
+	int i, len = 0;
+
+	for (i = 0; i < RLCC_STATE_FIELDS; i++)
+	{
+		len += snprintf(value + len, sizeof(value) - len, i ? ";%" PRId64 : "%" PRId64, fields[i]);
+	}
+	push_state(conn, key, value);
+#endif
+	return;
+}
+
 uint32_t
 EMA(uint32_t new, uint32_t old, uint32_t rate) // rate 4, 8
 {
@@ -498,8 +554,7 @@ xqc_rlcc_on_ack(void *cong_ctl, xqc_sample_t *sampler)
 			{	
 				uint32_t cwnd = rlcc->cwnd >> 10;
 				uint32_t pacing_rate = rlcc->pacing_rate >> 10;
-				char value[500] = {0};
-				sprintf(value, "%d;%d;%ld;%ld;%ld;%d;%d;%d;%d;%d;%d;%d",
+				int64_t fields[RLCC_STATE_FIELDS] = {
 						cwnd,
 						pacing_rate,
 						sampler->rtt,
@@ -511,8 +566,8 @@ xqc_rlcc_on_ack(void *cong_ctl, xqc_sample_t *sampler)
 						sampler->is_app_limited,
 						sampler->delivery_rate,
 						rlcc->throughput, // delivery_rate 与 throughput 不作为状态，作为单独的奖励计算使用
-						sent_interval);
-				push_state(rlcc->redis_conn_publisher, rlcc->rlcc_path_flag, value);
+						sent_interval};
+				push_state_fields(rlcc->redis_conn_publisher, rlcc->rlcc_path_flag, fields);
 				pthread_mutex_lock(&mutex_lock);
 				// send signal
 				pthread_cond_signal(&cond);
@@ -585,8 +640,7 @@ xqc_rlcc_on_ack(void *cong_ctl, xqc_sample_t *sampler)
 			{	
 				uint32_t cwnd = rlcc->cwnd >> 10; /* TODO, uint64 >> 10 may overflow (rlccenv recv type is float32) */
 				uint32_t pacing_rate = rlcc->pacing_rate >> 10;
-				char value[500] = {0};
-				sprintf(value, "%d;%d;%ld;%ld;%ld;%d;%d;%d;%d;%d;%d;%d",
+				int64_t fields[RLCC_STATE_FIELDS] = {
 						cwnd,		
 						pacing_rate,
 						rlcc->rtt,
@@ -598,8 +652,8 @@ xqc_rlcc_on_ack(void *cong_ctl, xqc_sample_t *sampler)
 						sampler->is_app_limited,
 						rlcc->delivery_rate,     // notice:此处是采样周期内平滑后的delivery_rate
 						rlcc->throughput,
-						sent_interval);
-				push_state(rlcc->redis_conn_publisher, rlcc->rlcc_path_flag, value);
+						sent_interval};
+				push_state_fields(rlcc->redis_conn_publisher, rlcc->rlcc_path_flag, fields);
 				pthread_mutex_lock(&mutex_lock);
 				// send signal
 				pthread_cond_signal(&cond);
@@ -672,8 +726,7 @@ xqc_rlcc_on_ack(void *cong_ctl, xqc_sample_t *sampler)
 			{	
 				uint32_t cwnd = rlcc->cwnd >> 10; /* TODO, uint64 >> 10 may overflow (rlccenv recv type is float32) */
 				uint32_t pacing_rate = rlcc->pacing_rate >> 10;
-				char value[500] = {0};
-				sprintf(value, "%d;%d;%ld;%ld;%ld;%d;%d;%d;%d;%d;%d;%d",
+				int64_t fields[RLCC_STATE_FIELDS] = {
 						cwnd,		
 						pacing_rate,
 						rlcc->rtt,
@@ -685,8 +738,8 @@ xqc_rlcc_on_ack(void *cong_ctl, xqc_sample_t *sampler)
 						sampler->is_app_limited,
 						rlcc->delivery_rate,     // notice:此处是采样周期内平滑后的delivery_rate
 						rlcc->throughput,
-						sent_interval);
-				push_state(rlcc->redis_conn_publisher, rlcc->rlcc_path_flag, value);
+						sent_interval};
+				push_state_fields(rlcc->redis_conn_publisher, rlcc->rlcc_path_flag, fields);
 				pthread_mutex_lock(&mutex_lock);
 				// send signal
 				pthread_cond_signal(&cond);